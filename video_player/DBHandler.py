@@ -1,23 +1,158 @@
 
+import hashlib
+import json
+import os
+import queue
 import sqlite3
+import threading
 from pathlib import Path
-import subprocess
-import shlex
-import shutil
 import time
-from typing import Optional, Iterable
+import multiprocessing
+from concurrent.futures import Future, ThreadPoolExecutor, ProcessPoolExecutor, FIRST_COMPLETED, wait
+from typing import Optional, Iterable, Iterator, Callable, NamedTuple, TypeVar
+
+from integrity import HEALTH_QUARANTINED, decode_check, init_worker, terminate_workers
+from keyframe_index import encode_keyframes, decode_keyframes
+from probe_backends import ProbeBackend, ProbeError, FfprobeBackend, default_probe_backend
+from video_duration_sum import walk_video_files
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+# (ChannelId, path, duration_seconds, size_bytes, modified_at_iso[, fingerprint[, probe]]),
+# the first five as passed to upsert_video; 'probe' is the backend's result dict
+VideoRow = tuple
+
+FINGERPRINT_CHUNK_BYTES = 2 * 1024 * 1024
+
+# Media metadata columns in 'videos': column -> (probe result key, declaration)
+METADATA_COLUMNS = {
+    "Container": ("container", "TEXT"),
+    "VideoCodec": ("video_codec", "TEXT"),
+    "AudioCodec": ("audio_codec", "TEXT"),
+    "Width": ("width", "INTEGER"),
+    "Height": ("height", "INTEGER"),
+    "FrameRate": ("frame_rate", "REAL"),
+    "HasAudio": ("has_audio", "INTEGER"),
+    "BitRate": ("bit_rate", "INTEGER"),
+}
+
+
+def content_fingerprint(path: str | Path, size: int, chunk_bytes: int = FINGERPRINT_CHUNK_BYTES) -> str:
+    """
+    Cheap content identity for a file that survives renames and moves:
+    the size plus a hash of the first and last 'chunk_bytes'.
+    """
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        h.update(f.read(chunk_bytes))
+        if size > chunk_bytes:
+            f.seek(max(chunk_bytes, size - chunk_bytes))
+            h.update(f.read(chunk_bytes))
+    return f"{size}:{h.hexdigest()}"
+
+
+def _call_with_timeout(fn: Callable[..., T], timeout: Optional[float], *args) -> T:
+    """
+    fn(*args), given at most 'timeout' seconds: it runs on a daemon thread, and TimeoutError
+    is raised if it has not returned by then (a read stuck on a stalled network mount cannot
+    be interrupted, so the thread is left to finish on its own).
+    """
+    if timeout is None:
+        return fn(*args)
+    outcome: dict = {}
+
+    def run() -> None:
+        try:
+            outcome["result"] = fn(*args)
+        except BaseException as e:
+            outcome["error"] = e
+    thread = threading.Thread(target=run, name="DbHandler-io", daemon=True)
+    thread.start()
+    thread.join(timeout)
+    if thread.is_alive():
+        raise TimeoutError(f"timed out after {timeout} s")
+    if "error" in outcome:
+        raise outcome["error"]
+    return outcome["result"]
+
+
+def _check_video(job: tuple[Callable, int, str, Optional[float]]) -> tuple[int, Optional[str], Optional[str]]:
+    """Runs in a verification worker process: (checker, video_id, path, timeout) -> (video_id, health, error)."""
+    checker, video_id, path, timeout = job
+    return (video_id, *checker(path, timeout))
+
+
+class ProbeOutcome(NamedTuple):
+    """Result of DbHandler.probe_file"""
+    path: Path
+    probe: Optional[dict]           # backend result, None if probing failed
+    fingerprint: Optional[str]
+    from_cache: bool
+    error: Optional[str] = None     # why probing failed
 
 class DbHandler:
-    def __init__(self, db_path: str | Path = "showsequencer.db", enable_wal: bool = False):
+    """
+    Catalog of channels and video files in SQLite.
+
+    Connections are long-lived: each thread that reads gets its own connection,
+    and every write goes through one dedicated writer thread (see _write), so a
+    background scan can run alongside playback-side reads without lock errors.
+    Call close() when done.
+
+    Channel playlists are cached in process, keyed by each channel's PlaylistVersion
+    (see list_videos_by_channelId); call invalidate_playlist_cache() after another
+    process has changed the database.
+    """
+
+    BUSY_TIMEOUT_SECONDS = 30.0
+    # Read connections map this much of the database file instead of copying pages through read()
+    READER_MMAP_BYTES = 256 * 1024 * 1024
+    # Known-bad files are retried after 1 h, doubling per repeated failure up to 7 days
+    FAILURE_RETRY_BASE_SECONDS = 3600.0
+    FAILURE_RETRY_MAX_SECONDS = 7 * 24 * 3600.0
+
+    def __init__(self,
+                 db_path: str | Path = "showsequencer.db",
+                 enable_wal: bool = False,
+                 probe_backend: Optional[ProbeBackend] = None,
+                 use_probe_cache: bool = True,
+                 metadata_backend: Optional[ProbeBackend] = None):
         self.db_path = Path(db_path)
         self.enable_wal = enable_wal
+        # How scans read durations (default: in-process libav, ffprobe as fallback)
+        self.probe_backend = probe_backend or default_probe_backend()
+        # Reuse probe results for files whose content fingerprint is already known (moves/renames)
+        self.use_probe_cache = use_probe_cache
+        self._ffprobe = FfprobeBackend()
+        # How fill_metadata reads the metadata a scan's backend did not report (default: ffprobe)
+        self.metadata_backend = metadata_backend or self._ffprobe
 
         # Ensure parent folder exists (e.g., .\db\)
         if self.db_path.parent and not self.db_path.parent.exists():
             self.db_path.parent.mkdir(parents=True, exist_ok=True)
 
+        # Per-thread read connections, by owning thread, so close() can release them and
+        # connections of threads that have exited (e.g. probe pool workers) are closed
+        self._local = threading.local()
+        self._readers: dict[threading.Thread, sqlite3.Connection] = {}
+        self._readers_lock = threading.Lock()
+
+        # Single writer thread, started on first write
+        self._write_queue: queue.Queue = queue.Queue()
+        self._writer: Optional[threading.Thread] = None
+        self._writer_lock = threading.Lock()
+        self._closed = False
+
+        # Bumped after every committed write: until it moves, cached playlists are current
+        # without checking their channel's PlaylistVersion
+        self._write_generation = 0
+        self._playlists: dict[int, tuple[int, int, list[dict]]] = {}   # (generation, version, rows)
+
     def _connect(self) -> sqlite3.Connection:
-        conn = sqlite3.connect(self.db_path)
+        # Connections are shared with the thread that closes them, hence check_same_thread=False;
+        # each one is still only ever used by its owning thread.
+        conn = sqlite3.connect(self.db_path, timeout=self.BUSY_TIMEOUT_SECONDS, check_same_thread=False)
         conn.row_factory = sqlite3.Row
         conn.execute("PRAGMA foreign_keys = ON;")
         if self.enable_wal:
@@ -25,80 +160,665 @@ class DbHandler:
             conn.execute("PRAGMA synchronous = NORMAL;")
         return conn
 
+    # ------------------- Connections -------------------
+    def _reader(self) -> sqlite3.Connection:
+        """Returns the calling thread's long-lived read connection, opening it on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            self._release_dead_readers()
+            conn = self._connect()
+            # Readers never write (writes go through _write): enforce it, and read through mmap
+            conn.execute("PRAGMA query_only = ON;")
+            conn.execute(f"PRAGMA mmap_size = {self.READER_MMAP_BYTES};")
+            self._local.conn = conn
+            with self._readers_lock:
+                self._readers[threading.current_thread()] = conn
+        return conn
+
+    def _release_dead_readers(self) -> int:
+        """Closes the read connections of threads that have exited. Returns the number closed."""
+        with self._readers_lock:
+            dead = [t for t in self._readers if not t.is_alive()]
+            conns = [self._readers.pop(t) for t in dead]
+        for conn in conns:
+            conn.close()
+        return len(conns)
+
+    def _submit_write(self, fn: Callable[[sqlite3.Connection], T]) -> "Future[T]":
+        """
+        Queues fn(conn) for the writer thread and returns a Future with its result.
+        Each call runs in its own transaction: committed if fn returns, rolled back if it raises.
+        Raises RuntimeError once close() has been called.
+        """
+        fut: Future = Future()
+        # Queued under the lock, so nothing is queued behind close()'s stop sentinel
+        with self._writer_lock:
+            if self._closed:
+                raise RuntimeError("DbHandler is closed")
+            if self._writer is None or not self._writer.is_alive():
+                self._writer = threading.Thread(target=self._writer_loop, name="DbHandler-writer", daemon=True)
+                self._writer.start()
+            self._write_queue.put((fn, fut))
+        return fut
+
+    def _write(self, fn: Callable[[sqlite3.Connection], T]) -> T:
+        """Runs fn(conn) on the writer thread and waits for its result."""
+        if threading.current_thread() is self._writer:
+            # Nested write from inside another write: join the running transaction
+            return fn(self._writer_conn)
+        return self._submit_write(fn).result()
+
+    def _writer_loop(self) -> None:
+        try:
+            self._writer_conn = self._connect()
+        except BaseException as e:
+            # Fail the writes queued so far; the next one starts a new writer that tries again
+            with self._writer_lock:
+                if self._writer is threading.current_thread():
+                    self._writer = None
+                while True:
+                    try:
+                        item = self._write_queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is not None and item[1].set_running_or_notify_cancel():
+                        item[1].set_exception(e)
+            return
+        try:
+            while True:
+                item = self._write_queue.get()
+                if item is None:
+                    break
+                fn, fut = item
+                if not fut.set_running_or_notify_cancel():
+                    continue
+                try:
+                    with self._writer_conn:
+                        result = fn(self._writer_conn)
+                except BaseException as e:
+                    fut.set_exception(e)
+                else:
+                    self._write_generation += 1
+                    fut.set_result(result)
+        finally:
+            self._writer_conn.close()
+
+    def close(self) -> None:
+        """
+        Finishes queued writes, stops the writer thread and closes all connections.
+        Writes submitted afterwards raise RuntimeError.
+        """
+        with self._writer_lock:
+            self._closed = True
+            writer = self._writer
+            if writer is not None and writer.is_alive():
+                self._write_queue.put(None)
+        if writer is not None and writer is not threading.current_thread():
+            writer.join()
+        with self._readers_lock:
+            readers, self._readers = self._readers, {}
+        for conn in readers.values():
+            conn.close()
+        # Connections owned by other threads are closed above; make sure this thread reopens if reused
+        self._local = threading.local()
+
     # ------------------- Schema -------------------
+    @staticmethod
+    def _add_missing_columns(conn: sqlite3.Connection, table: str, columns: dict[str, str]) -> list[str]:
+        """
+        Adds 'columns' ({name: declaration}) that a database created by an older
+        version of this schema does not have yet. Returns the names added.
+        """
+        existing = {r["name"] for r in conn.execute(f"PRAGMA table_info({table});").fetchall()}
+        added = []
+        for name, decl in columns.items():
+            if name not in existing:
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {decl};")
+                added.append(name)
+        return added
+
     def init_db(self) -> None:
-        with self._connect() as conn:
-            # Channels (keep existing if you already have it)
-            conn.execute("""
-                CREATE TABLE IF NOT EXISTS channels (
-                    Id INTEGER PRIMARY KEY,
-                    Name TEXT NOT NULL UNIQUE,
-                    Description TEXT DEFAULT ''
-                );
-            """)
-            conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_channels_name ON channels(Name);")
-
-            # Videos
-            conn.execute("""
-                CREATE TABLE IF NOT EXISTS videos (
-                    Id INTEGER PRIMARY KEY,
-                    ChannelId INTEGER NOT NULL,
-                    Path TEXT NOT NULL UNIQUE,
-                    FileName TEXT NOT NULL,
-                    DurationSeconds REAL NOT NULL,
-                    SizeBytes INTEGER,
-                    ModifiedAt TEXT,
-                    ScannedAt TEXT DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (ChannelId) REFERENCES channels(Id) ON DELETE CASCADE
-                );
-            """)
-            conn.execute("CREATE INDEX IF NOT EXISTS idx_videos_channel ON videos(ChannelId);")
-            conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_videos_path ON videos(Path);")
-            conn.commit()
+        self._write(self._create_schema)
+
+    def _create_schema(self, conn: sqlite3.Connection) -> None:
+        # Channels (keep existing if you already have it)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS channels (
+                Id INTEGER PRIMARY KEY,
+                Name TEXT NOT NULL UNIQUE,
+                Description TEXT DEFAULT '',
+                FolderMtimeNs INTEGER,
+                TotalSeconds REAL NOT NULL DEFAULT 0,
+                ScheduleDirty INTEGER NOT NULL DEFAULT 1,
+                PlaylistVersion INTEGER NOT NULL DEFAULT 0,
+                ScanGeneration INTEGER NOT NULL DEFAULT 0
+            );
+        """)
+        self._add_missing_columns(conn, "channels", {
+            "FolderMtimeNs": "INTEGER",
+            "TotalSeconds": "REAL NOT NULL DEFAULT 0",
+            "ScheduleDirty": "INTEGER NOT NULL DEFAULT 1",
+            "PlaylistVersion": "INTEGER NOT NULL DEFAULT 0",
+            "ScanGeneration": "INTEGER NOT NULL DEFAULT 0",
+        })
+        # Name's UNIQUE constraint already provides the index; drop the duplicate older databases have
+        conn.execute("DROP INDEX IF EXISTS idx_channels_name;")
+
+        # Videos
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS videos (
+                Id INTEGER PRIMARY KEY,
+                ChannelId INTEGER NOT NULL,
+                Path TEXT NOT NULL UNIQUE,
+                FileName TEXT NOT NULL,
+                DurationSeconds REAL NOT NULL,
+                SizeBytes INTEGER,
+                ModifiedAt TEXT,
+                ScannedAt TEXT DEFAULT CURRENT_TIMESTAMP,
+                Fingerprint TEXT,
+                StartOffsetSeconds REAL,
+                Container TEXT,
+                VideoCodec TEXT,
+                AudioCodec TEXT,
+                Width INTEGER,
+                Height INTEGER,
+                FrameRate REAL,
+                HasAudio INTEGER,
+                BitRate INTEGER,
+                ScanGeneration INTEGER NOT NULL DEFAULT 0,
+                Health TEXT,
+                HealthError TEXT,
+                HealthCheckedAt TEXT,
+                FOREIGN KEY (ChannelId) REFERENCES channels(Id) ON DELETE CASCADE
+            );
+        """)
+        self._add_missing_columns(conn, "videos", {
+            "Fingerprint": "TEXT",
+            "StartOffsetSeconds": "REAL",
+            "ScanGeneration": "INTEGER NOT NULL DEFAULT 0",
+            "Health": "TEXT",
+            "HealthError": "TEXT",
+            "HealthCheckedAt": "TEXT",
+        })
+        metadata_added = self._add_missing_columns(
+            conn, "videos", {col: decl for col, (_, decl) in METADATA_COLUMNS.items()})
+        # Path's UNIQUE constraint indexes it and idx_videos_schedule below starts with ChannelId,
+        # so the separate indexes older databases have on them are dropped
+        conn.execute("DROP INDEX IF EXISTS idx_videos_path;")
+        conn.execute("DROP INDEX IF EXISTS idx_videos_channel;")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_videos_fingerprint ON videos(Fingerprint);")
+
+        # Schedule: each video's start offset within its channel's loop (playlist order is
+        # FileName, Id) and each channel's total. Triggers only flag a channel as dirty, on
+        # any change to what its playlist returns; refresh_schedules() recomputes dirty
+        # channels in one pass and bumps their PlaylistVersion. Quarantined videos (see
+        # verify_integrity) are left out of the schedule.
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_videos_schedule ON videos(ChannelId, StartOffsetSeconds);")
+        # Playlist order: lets list_videos_by_channelId read a channel without sorting (it is
+        # not covering for that query, whose other columns come from the table row), and
+        # covers the running-sum query of refresh_schedules
+        conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_videos_playlist ON videos(ChannelId, FileName, Id, DurationSeconds, Health);
+        """)
+        conn.execute("""
+            CREATE TRIGGER IF NOT EXISTS trg_videos_schedule_insert AFTER INSERT ON videos
+            BEGIN
+                UPDATE channels SET ScheduleDirty = 1 WHERE Id = NEW.ChannelId AND ScheduleDirty = 0;
+            END;
+        """)
+        conn.execute("""
+            CREATE TRIGGER IF NOT EXISTS trg_videos_schedule_delete AFTER DELETE ON videos
+            BEGIN
+                UPDATE channels SET ScheduleDirty = 1 WHERE Id = OLD.ChannelId AND ScheduleDirty = 0;
+            END;
+        """)
+        # Recreated so older databases get the current definition
+        conn.execute("DROP TRIGGER IF EXISTS trg_videos_schedule_update;")
+        conn.execute(f"""
+            CREATE TRIGGER trg_videos_schedule_update
+            AFTER UPDATE OF ChannelId, FileName, DurationSeconds, Health, {", ".join(self._PLAYLIST_ROW_COLUMNS)}
+            ON videos
+            WHEN OLD.ChannelId IS NOT NEW.ChannelId
+              OR OLD.FileName IS NOT NEW.FileName
+              OR OLD.DurationSeconds IS NOT NEW.DurationSeconds
+              OR (OLD.Health IS 'quarantined') IS NOT (NEW.Health IS 'quarantined')
+              OR {" OR ".join(f"OLD.{col} IS NOT NEW.{col}" for col in self._PLAYLIST_ROW_COLUMNS)}
+            BEGIN
+                UPDATE channels SET ScheduleDirty = 1
+                WHERE Id IN (OLD.ChannelId, NEW.ChannelId) AND ScheduleDirty = 0;
+            END;
+        """)
+
+        # Probe results by content fingerprint, so moved/renamed files are not probed again
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS probe_cache (
+                Fingerprint TEXT PRIMARY KEY,
+                DurationSeconds REAL NOT NULL,
+                Probe TEXT NOT NULL,
+                CachedAt TEXT DEFAULT CURRENT_TIMESTAMP
+            );
+        """)
+        if metadata_added:
+            # Cached probes from before metadata was stored only hold durations
+            conn.execute("DELETE FROM probe_cache;")
+
+        # Negative cache: files that failed probing, skipped until they change or RetryAfter passes
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS probe_failures (
+                Path TEXT PRIMARY KEY,
+                SizeBytes INTEGER,
+                ModifiedAt TEXT,
+                Error TEXT,
+                FailureCount INTEGER NOT NULL DEFAULT 1,
+                FirstFailedAt TEXT DEFAULT CURRENT_TIMESTAMP,
+                LastFailedAt TEXT DEFAULT CURRENT_TIMESTAMP,
+                RetryAfter REAL NOT NULL
+            );
+        """)
+        # Keyframe timestamps per video (keyframe_index.encode_keyframes); rows whose
+        # Fingerprint no longer matches the video's are stale and get re-indexed.
+        # An empty Data blob marks a file that could not be indexed.
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS keyframes (
+                VideoId INTEGER PRIMARY KEY REFERENCES videos(Id) ON DELETE CASCADE,
+                Fingerprint TEXT,
+                KeyframeCount INTEGER NOT NULL,
+                Data BLOB NOT NULL,
+                IndexedAt TEXT DEFAULT CURRENT_TIMESTAMP
+            );
+        """)
 
     # ------------------- Channels -------------------
     def list_channels(self) -> list[dict]:
-        with self._connect() as conn:
-            return [dict(r) for r in conn.execute("SELECT Name FROM channels ORDER BY Name;").fetchall()]
+        conn = self._reader()
+        return [dict(r) for r in conn.execute("SELECT Name, Description FROM channels ORDER BY Name;").fetchall()]
 
     def get_or_create_channel(self, name: str, description: str = "") -> int:
-        with self._connect() as conn:
-            # Try get
-            row = conn.execute("SELECT Id FROM channels WHERE Name = ?;", (name,)).fetchone()
-            if row:
-                return row["Id"]
-            # Create
-            cur = conn.execute(
-                "INSERT INTO channels (Name, Description) VALUES (?, ?);",
+        # Try get
+        row = self._reader().execute("SELECT Id FROM channels WHERE Name = ?;", (name,)).fetchone()
+        if row:
+            return row["Id"]
+
+        # Create (another writer may have won the race since the read above)
+        def create(conn: sqlite3.Connection) -> int:
+            conn.execute(
+                "INSERT INTO channels (Name, Description) VALUES (?, ?) ON CONFLICT(Name) DO NOTHING;",
                 (name, description)
             )
-            conn.commit()
-            return cur.lastrowid
+            return conn.execute("SELECT Id FROM channels WHERE Name = ?;", (name,)).fetchone()["Id"]
+        return self._write(create)
+
+    # Running sum in playlist order, read from idx_videos_playlist alone (covering)
+    _START_OFFSETS_SQL = """
+        WITH o AS (
+            SELECT Id,
+                   SUM(DurationSeconds) OVER (ORDER BY FileName, Id ROWS UNBOUNDED PRECEDING)
+                       - DurationSeconds AS StartOffset
+            FROM videos WHERE ChannelId = ? AND Health IS NOT 'quarantined'
+        )
+        UPDATE videos SET StartOffsetSeconds = o.StartOffset
+        FROM o
+        WHERE videos.Id = o.Id AND videos.StartOffsetSeconds IS NOT o.StartOffset;
+    """
 
-    # ------------------- ffprobe -------------------
-    def ffprobe_duration_seconds(self, path: Path, use_stream_duration: bool = False) -> Optional[float]:
+    def refresh_schedules(self) -> int:
+        """
+        Recomputes start offsets and totals for every channel whose videos changed since
+        its last refresh, and bumps their PlaylistVersion. Returns the number of channels
+        refreshed.
+        """
+        def refresh(conn: sqlite3.Connection) -> int:
+            dirty = [r["Id"] for r in conn.execute("SELECT Id FROM channels WHERE ScheduleDirty = 1;").fetchall()]
+            for channel_id in dirty:
+                conn.execute(self._START_OFFSETS_SQL, (channel_id,))
+                conn.execute("""
+                    UPDATE videos SET StartOffsetSeconds = NULL
+                    WHERE ChannelId = ? AND Health IS 'quarantined' AND StartOffsetSeconds IS NOT NULL;
+                """, (channel_id,))
+                conn.execute("""
+                    UPDATE channels SET
+                        TotalSeconds = (SELECT COALESCE(SUM(DurationSeconds), 0.0) FROM videos
+                                        WHERE ChannelId = ? AND Health IS NOT 'quarantined'),
+                        ScheduleDirty = 0,
+                        PlaylistVersion = PlaylistVersion + 1
+                    WHERE Id = ?;
+                """, (channel_id, channel_id))
+            return len(dirty)
+        return self._write(refresh)
+
+    def _read_scheduled(self, channel_id: int, read: Callable[[sqlite3.Connection], T]) -> tuple[int, T]:
+        """
+        Runs read(conn) in one read transaction that sees the channel's schedule up to date.
+        A dirty schedule is refreshed first and checked again, so rows committed between
+        the check and the read never come back without their start offsets.
+        Returns (write generation taken before the read, its result).
+        """
+        conn = self._reader()
+        while True:
+            # Taken before the snapshot: a write committed meanwhile makes the result stale, not lost
+            generation = self._write_generation
+            conn.execute("BEGIN;")
+            try:
+                row = conn.execute("SELECT ScheduleDirty FROM channels WHERE Id = ?;", (channel_id,)).fetchone()
+                if not (row and row["ScheduleDirty"]):
+                    return generation, read(conn)
+            finally:
+                conn.execute("COMMIT;")
+            self.refresh_schedules()
+
+    @staticmethod
+    def _total_seconds(conn: sqlite3.Connection, channel_id: int) -> float:
+        row = conn.execute("SELECT TotalSeconds FROM channels WHERE Id = ?;", (channel_id,)).fetchone()
+        return float(row["TotalSeconds"]) if row else 0.0
+
+    def channel_total_seconds(self, channel_id: int) -> float:
+        """Length of one loop of the channel's playlist, in seconds."""
+        return self._read_scheduled(channel_id, lambda conn: self._total_seconds(conn, channel_id))[1]
+
+    def live_position(self, channel_id: int, elapsed_seconds: float) -> Optional[dict]:
+        """
+        Which video is live on a channel that has been looping for 'elapsed_seconds'
+        (e.g. channel_live.time_since_golive()), found with an indexed range query.
+        Returns the video row plus 'OffsetSeconds' into it, or None for an empty channel.
+        """
+        def read(conn: sqlite3.Connection) -> Optional[dict]:
+            total = self._total_seconds(conn, channel_id)
+            if total <= 0:
+                return None
+            position = elapsed_seconds % total
+            row = conn.execute("""
+                SELECT Id, Path, FileName, DurationSeconds, StartOffsetSeconds
+                FROM videos
+                WHERE ChannelId = ? AND StartOffsetSeconds <= ?
+                ORDER BY StartOffsetSeconds DESC
+                LIMIT 1;
+            """, (channel_id, position)).fetchone()
+            if row is None:
+                return None
+            live = dict(row)
+            live["OffsetSeconds"] = position - row["StartOffsetSeconds"]
+            return live
+        return self._read_scheduled(channel_id, read)[1]
+
+    def begin_scan_generation(self, channel_id: int) -> int:
+        """
+        Starts a new scan generation for a channel and returns its number. Rows upserted
+        from now on carry it; mark_seen tags the unchanged ones and sweep_unseen deletes
+        the rest.
+        """
+        return self._write(lambda conn: conn.execute(
+            "UPDATE channels SET ScanGeneration = ScanGeneration + 1 WHERE Id = ? RETURNING ScanGeneration;",
+            (channel_id,)).fetchone()["ScanGeneration"])
+
+    # Ids per UPDATE statement, below SQLite's default 999-variable limit
+    _MARK_IDS_PER_STATEMENT = 900
+
+    def mark_seen(self, generation: int, video_ids: Iterable[int]) -> None:
+        """Tags rows (by Id) as seen in scan 'generation', in one transaction of batched UPDATEs."""
+        ids = list(video_ids)
+        if not ids:
+            return
+        step = self._MARK_IDS_PER_STATEMENT
+
+        def mark(conn: sqlite3.Connection) -> None:
+            for start in range(0, len(ids), step):
+                chunk = ids[start:start + step]
+                conn.execute(f"""
+                    UPDATE videos SET ScanGeneration = ?
+                    WHERE Id IN ({", ".join("?" * len(chunk))}) AND ScanGeneration IS NOT ?;
+                """, (generation, *chunk, generation))
+        self._write(mark)
+
+    def sweep_unseen(self, channel_id: int, generation: int) -> int:
+        """Deletes the channel's rows not seen in scan 'generation'. Returns the number deleted."""
+        return self._write(lambda conn: conn.execute(
+            "DELETE FROM videos WHERE ChannelId = ? AND ScanGeneration IS NOT ?;",
+            (channel_id, generation)).rowcount)
+
+    def get_channel_folder_mtime(self, channel_id: int) -> Optional[int]:
+        """Returns the channel folder mtime (ns) recorded by the last complete scan, if any."""
+        conn = self._reader()
+        row = conn.execute("SELECT FolderMtimeNs FROM channels WHERE Id = ?;", (channel_id,)).fetchone()
+        return row["FolderMtimeNs"] if row else None
+
+    def set_channel_folder_mtime(self, channel_id: int, mtime_ns: Optional[int]) -> None:
+        self._write(lambda conn: conn.execute(
+            "UPDATE channels SET FolderMtimeNs = ? WHERE Id = ?;", (mtime_ns, channel_id)))
+
+    # ------------------- Probing -------------------
+    def probe_duration_seconds(self,
+                               path: Path,
+                               use_stream_duration: bool = False,
+                               timeout: Optional[float] = None) -> Optional[float]:
+        """
+        Returns duration in seconds using the configured probe backend, or None on failure.
+        If 'timeout' is given, a probe that runs longer (e.g. on a stalled network mount)
+        is abandoned (ffprobe processes are killed) and treated as a failed probe.
+        """
+        return self.probe_backend.duration_seconds(path, use_stream_duration, timeout)
+
+    def ffprobe_duration_seconds(self,
+                                 path: Path,
+                                 use_stream_duration: bool = False,
+                                 timeout: Optional[float] = None) -> Optional[float]:
         """
         Returns duration in seconds using ffprobe or None if ffprobe is missing or fails.
         - Container duration: format=duration
         - First video stream duration: stream=duration with -select_streams v:0
         """
-        if not shutil.which("ffprobe"):
-            return None
-        # Build command
-        if use_stream_duration:
-            cmd = f'ffprobe -v error -select_streams v:0 -show_entries stream=duration ' \
-                  f'-of default=noprint_wrappers=1:nokey=1 "{path}"'
+        return self._ffprobe.duration_seconds(path, use_stream_duration, timeout)
+
+    def cached_probe(self, fingerprint: str) -> Optional[dict]:
+        """Probe result stored for a content fingerprint, if any."""
+        row = self._reader().execute(
+            "SELECT Probe FROM probe_cache WHERE Fingerprint = ?;", (fingerprint,)).fetchone()
+        return json.loads(row["Probe"]) if row else None
+
+    def evict_probe_cache(self) -> int:
+        """Deletes cached probes whose fingerprint no 'videos' row references. Returns the number deleted."""
+        return self._write(lambda conn: conn.execute("""
+            DELETE FROM probe_cache
+            WHERE NOT EXISTS (SELECT 1 FROM videos v WHERE v.Fingerprint = probe_cache.Fingerprint);
+        """).rowcount)
+
+    def probe_file(self,
+                   path: Path,
+                   size: Optional[int] = None,
+                   use_stream_duration: bool = False,
+                   timeout: Optional[float] = None) -> ProbeOutcome:
+        """
+        Probes one file, answering from the fingerprint cache when possible.
+        'size' (from a stat the caller already did) enables the cache; it is only
+        consulted for container durations. 'timeout' covers the whole file: reading the
+        fingerprint and probing.
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        fingerprint = None
+        if self.use_probe_cache and size is not None and not use_stream_duration:
+            try:
+                fingerprint = _call_with_timeout(content_fingerprint, timeout, path, size)
+            except TimeoutError:
+                return ProbeOutcome(path, None, None, False, f"reading the file timed out after {timeout} s")
+            except OSError:
+                pass
+            else:
+                cached = self.cached_probe(fingerprint)
+                if cached is not None:
+                    return ProbeOutcome(path, cached, fingerprint, True)
+        if deadline is not None:
+            timeout = max(deadline - time.monotonic(), 0.0)
+        try:
+            probe = self.probe_backend.probe(path, use_stream_duration, timeout)
+        except ProbeError as e:
+            return ProbeOutcome(path, None, fingerprint, False, str(e) or "probe failed")
+        return ProbeOutcome(path, probe, fingerprint, False)
+
+    # ------------------- Probe failures -------------------
+    def _known_failures(self) -> dict[str, tuple[Optional[int], Optional[str], float]]:
+        """Path -> (SizeBytes, ModifiedAt, RetryAfter) for every recorded probe failure."""
+        rows = self._reader().execute(
+            "SELECT Path, SizeBytes, ModifiedAt, RetryAfter FROM probe_failures;").fetchall()
+        return {r["Path"]: (r["SizeBytes"], r["ModifiedAt"], r["RetryAfter"]) for r in rows}
+
+    def record_probe_failures(self,
+                              failures: Iterable[tuple[Path, Optional[int], Optional[str], str]]) -> None:
+        """
+        Records (path, size_bytes, modified_at_iso, error) probe failures. A file failing
+        again unchanged doubles its retry delay; a file that changed on disk starts over.
+        """
+        failures = list(failures)
+        if not failures:
+            return
+
+        def record(conn: sqlite3.Connection) -> None:
+            now = time.time()
+            params = []
+            for path, size_bytes, modified_at_iso, error in failures:
+                row = conn.execute("SELECT SizeBytes, ModifiedAt, FailureCount FROM probe_failures WHERE Path = ?;",
+                                   (str(path),)).fetchone()
+                same_file = row is not None and (row["SizeBytes"], row["ModifiedAt"]) == (size_bytes, modified_at_iso)
+                count = row["FailureCount"] + 1 if same_file else 1
+                delay = min(self.FAILURE_RETRY_BASE_SECONDS * 2 ** (count - 1), self.FAILURE_RETRY_MAX_SECONDS)
+                params.append((str(path), size_bytes, modified_at_iso, error, count, now + delay))
+            conn.executemany("""
+                INSERT INTO probe_failures (Path, SizeBytes, ModifiedAt, Error, FailureCount, RetryAfter)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(Path) DO UPDATE SET
+                    SizeBytes = excluded.SizeBytes,
+                    ModifiedAt = excluded.ModifiedAt,
+                    Error = excluded.Error,
+                    FailureCount = excluded.FailureCount,
+                    FirstFailedAt = CASE WHEN excluded.FailureCount = 1 THEN CURRENT_TIMESTAMP ELSE FirstFailedAt END,
+                    LastFailedAt = CURRENT_TIMESTAMP,
+                    RetryAfter = excluded.RetryAfter;
+            """, params)
+        self._write(record)
+
+    def sweep_probe_failures(self, folder: str | Path, seen: Iterable[str], recursive: bool = True) -> int:
+        """
+        Deletes the recorded probe failures of files in 'folder' (and its subfolders when
+        'recursive') whose path is not in 'seen', i.e. files deleted or moved away since
+        they failed. Returns the number deleted.
+        """
+        seen = set(seen)
+        folder = Path(folder)
+        prefix = os.path.join(str(folder), "")
+        # Range scan on the Path primary key: every path starting with 'folder' + separator
+        upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+        def sweep(conn: sqlite3.Connection) -> int:
+            rows = conn.execute("SELECT Path FROM probe_failures WHERE Path >= ? AND Path < ?;", (prefix, upper))
+            gone = [(r["Path"],) for r in rows.fetchall()
+                    if r["Path"] not in seen and (recursive or Path(r["Path"]).parent == folder)]
+            return conn.executemany("DELETE FROM probe_failures WHERE Path = ?;", gone).rowcount if gone else 0
+        return self._write(sweep)
+
+    def list_probe_failures(self) -> list[dict]:
+        """Files that failed probing, most recent first, with error text and next retry time (epoch)."""
+        conn = self._reader()
+        sql = """
+        SELECT Path, SizeBytes, ModifiedAt, Error, FailureCount, FirstFailedAt, LastFailedAt, RetryAfter
+        FROM probe_failures
+        ORDER BY LastFailedAt DESC, Path;
+        """
+        return [dict(r) for r in conn.execute(sql).fetchall()]
+
+    def _probe_files(self,
+                     files: Iterable[tuple[Path, Optional[int]]],
+                     workers: int = 1,
+                     probe_timeout: Optional[float] = None,
+                     use_stream_duration: bool = False) -> Iterator[ProbeOutcome]:
+        """
+        Probes (path, size) pairs and yields a ProbeOutcome as each probe finishes.
+        With workers > 1 the probes run on a bounded thread pool (libav and ffprobe do the
+        work outside the GIL) and results come back in completion order, not input order.
+        At most a few probes per worker are queued, so huge file lists stay cheap.
+        """
+        def probe(item: tuple[Path, Optional[int]]) -> ProbeOutcome:
+            f, size = item
+            return self.probe_file(f, size, use_stream_duration, probe_timeout)
+        return self._bounded_map(probe, files, workers, "probe")
+
+    # How often a pool waiting on long jobs checks its stop event
+    STOP_POLL_SECONDS = 0.2
+
+    def _bounded_map(self,
+                     fn: Callable[[T], R],
+                     items: Iterable[T],
+                     workers: int,
+                     name: str,
+                     processes: bool = False,
+                     stop: Optional[threading.Event] = None) -> Iterator[R]:
+        """
+        Yields fn(item) for each item, serially or (workers > 1) from a thread pool in
+        completion order, keeping at most a few items per worker in flight.
+        With 'processes', fn runs in a pool of low-priority worker processes instead
+        (fn and items must be picklable). Read connections opened by the pool threads are
+        closed once the pool has shut down.
+        Setting 'stop' ends the map within STOP_POLL_SECONDS: queued items are cancelled,
+        and worker processes are terminated with whatever they are running.
+        """
+        if workers <= 1 and not processes:
+            for item in items:
+                if stop is not None and stop.is_set():
+                    return
+                yield fn(item)
+            return
+
+        max_pending = max(workers, 1) * 4
+        if processes:
+            # Spawned rather than forked: this process has writer and pool threads running
+            pool = ProcessPoolExecutor(max_workers=max(workers, 1), initializer=init_worker,
+                                       mp_context=multiprocessing.get_context("spawn"))
         else:
-            cmd = f'ffprobe -v error -show_entries format=duration ' \
-                  f'-of default=noprint_wrappers=1:nokey=1 "{path}"'
+            pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=name)
+        stopped = False
         try:
-            out = subprocess.check_output(shlex.split(cmd), stderr=subprocess.STDOUT)
-            txt = out.decode().strip()
-            return float(txt) if txt else None
-        except Exception:
-            return None
+            items = iter(items)
+            end = object()
+            pending: set = set()
+            exhausted = False
+            while True:
+                if stop is not None and stop.is_set():
+                    stopped = True
+                    return
+                while not exhausted and len(pending) < max_pending:
+                    item = next(items, end)
+                    if item is end:
+                        exhausted = True
+                    else:
+                        pending.add(pool.submit(fn, item))
+                if not pending:
+                    return
+                done, pending = wait(pending, timeout=self.STOP_POLL_SECONDS if stop is not None else None,
+                                     return_when=FIRST_COMPLETED)
+                for fut in done:
+                    yield fut.result()
+        finally:
+            if stopped and processes:
+                terminate_workers(pool)
+            else:
+                pool.shutdown(wait=not stopped, cancel_futures=stopped)
+            self._release_dead_readers()
 
     # ------------------- Videos -------------------
+    @staticmethod
+    def file_attrs(stat: Optional[os.stat_result]) -> tuple[Optional[int], Optional[str]]:
+        """(SizeBytes, ModifiedAt) as stored in the 'videos' table."""
+        if stat is None:
+            return None, None
+        # Convert mtime to ISO8601 (UTC or local; here we use time.strftime on localtime)
+        return stat.st_size, time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(stat.st_mtime))
+
+    def _known_files(self, channel_id: int) -> dict[str, tuple[Optional[int], Optional[str], float, int]]:
+        """Path -> (SizeBytes, ModifiedAt, DurationSeconds, Id) for the rows already stored for a channel."""
+        conn = self._reader()
+        rows = conn.execute("""
+            SELECT Path, SizeBytes, ModifiedAt, DurationSeconds, Id
+            FROM videos WHERE ChannelId = ?;
+        """, (channel_id,)).fetchall()
+        return {r["Path"]: (r["SizeBytes"], r["ModifiedAt"], r["DurationSeconds"], r["Id"]) for r in rows}
+
     def upsert_video(self,
                      channel_id: int,
                      path: Path,
@@ -106,11 +826,11 @@ class DbHandler:
                      size_bytes: Optional[int],
                      modified_at_iso: Optional[str]) -> int:
         """
-        Insert or update a single video row identified by Path (UNIQUE).
-        Returns the row id (Id).
+        Insert or update a single video row identified by Path (UNIQUE). A changed size or
+        mtime clears the row's fingerprint, metadata and health. Returns the row id (Id).
         """
-        with self._connect() as conn:
-            sql = """
+        def upsert(conn: sqlite3.Connection) -> int:
+            sql = f"""
             INSERT INTO videos (ChannelId, Path, FileName, DurationSeconds, SizeBytes, ModifiedAt, ScannedAt)
             VALUES (?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
             ON CONFLICT(Path) DO UPDATE SET
@@ -119,6 +839,10 @@ class DbHandler:
                 DurationSeconds = excluded.DurationSeconds,
                 SizeBytes = excluded.SizeBytes,
                 ModifiedAt = excluded.ModifiedAt,
+                Fingerprint = CASE WHEN {self._SAME_FILE_SQL} THEN Fingerprint END,
+                {", ".join(f"{col} = CASE WHEN {self._SAME_FILE_SQL} THEN {col} END" for col in METADATA_COLUMNS)},
+                Health = CASE WHEN {self._SAME_FILE_SQL} THEN Health END,
+                HealthError = CASE WHEN {self._SAME_FILE_SQL} THEN HealthError END,
                 ScannedAt = CURRENT_TIMESTAMP;
             """
             file_name = path.name
@@ -126,25 +850,201 @@ class DbHandler:
                 channel_id, str(path), file_name, float(duration_seconds),
                 size_bytes, modified_at_iso
             ))
-            conn.commit()
             # Get Id (works both for insert and update)
             row = conn.execute("SELECT Id FROM videos WHERE Path = ?;", (str(path),)).fetchone()
             return int(row["Id"]) if row else -1
+        return self._write(upsert)
+
+    # Rows per INSERT statement: 16 parameters each stays below SQLite's default 999-variable limit
+    _UPSERT_ROWS_PER_STATEMENT = 60
+
+    def upsert_videos(self, rows: Iterable[VideoRow], batch_size: int = 500) -> list[int]:
+        """
+        Bulk version of upsert_video for an iterable of
+        (channel_id, path, duration_seconds, size_bytes, modified_at_iso[, fingerprint[, probe]]) tuples.
+        The probe result fills the media metadata columns (and, with a fingerprint, the
+        probe cache); rows without one keep the metadata already stored. Rows take their
+        channel's current scan generation, so a running scan does not sweep them. A changed
+        size, mtime or fingerprint clears the row's health so the file is verified again; a
+        row without a fingerprint keeps the stored one unless the file changed.
+        Each batch of 'batch_size' rows is written in one transaction, and ids come back
+        from the INSERT itself (RETURNING) rather than a follow-up SELECT per row.
+        Returns the row ids in input order.
+        """
+        ids: list[int] = []
+        batch: list[VideoRow] = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                ids.extend(self._write(lambda conn, b=batch: self._upsert_batch(conn, b)))
+                batch = []
+        if batch:
+            ids.extend(self._write(lambda conn: self._upsert_batch(conn, batch)))
+        return ids
+
+    def delete_videos(self, paths: Iterable[str | Path]) -> int:
+        """
+        Deletes the rows for 'paths' (e.g. files removed from disk), and any probe failures
+        recorded for them. Returns the number of video rows deleted.
+        """
+        params = [(str(p),) for p in paths]
+        if not params:
+            return 0
+
+        def delete(conn: sqlite3.Connection) -> int:
+            conn.executemany("DELETE FROM probe_failures WHERE Path = ?;", params)
+            return conn.executemany("DELETE FROM videos WHERE Path = ?;", params).rowcount
+        return self._write(delete)
+
+    def load_catalog(self,
+                     channels: Iterable[tuple[str, str]],
+                     videos: Iterable[tuple],
+                     batch_size: int = 500) -> dict:
+        """
+        Bulk-loads a catalog (e.g. from a snapshot) in a single transaction: 'channels' are
+        (name, description) pairs, created if missing; 'videos' are
+        (channel_name, path, duration_seconds, size_bytes, modified_at_iso, fingerprint, probe)
+        tuples, consumed lazily and upserted in batches of 'batch_size'.
+        Loaded channels lose their recorded folder mtime, so the next incremental scan
+        checks them against the disk.
+        Returns { 'channels': int, 'videos': int }.
+        """
+        def load(conn: sqlite3.Connection) -> dict:
+            channel_ids: dict[str, int] = {}
+
+            def channel_id(name: str, description: str = "") -> int:
+                if name not in channel_ids:
+                    conn.execute("INSERT INTO channels (Name, Description) VALUES (?, ?) ON CONFLICT(Name) DO NOTHING;",
+                                 (name, description))
+                    channel_ids[name] = conn.execute(
+                        "UPDATE channels SET FolderMtimeNs = NULL WHERE Name = ? RETURNING Id;", (name,)).fetchone()["Id"]
+                return channel_ids[name]
+
+            for name, description in channels:
+                channel_id(name, description)
+            count = 0
+            batch: list[VideoRow] = []
+            for channel_name, *row in videos:
+                batch.append((channel_id(channel_name), *row))
+                if len(batch) >= batch_size:
+                    count += len(self._upsert_batch(conn, batch))
+                    batch = []
+            if batch:
+                count += len(self._upsert_batch(conn, batch))
+            return {"channels": len(channel_ids), "videos": count}
+        return self._write(load)
+
+    # Upsert conditions on a row's stored values against the incoming ones ('excluded'): the
+    # same size and mtime, and for _UNCHANGED_SQL also no other fingerprint (scans without
+    # the probe cache pass none). A stored fingerprint is only dropped when the file changed;
+    # stored metadata too, where the incoming probe has none (e.g. the in-process backend's).
+    _SAME_FILE_SQL = "(excluded.SizeBytes IS SizeBytes AND excluded.ModifiedAt IS ModifiedAt)"
+    _UNCHANGED_SQL = f"({_SAME_FILE_SQL} AND COALESCE(excluded.Fingerprint, Fingerprint) IS Fingerprint)"
+
+    def _upsert_batch(self, conn: sqlite3.Connection, batch: list[VideoRow]) -> list[int]:
+        # sqlite3's executemany() discards RETURNING rows, so each chunk is one multi-row INSERT instead
+        ids_by_path: dict[str, int] = {}
+        cache_entries = []
+        step = self._UPSERT_ROWS_PER_STATEMENT
+        for start in range(0, len(batch), step):
+            chunk = batch[start:start + step]
+            values = ", ".join(["(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, "
+                                "(SELECT ScanGeneration FROM channels WHERE Id = ?), CURRENT_TIMESTAMP)"] * len(chunk))
+            params: list = []
+            for row in chunk:
+                channel_id, path, duration_seconds, size_bytes, modified_at_iso = row[:5]
+                fingerprint = row[5] if len(row) > 5 else None
+                probe = row[6] if len(row) > 6 else None
+                params += [channel_id, str(path), Path(path).name, float(duration_seconds),
+                           size_bytes, modified_at_iso, fingerprint]
+                params += [(probe or {}).get(key) for key, _ in METADATA_COLUMNS.values()]
+                params.append(channel_id)
+                if fingerprint and probe:
+                    cache_entries.append((fingerprint, float(duration_seconds), json.dumps(probe)))
+            sql = f"""
+            INSERT INTO videos (ChannelId, Path, FileName, DurationSeconds, SizeBytes, ModifiedAt,
+                                Fingerprint, {", ".join(METADATA_COLUMNS)}, ScanGeneration, ScannedAt)
+            VALUES {values}
+            ON CONFLICT(Path) DO UPDATE SET
+                ChannelId = excluded.ChannelId,
+                FileName = excluded.FileName,
+                DurationSeconds = excluded.DurationSeconds,
+                SizeBytes = excluded.SizeBytes,
+                ModifiedAt = excluded.ModifiedAt,
+                Fingerprint = CASE WHEN excluded.Fingerprint IS NOT NULL THEN excluded.Fingerprint
+                                   WHEN {self._SAME_FILE_SQL} THEN Fingerprint END,
+                {", ".join(f"{col} = CASE WHEN excluded.{col} IS NOT NULL THEN excluded.{col} "
+                           f"WHEN {self._UNCHANGED_SQL} THEN {col} END" for col in METADATA_COLUMNS)},
+                ScanGeneration = excluded.ScanGeneration,
+                Health = CASE WHEN {self._UNCHANGED_SQL} THEN Health END,
+                HealthError = CASE WHEN {self._UNCHANGED_SQL} THEN HealthError END,
+                ScannedAt = CURRENT_TIMESTAMP
+            RETURNING Id, Path;
+            """
+            for r in conn.execute(sql, params).fetchall():
+                ids_by_path[r["Path"]] = r["Id"]
+            # A successful probe clears any earlier failure for the file
+            conn.executemany("DELETE FROM probe_failures WHERE Path = ?;", [(str(row[1]),) for row in chunk])
+        if cache_entries:
+            conn.executemany("""
+                INSERT INTO probe_cache (Fingerprint, DurationSeconds, Probe) VALUES (?, ?, ?)
+                ON CONFLICT(Fingerprint) DO UPDATE SET
+                    DurationSeconds = excluded.DurationSeconds,
+                    Probe = excluded.Probe,
+                    CachedAt = CURRENT_TIMESTAMP;
+            """, cache_entries)
+        return [ids_by_path[str(row[1])] for row in batch]
 
     def scan_and_store_durations(self,
                                  root_folder: str | Path,
                                  channel_names: Iterable[str] | None = None,
                                  recursive: bool = False,
-                                 use_stream_duration: bool = False) -> dict:
+                                 use_stream_duration: bool = False,
+                                 workers: int = 1,
+                                 probe_timeout: Optional[float] = None,
+                                 incremental: bool = False,
+                                 batch_size: int = 500,
+                                 retry_failed: bool = False,
+                                 exclude: Iterable[str] = (),
+                                 prune: Iterable[str] = ()) -> dict:
         """
         Scans 'root_folder' for videos, grouped by channel subfolders (e.g., channel1/2/3),
-        probes duration via ffprobe, and upserts into the 'videos' table.
-        Returns a summary dict: { 'total_seconds': float, 'by_channel': {name: seconds}, 'files_scanned': int }.
+        probes duration via the probe backend, and upserts into the 'videos' table.
+        - workers: number of concurrent probes (1 = probe serially)
+        - probe_timeout: seconds before a hung probe is abandoned and the file skipped
+        - incremental: only probe files whose size/mtime differ from the stored row, and
+          skip a channel folder entirely when its mtime is unchanged since the last
+          complete scan (non-recursive scans only; a file rewritten in place without
+          changing the folder is picked up by the next full scan)
+        - batch_size: probed rows written per transaction (also flushed at the end of each channel)
+        - retry_failed: probe known-bad files (see list_probe_failures) even before their retry time
+        - exclude / prune: fnmatch patterns for file names to skip and directory names not
+          to descend into (see video_duration_sum.walk_video_files)
+        Files that fail probing are recorded in 'probe_failures' and skipped by later scans
+        until they change on disk or their back-off expires.
+        Rows are upserted in batches as probes finish. Each scanned channel folder is then
+        reconciled mark-and-sweep: rows of files seen on disk are tagged with the channel's
+        new scan generation and the rest (deleted or moved files) are removed with one
+        DELETE, as are the probe failures recorded for files no longer there. Skipped and missing channel folders, and folders that could not be listed
+        completely, are left alone. The totals are those of the refreshed schedules
+        (quarantined files left out).
+        Returns a summary dict: { 'total_seconds': float, 'by_channel': {name: seconds}, 'files_scanned': int,
+                                  'files_unchanged': int, 'cache_hits': int, 'channels_skipped': int,
+                                  'files_failed': int, 'files_known_bad': int, 'files_removed': int,
+                                  'elapsed_seconds': float, 'files_per_second': float }.
         """
         root = Path(root_folder)
-        total = 0.0
         files_scanned = 0
-        by_channel: dict[str, float] = {}
+        files_unchanged = 0
+        cache_hits = 0
+        channels_skipped = 0
+        files_failed = 0
+        files_known_bad = 0
+        files_removed = 0
+        failures = {} if retry_failed else self._known_failures()
+        now = time.time()
+        channel_ids: dict[str, int] = {}
+        started = time.perf_counter()
 
         # Default channel names: discover subfolders that look like channels if not provided
         if channel_names is None:
@@ -157,82 +1057,458 @@ class DbHandler:
 
             # Ensure channel row
             ch_id = self.get_or_create_channel(ch_name, description=f"Auto-discovered in {root}")
+            channel_ids[ch_name] = ch_id
 
-            # Collect files
-            video_exts = {".mp4", ".mkv", ".mov", ".avi", ".webm", ".m4v"}
-            files = (ch_path.rglob("*") if recursive else ch_path.glob("*"))
-            channel_total = 0.0
+            # Folder mtime is taken before listing so changes made during the scan trigger the next one
+            folder_mtime_ns = ch_path.stat().st_mtime_ns
+            if incremental and not recursive and self.get_channel_folder_mtime(ch_id) == folder_mtime_ns:
+                channels_skipped += 1
+                continue
+
+            # Rows of files on disk that are not rewritten below are marked seen by Id
+            generation = self.begin_scan_generation(ch_id)
+            known = self._known_files(ch_id)
+            seen_ids: list[int] = []
+            seen_paths: set[str] = set()
 
-            for f in files:
-                if not f.is_file() or f.suffix.lower() not in video_exts:
+            # Collect files, keeping the stat so unchanged files can be recognised without probing
+            listing_errors: list[OSError] = []
+            entries = walk_video_files(ch_path, recursive=recursive, exclude=exclude, prune=prune,
+                                       onerror=listing_errors.append)
+            channel_known_bad = 0
+            to_probe: dict[Path, Optional[os.stat_result]] = {}
+            for entry in entries:
+                f = Path(entry.path)
+                seen_paths.add(str(f))
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    stat = None
+                stored = known.get(str(f))
+                if incremental and stat is not None and stored is not None and stored[:2] == self.file_attrs(stat):
+                    files_unchanged += 1
+                    seen_ids.append(stored[3])
                     continue
+                failed = failures.get(str(f))
+                if stat is not None and failed is not None and failed[:2] == self.file_attrs(stat) and now < failed[2]:
+                    channel_known_bad += 1
+                    if stored is not None:
+                        seen_ids.append(stored[3])
+                    continue
+                to_probe[f] = stat
 
-                # ffprobe duration
-                dur = self.ffprobe_duration_seconds(f, use_stream_duration=use_stream_duration)
-                if dur is None:
-                    # Skip files we couldn't probe
+            files_known_bad += channel_known_bad
+            # Known-bad files (or unlistable subfolders) keep the folder from being skipped,
+            # so they are retried once due
+            probe_failed = channel_known_bad > 0 or bool(listing_errors)
+            pending_rows: list[VideoRow] = []
+            new_failures = []
+            files = ((f, stat.st_size if stat else None) for f, stat in to_probe.items())
+            for outcome in self._probe_files(files, workers=workers, probe_timeout=probe_timeout,
+                                             use_stream_duration=use_stream_duration):
+                if outcome.probe is None:
+                    # Skip files we couldn't probe, and remember them so later scans don't retry straight away
+                    probe_failed = True
+                    files_failed += 1
+                    new_failures.append((outcome.path, *self.file_attrs(to_probe[outcome.path]), outcome.error))
+                    # The file is still there: keep its last good row
+                    stored = known.get(str(outcome.path))
+                    if stored is not None:
+                        seen_ids.append(stored[3])
                     continue
 
-                # File attributes
-                try:
-                    stat = f.stat()
-                    size_bytes = stat.st_size
-                    # Convert mtime to ISO8601 (UTC or local; here we use time.strftime on localtime)
-                    modified_at_iso = time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(stat.st_mtime))
-                except Exception:
-                    size_bytes = None
-                    modified_at_iso = None
-
-                # Upsert row
-                self.upsert_video(ch_id, f, dur, size_bytes, modified_at_iso)
-
-                channel_total += dur
-                total += dur
+                f = outcome.path
+                dur = outcome.probe["duration_seconds"]
+                if outcome.from_cache:
+                    cache_hits += 1
+                size_bytes, modified_at_iso = self.file_attrs(to_probe[f])
+                pending_rows.append((ch_id, f, dur, size_bytes, modified_at_iso, outcome.fingerprint,
+                                     outcome.probe))
+                if len(pending_rows) >= batch_size:
+                    self.upsert_videos(pending_rows, batch_size=batch_size)
+                    pending_rows = []
+
                 files_scanned += 1
 
-            by_channel[ch_name] = channel_total
+            if pending_rows:
+                self.upsert_videos(pending_rows, batch_size=batch_size)
+            self.record_probe_failures(new_failures)
+            if not listing_errors:
+                self.mark_seen(generation, seen_ids)
+                files_removed += self.sweep_unseen(ch_id, generation)
+                self.sweep_probe_failures(ch_path, seen_paths, recursive=recursive)
 
+            # Only remember the folder as done if every file made it into the catalog
+            if not probe_failed:
+                self.set_channel_folder_mtime(ch_id, folder_mtime_ns)
+
+        if files_scanned:
+            self.evict_probe_cache()
+        self.refresh_schedules()
+        # Totals of the refreshed schedules: what the channels play, so quarantined files and
+        # rows kept for files that failed to re-probe count the same whether a channel was
+        # scanned or skipped
+        by_channel = {ch_name: self.channel_total_seconds(ch_id) for ch_name, ch_id in channel_ids.items()}
+        total = sum(by_channel.values())
+
+        elapsed = time.perf_counter() - started
         return {
             "total_seconds": total,
             "by_channel": by_channel,
-            "files_scanned": files_scanned
+            "files_scanned": files_scanned,
+            "files_unchanged": files_unchanged,
+            "cache_hits": cache_hits,
+            "channels_skipped": channels_skipped,
+            "files_failed": files_failed,
+            "files_known_bad": files_known_bad,
+            "files_removed": files_removed,
+            "elapsed_seconds": elapsed,
+            "files_per_second": files_scanned / elapsed if elapsed > 0 else 0.0
         }
 
+    # ------------------- Metadata -------------------
+    def videos_needing_metadata(self) -> list[dict]:
+        """
+        Videos (Id, Path, Fingerprint, DurationSeconds) whose metadata was never read, e.g.
+        scanned through the in-process backend (ffprobe always reports HasAudio).
+        """
+        conn = self._reader()
+        return [dict(r) for r in conn.execute(
+            "SELECT Id, Path, Fingerprint, DurationSeconds FROM videos WHERE HasAudio IS NULL ORDER BY Id;")]
+
+    def store_metadata(self, rows: Iterable[tuple[int, Optional[str], float, dict]]) -> None:
+        """
+        Stores (video_id, fingerprint, duration_seconds, probe) metadata read after the scan,
+        unless the file changed meanwhile (its fingerprint no longer matches). The probe
+        cache entry of the fingerprint gets the metadata too, so moved copies reuse it.
+        """
+        rows = list(rows)
+        if not rows:
+            return
+        assignments = ", ".join(f"{col} = ?" for col in METADATA_COLUMNS)
+
+        def store(conn: sqlite3.Connection) -> None:
+            conn.executemany(f"UPDATE videos SET {assignments} WHERE Id = ? AND Fingerprint IS ?;", [
+                (*(probe.get(key) for key, _ in METADATA_COLUMNS.values()), video_id, fingerprint)
+                for video_id, fingerprint, _, probe in rows])
+            conn.executemany("UPDATE probe_cache SET Probe = ? WHERE Fingerprint = ?;", [
+                (json.dumps({**probe, "duration_seconds": duration_seconds}), fingerprint)
+                for _, fingerprint, duration_seconds, probe in rows if fingerprint])
+        self._write(store)
+
+    def fill_metadata(self,
+                      workers: int = 1,
+                      timeout: Optional[float] = None,
+                      batch_size: int = 50,
+                      stop: Optional[threading.Event] = None) -> dict:
+        """
+        Background pass after a scan: reads container, codecs, resolution, frame rate,
+        audio presence and bitrate through metadata_backend for every video the scan only
+        got a duration for. Durations are left as the scan stored them. Files the backend
+        cannot read are tried again on the next pass.
+        - workers: concurrent probes
+        - timeout: seconds before one file is abandoned
+        - stop: set it to end the pass early (e.g. on shutdown); finished files are kept
+        Returns { 'filled': int, 'failed': int, 'elapsed_seconds': float }.
+        """
+        started = time.perf_counter()
+        filled = failed = 0
+        if not self.metadata_backend.available():
+            return {"filled": 0, "failed": 0, "elapsed_seconds": 0.0}
+        todo = self.videos_needing_metadata()
+
+        def metadata(video: dict) -> tuple[dict, Optional[dict]]:
+            if stop is not None and stop.is_set():
+                return video, None
+            try:
+                return video, self.metadata_backend.probe(Path(video["Path"]), timeout=timeout)
+            except ProbeError:
+                return video, None
+
+        pending = []
+        for video, probe in self._bounded_map(metadata, todo, workers, "metadata", stop=stop):
+            if stop is not None and stop.is_set():
+                break
+            if probe is None:
+                failed += 1
+                continue
+            pending.append((video["Id"], video["Fingerprint"], video["DurationSeconds"], probe))
+            filled += 1
+            if len(pending) >= batch_size:
+                self.store_metadata(pending)
+                pending = []
+        self.store_metadata(pending)
+
+        return {"filled": filled, "failed": failed, "elapsed_seconds": time.perf_counter() - started}
+
+    # ------------------- Keyframes -------------------
+    def videos_needing_keyframes(self, min_duration_seconds: float = 0.0) -> list[dict]:
+        """Videos (Id, Path, Fingerprint) with no keyframe index or a stale one, longest first."""
+        conn = self._reader()
+        sql = """
+        SELECT v.Id, v.Path, v.Fingerprint
+        FROM videos v
+        LEFT JOIN keyframes k ON k.VideoId = v.Id
+        WHERE (k.VideoId IS NULL OR k.Fingerprint IS NOT v.Fingerprint)
+          AND v.DurationSeconds >= ?
+        ORDER BY v.DurationSeconds DESC;
+        """
+        return [dict(r) for r in conn.execute(sql, (min_duration_seconds,)).fetchall()]
+
+    def store_keyframes(self, rows: Iterable[tuple[int, Optional[str], Optional[list[float]]]]) -> None:
+        """Stores (video_id, fingerprint, keyframe_times) rows; None times mark a file that could not be indexed."""
+        params = []
+        for video_id, fingerprint, times in rows:
+            data = encode_keyframes(times or ())
+            params.append((video_id, fingerprint, len(data) // 4, data))
+        if not params:
+            return
+        self._write(lambda conn: conn.executemany("""
+            INSERT INTO keyframes (VideoId, Fingerprint, KeyframeCount, Data) VALUES (?, ?, ?, ?)
+            ON CONFLICT(VideoId) DO UPDATE SET
+                Fingerprint = excluded.Fingerprint,
+                KeyframeCount = excluded.KeyframeCount,
+                Data = excluded.Data,
+                IndexedAt = CURRENT_TIMESTAMP;
+        """, params))
+
+    def keyframes_for(self, path: str | Path) -> Optional[list[float]]:
+        """Keyframe times (seconds, ascending) of the video at 'path', or None if not indexed (or stale)."""
+        conn = self._reader()
+        row = conn.execute("""
+            SELECT k.Data
+            FROM videos v
+            JOIN keyframes k ON k.VideoId = v.Id AND k.Fingerprint IS v.Fingerprint
+            WHERE v.Path = ? AND k.KeyframeCount > 0;
+        """, (str(path),)).fetchone()
+        return decode_keyframes(row["Data"]) if row else None
+
+    def index_keyframes(self,
+                        workers: int = 1,
+                        timeout: Optional[float] = None,
+                        min_duration_seconds: float = 0.0,
+                        batch_size: int = 50,
+                        stop: Optional[threading.Event] = None) -> dict:
+        """
+        Background indexing pass: lists the keyframes of every video without an up-to-date
+        index (longest first, as mid-file seeks hurt most there) through the probe backend.
+        - workers: concurrent keyframe listings
+        - timeout: seconds before one file is abandoned
+        - min_duration_seconds: leave shorter videos unindexed
+        - stop: set it to end the pass early (e.g. on shutdown); finished files are kept
+        Returns { 'indexed': int, 'failed': int, 'elapsed_seconds': float }.
+        """
+        started = time.perf_counter()
+        todo = self.videos_needing_keyframes(min_duration_seconds)
+        indexed = failed = 0
+
+        def keyframes(video: dict) -> tuple[int, Optional[str], Optional[list[float]]]:
+            if stop is not None and stop.is_set():
+                return video["Id"], video["Fingerprint"], None
+            try:
+                return video["Id"], video["Fingerprint"], self.probe_backend.keyframe_times(Path(video["Path"]), timeout)
+            except ProbeError:
+                return video["Id"], video["Fingerprint"], None
+
+        pending = []
+        for video_id, fingerprint, times in self._bounded_map(keyframes, todo, workers, "keyframes", stop=stop):
+            if stop is not None and stop.is_set():
+                break
+            pending.append((video_id, fingerprint, times))
+            if times:
+                indexed += 1
+            else:
+                failed += 1
+            if len(pending) >= batch_size:
+                self.store_keyframes(pending)
+                pending = []
+        self.store_keyframes(pending)
+
+        return {"indexed": indexed, "failed": failed, "elapsed_seconds": time.perf_counter() - started}
+
+    # ------------------- Integrity -------------------
+    def videos_needing_verification(self) -> list[dict]:
+        """Videos (Id, Path) never decode-checked, or changed since their last check."""
+        conn = self._reader()
+        return [dict(r) for r in conn.execute("SELECT Id, Path FROM videos WHERE Health IS NULL ORDER BY Id;")]
+
+    def set_health(self, rows: Iterable[tuple[int, str, Optional[str]]]) -> None:
+        """Stores (video_id, health, error) results of decode checks."""
+        params = [(health, error, video_id) for video_id, health, error in rows]
+        if not params:
+            return
+        self._write(lambda conn: conn.executemany("""
+            UPDATE videos SET Health = ?, HealthError = ?, HealthCheckedAt = CURRENT_TIMESTAMP WHERE Id = ?;
+        """, params))
+
+    def list_quarantined(self) -> list[dict]:
+        """Quarantined videos with the decode error that put them there."""
+        conn = self._reader()
+        sql = """
+        SELECT v.Id, c.Name AS Channel, v.Path, v.HealthError, v.HealthCheckedAt
+        FROM videos v
+        JOIN channels c ON c.Id = v.ChannelId
+        WHERE v.Health = 'quarantined'
+        ORDER BY c.Name, v.FileName;
+        """
+        return [dict(r) for r in conn.execute(sql).fetchall()]
+
+    def quarantined_paths(self, channel_id: int) -> set[str]:
+        """Paths of the channel's quarantined videos."""
+        conn = self._reader()
+        rows = conn.execute("SELECT Path FROM videos WHERE ChannelId = ? AND Health = 'quarantined';", (channel_id,))
+        return {r["Path"] for r in rows}
+
+    def verify_integrity(self,
+                         workers: int = 1,
+                         timeout: Optional[float] = None,
+                         batch_size: int = 50,
+                         stop: Optional[threading.Event] = None,
+                         checker: Callable[[str, Optional[float]], tuple[Optional[str], Optional[str]]] = decode_check) -> dict:
+        """
+        Background verification job: decode-checks every video without a health status in
+        a pool of 'workers' low-priority processes (integrity.decode_check by default) and
+        records the result. Quarantined videos drop out of playlists and schedules until
+        the file changes. Checks that cannot complete (timeout, no ffmpeg) are retried by
+        the next run.
+        - timeout: seconds before one file's check is abandoned
+        - stop: set it to end the job early (e.g. on shutdown): running checks are killed,
+          finished ones are kept
+        Returns { 'checked': int, 'ok': int, 'quarantined': int, 'undetermined': int, 'elapsed_seconds': float }.
+        """
+        started = time.perf_counter()
+        counts = {"checked": 0, "ok": 0, "quarantined": 0, "undetermined": 0}
+        jobs = ((checker, v["Id"], v["Path"], timeout) for v in self.videos_needing_verification())
+        pending = []
+        for video_id, health, error in self._bounded_map(_check_video, jobs, workers, "verify",
+                                                         processes=True, stop=stop):
+            counts["checked"] += 1
+            if health is None:
+                counts["undetermined"] += 1
+                continue
+            counts["quarantined" if health == HEALTH_QUARANTINED else "ok"] += 1
+            pending.append((video_id, health, error))
+            if len(pending) >= batch_size:
+                self.set_health(pending)
+                pending = []
+        self.set_health(pending)
+        counts["elapsed_seconds"] = time.perf_counter() - started
+        return counts
+
     # ------------------- Queries -------------------
     def total_video_seconds(self) -> float:
-        with self._connect() as conn:
-            row = conn.execute("SELECT COALESCE(SUM(DurationSeconds), 0.0) AS total FROM videos;").fetchone()
-            return float(row["total"])
+        conn = self._reader()
+        row = conn.execute("SELECT COALESCE(SUM(DurationSeconds), 0.0) AS total FROM videos;").fetchone()
+        return float(row["total"])
 
     def channel_video_seconds(self, channel_name: str) -> float:
-        with self._connect() as conn:
-            row = conn.execute("""
-                SELECT COALESCE(SUM(v.DurationSeconds), 0.0) AS total
-                FROM videos v
-                JOIN channels c ON c.Id = v.ChannelId
-                WHERE c.Name = ?;
-            """, (channel_name,)).fetchone()
-            return float(row["total"])
-
-    def list_videos(self) -> list[dict]:
-        with self._connect() as conn:
-            sql = """
-            SELECT v.Id, c.Name AS Channel, v.FileName, v.Path, v.DurationSeconds,
-                   v.SizeBytes, v.ModifiedAt, v.ScannedAt
+        conn = self._reader()
+        row = conn.execute("""
+            SELECT COALESCE(SUM(v.DurationSeconds), 0.0) AS total
             FROM videos v
             JOIN channels c ON c.Id = v.ChannelId
-            ORDER BY c.Name, v.FileName;
-            """
-            return [dict(r) for r in conn.execute(sql).fetchall()]
+            WHERE c.Name = ?;
+        """, (channel_name,)).fetchone()
+        return float(row["total"])
+
+    def list_videos(self) -> list[dict]:
+        conn = self._reader()
+        sql = f"""
+        SELECT v.Id, c.Name AS Channel, v.FileName, v.Path, v.DurationSeconds,
+               v.SizeBytes, v.ModifiedAt, v.ScannedAt, v.Fingerprint, {", ".join("v." + col for col in METADATA_COLUMNS)}
+        FROM videos v
+        JOIN channels c ON c.Id = v.ChannelId
+        ORDER BY c.Name, v.FileName;
+        """
+        return [dict(r) for r in conn.execute(sql).fetchall()]
         
+    def iter_catalog(self) -> Iterator[dict]:
+        """
+        Every video row with its channel name (Channel, Path, DurationSeconds, SizeBytes,
+        ModifiedAt, Fingerprint and the metadata columns), streamed from the cursor in
+        row order (no sort) rather than loaded into memory.
+        """
+        conn = self._reader()
+        sql = f"""
+        SELECT c.Name AS Channel, v.Path, v.DurationSeconds, v.SizeBytes, v.ModifiedAt,
+               v.Fingerprint, {", ".join("v." + col for col in METADATA_COLUMNS)}
+        FROM videos v
+        JOIN channels c ON c.Id = v.ChannelId
+        ORDER BY v.Id;
+        """
+        for row in conn.execute(sql):
+            yield dict(row)
+
+    # Columns of _PLAYLIST_SQL besides the schedule's: changing one flags the channel dirty too
+    _PLAYLIST_ROW_COLUMNS = ("Path", "SizeBytes", "ModifiedAt", "ScannedAt", "Fingerprint", *METADATA_COLUMNS)
+
+    _PLAYLIST_SQL = f"""
+        SELECT Path, DurationSeconds, StartOffsetSeconds,
+               SizeBytes, ModifiedAt, ScannedAt, Fingerprint, {", ".join(METADATA_COLUMNS)}
+        FROM videos
+        WHERE ChannelId = ? AND Health IS NOT 'quarantined'
+        ORDER BY FileName, Id;
+    """
+
     def list_videos_by_channelId(self, channelId: int) -> list[dict]:
-        with self._connect() as conn:
-            sql = """
-            SELECT v.Path, v.DurationSeconds,
-                   v.SizeBytes, v.ModifiedAt, v.ScannedAt
-            FROM videos v
-            JOIN channels c ON c.Id = v.ChannelId
-            WHERE c.Id = ?
-            ORDER BY v.FileName;
-            """
-            return [dict(r) for r in conn.execute(sql, (channelId,)).fetchall()]
+        """
+        Channel playlist in play order, with each video's StartOffsetSeconds and media
+        metadata. Quarantined videos are left out.
+        Playlists are cached, so switching back to a channel does not query SQLite until
+        this process commits a write; after one, the cached playlist is kept while the
+        channel's PlaylistVersion is unchanged (writes to other channels, keyframes or
+        health checks leave it alone). The row dicts are shared and must not be modified.
+        """
+        cached = self._playlists.get(channelId)
+        if cached is not None and cached[0] == self._write_generation:
+            return list(cached[2])
+
+        def read(conn: sqlite3.Connection) -> tuple[int, list[dict]]:
+            row = conn.execute("SELECT PlaylistVersion FROM channels WHERE Id = ?;", (channelId,)).fetchone()
+            version = row["PlaylistVersion"] if row else -1
+            if cached is not None and cached[1] == version:
+                return version, cached[2]
+            return version, [dict(r) for r in conn.execute(self._PLAYLIST_SQL, (channelId,)).fetchall()]
+        generation, (version, rows) = self._read_scheduled(channelId, read)
+        self._playlists[channelId] = (generation, version, rows)
+        return list(rows)
+
+    def invalidate_playlist_cache(self) -> None:
+        """Drops cached playlists, e.g. after another process has written to the database."""
+        self._playlists.clear()
+
+    def list_videos_by_format(self,
+                              container: Optional[str] = None,
+                              video_codec: Optional[str] = None,
+                              audio_codec: Optional[str] = None,
+                              has_audio: Optional[bool] = None,
+                              min_height: Optional[int] = None) -> list[dict]:
+        """
+        Videos matching every given criterion, answered from the catalog alone.
+        'container' matches any of ffprobe's comma-separated names (e.g. 'mp4' in 'mov,mp4,m4a,...').
+        """
+        where, params = [], []
+        if container is not None:
+            where.append("(',' || v.Container || ',') LIKE ?")
+            params.append(f"%,{container},%")
+        if video_codec is not None:
+            where.append("v.VideoCodec = ?")
+            params.append(video_codec)
+        if audio_codec is not None:
+            where.append("v.AudioCodec = ?")
+            params.append(audio_codec)
+        if has_audio is not None:
+            where.append("v.HasAudio = ?")
+            params.append(int(has_audio))
+        if min_height is not None:
+            where.append("v.Height >= ?")
+            params.append(min_height)
+        sql = f"""
+        SELECT v.Id, c.Name AS Channel, v.FileName, v.Path, v.DurationSeconds,
+               {", ".join("v." + col for col in METADATA_COLUMNS)}
+        FROM videos v
+        JOIN channels c ON c.Id = v.ChannelId
+        {"WHERE " + " AND ".join(where) if where else ""}
+        ORDER BY c.Name, v.FileName;
+        """
+        return [dict(r) for r in self._reader().execute(sql, params).fetchall()]
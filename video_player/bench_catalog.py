@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Benchmark - DbHandler at catalog scale: scans and queries on synthetic channel trees of
+1k, 100k and 1M videos, probed by a fake backend with configurable latency.
+Results are printed as a table and written as JSON for tracking over time.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from pathlib import Path
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from DBHandler import DbHandler
+from probe_backends import ProbeBackend
+
+
+class LatencyProbeBackend(ProbeBackend):
+    """Fake probe that sleeps 'latency' seconds (as a real probe waits on I/O) and derives a duration from the name"""
+
+    name = "latency"
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def probe(self, path, use_stream_duration=False, timeout=None):
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self.calls += 1
+        name = Path(path).name.encode()
+        return {"duration_seconds": 60.0 + zlib.crc32(name) % 3600, "container": "matroska,webm",
+                "video_codec": "h264", "audio_codec": "aac", "width": 1920, "height": 1080,
+                "frame_rate": 25.0, "has_audio": True, "bit_rate": 4_000_000}
+
+
+def make_tree(root, videos, channels):
+    """'videos' small files with unique content, spread evenly over flat channel folders"""
+    for c in range(channels):
+        Path(root, f"channel{c + 1}").mkdir(parents=True, exist_ok=True)
+    for i in range(videos):
+        channel = f"channel{i % channels + 1}"
+        with open(os.path.join(root, channel, f"video_{i:07d}.mkv"), "w") as f:
+            f.write(f"{channel}/{i}")
+
+
+def timed(fn, repeat=1):
+    """Mean seconds per call of fn() over 'repeat' calls"""
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - started) / repeat
+
+
+def bench_size(videos, args):
+    """Runs every measurement on a fresh tree and catalog of 'videos' files"""
+    results = []
+
+    def record(operation, seconds, items=None):
+        result = {"videos": videos, "operation": operation, "seconds": seconds}
+        if items is not None:
+            result["items_per_second"] = items / seconds if seconds > 0 else None
+        results.append(result)
+        print(f"  {videos:>9,}  {operation:<26} {seconds * 1000:>12.3f} ms", file=sys.stderr)
+
+    def record_size(operation, size_bytes):
+        results.append({"videos": videos, "operation": operation, "bytes": size_bytes})
+        print(f"  {videos:>9,}  {operation:<26} {size_bytes / 1e6:>12.3f} MB", file=sys.stderr)
+
+    with tempfile.TemporaryDirectory(dir=args.tmpdir) as tmpdir:
+        root = os.path.join(tmpdir, "library")
+        started = time.perf_counter()
+        make_tree(root, videos, args.channels)
+        print(f"  {videos:>9,}  (tree created in {time.perf_counter() - started:.1f} s)", file=sys.stderr)
+
+        backend = LatencyProbeBackend(args.probe_latency_ms / 1000.0)
+        db = DbHandler(os.path.join(tmpdir, "bench.db"), enable_wal=args.wal, probe_backend=backend)
+        db.init_db()
+        scan = dict(workers=args.workers, incremental=True, batch_size=args.batch_size)
+
+        record("full_scan", timed(lambda: db.scan_and_store_durations(root, **scan)), videos)
+        record("rescan_unchanged", timed(lambda: db.scan_and_store_durations(root, **scan)))
+        # A new file per channel changes every folder's mtime: every file is stat'ed, only new ones probed
+        for c in range(args.channels):
+            Path(root, f"channel{c + 1}", "zz_new.mkv").write_text(f"new {c}")
+        record("rescan_after_add", timed(lambda: db.scan_and_store_durations(root, **scan)), videos)
+
+        channel_ids = [db.get_or_create_channel(f"channel{c + 1}") for c in range(args.channels)]
+        rng = random.Random(0)
+        def uncached_playlist():
+            db.invalidate_playlist_cache()
+            db.list_videos_by_channelId(rng.choice(channel_ids))
+
+        record("list_videos_by_channelId", timed(uncached_playlist, args.query_repeat), videos / args.channels)
+        record("list_videos_cached",
+               timed(lambda: db.list_videos_by_channelId(rng.choice(channel_ids)), args.lookup_repeat))
+        record("channel_video_seconds",
+               timed(lambda: db.channel_video_seconds(f"channel{rng.randrange(args.channels) + 1}"),
+                     args.query_repeat))
+        record("live_position",
+               timed(lambda: db.live_position(rng.choice(channel_ids), rng.uniform(0, 1e9)), args.lookup_repeat))
+        db.close()
+        record_size("database_size", os.path.getsize(os.path.join(tmpdir, "bench.db")))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='1000,100000,1000000', help='comma-separated library sizes (videos)')
+    parser.add_argument('--channels', type=int, default=3, help='channel folders per library')
+    parser.add_argument('--probe-latency-ms', type=float, default=0.0, help='time each fake probe takes')
+    parser.add_argument('--workers', type=int, default=8, help='concurrent probes during scans')
+    parser.add_argument('--batch-size', type=int, default=500, help='rows per upsert transaction')
+    parser.add_argument('--query-repeat', type=int, default=5, help='calls timed per playlist/total query')
+    parser.add_argument('--lookup-repeat', type=int, default=10_000, help='calls timed for live_position')
+    parser.add_argument('--wal', action='store_true', help='enable WAL journal mode')
+    parser.add_argument('--tmpdir', help='where to build the synthetic trees (default: system temp)')
+    parser.add_argument('--output', help='write JSON results here (default: stdout)')
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(',') if s]
+    print(f"  {'videos':>9}  {'operation':<26} {'time':>15}", file=sys.stderr)
+    results = []
+    for videos in sizes:
+        results.extend(bench_size(videos, args))
+
+    report = {
+        "benchmark": "catalog",
+        "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "environment": {"python": platform.python_version(), "sqlite": sqlite3.sqlite_version,
+                        "platform": platform.platform()},
+        "parameters": {"sizes": sizes, "channels": args.channels, "probe_latency_ms": args.probe_latency_ms,
+                       "workers": args.workers, "batch_size": args.batch_size, "wal": args.wal},
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Benchmark - How much a compact catalog layout would save over DbHandler's: database
+size, path lookups and channel playlist reads. The compact layout is built here only, as
+a copy of a DbHandler catalog:
+- each directory path is stored once, in 'directories'; a video row holds the interned
+  directory id and its file name instead of the full path (plus a duplicated FileName)
+- ModifiedAt and ScannedAt are integer epoch seconds instead of ISO strings
+- (DirId, FileName) is the only unique index
+The player does not use it: nothing maintains its schedule or health columns.
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from DBHandler import DbHandler, METADATA_COLUMNS
+
+COMPACT_SCHEMA = f"""
+    CREATE TABLE directories (
+        Id INTEGER PRIMARY KEY,
+        Path TEXT NOT NULL UNIQUE               -- with its trailing separator
+    );
+    CREATE TABLE videos (
+        Id INTEGER PRIMARY KEY,
+        ChannelId INTEGER NOT NULL,
+        DirId INTEGER NOT NULL REFERENCES directories(Id),
+        FileName TEXT NOT NULL,
+        DurationSeconds REAL NOT NULL,
+        SizeBytes INTEGER,
+        ModifiedAt INTEGER,
+        ScannedAt INTEGER,
+        Fingerprint TEXT,
+        StartOffsetSeconds REAL,
+        {", ".join(f"{col} {decl}" for col, (_, decl) in METADATA_COLUMNS.items())},
+        Health TEXT,
+        UNIQUE (DirId, FileName)
+    );
+    CREATE INDEX idx_videos_playlist ON videos(ChannelId, FileName, Id, DurationSeconds, Health);
+"""
+
+COMPACT_LOOKUP_SQL = f"""
+    SELECT v.Id, v.ChannelId, d.Path || v.FileName AS Path, v.FileName, v.DurationSeconds,
+           v.SizeBytes, v.ModifiedAt, v.ScannedAt, v.Fingerprint, {", ".join("v." + c for c in METADATA_COLUMNS)}
+    FROM directories d
+    JOIN videos v ON v.DirId = d.Id
+    WHERE d.Path = ? AND v.FileName = ?;
+"""
+
+COMPACT_PLAYLIST_SQL = f"""
+    SELECT d.Path || v.FileName AS Path, v.DurationSeconds, v.StartOffsetSeconds,
+           v.SizeBytes, v.ModifiedAt, v.ScannedAt, v.Fingerprint, {", ".join("v." + c for c in METADATA_COLUMNS)}
+    FROM videos v
+    JOIN directories d ON d.Id = v.DirId
+    WHERE v.ChannelId = ? AND v.Health IS NOT 'quarantined'
+    ORDER BY v.FileName, v.Id;
+"""
+
+
+def build_compact(legacy_path, compact_path):
+    """Copies the videos of a DbHandler catalog into the compact layout; returns the directory count"""
+    conn = sqlite3.connect(compact_path)
+    metadata = ", ".join(METADATA_COLUMNS)
+    conn.executescript(COMPACT_SCHEMA)
+    conn.execute("ATTACH DATABASE ? AS legacy;", (str(legacy_path),))
+    with conn:
+        # Directory = Path without its trailing FileName (FileName is always the path's last component)
+        conn.execute("""
+            INSERT INTO directories (Path)
+            SELECT DISTINCT substr(Path, 1, length(Path) - length(FileName)) FROM legacy.videos ORDER BY 1;
+        """)
+        conn.execute(f"""
+            INSERT INTO videos (Id, ChannelId, DirId, FileName, DurationSeconds, SizeBytes, ModifiedAt,
+                                ScannedAt, Fingerprint, StartOffsetSeconds, {metadata}, Health)
+            SELECT v.Id, v.ChannelId, d.Id, v.FileName, v.DurationSeconds, v.SizeBytes,
+                   CAST(strftime('%s', v.ModifiedAt, 'utc') AS INTEGER),
+                   CAST(strftime('%s', v.ScannedAt) AS INTEGER),
+                   v.Fingerprint, v.StartOffsetSeconds, {", ".join("v." + c for c in METADATA_COLUMNS)}, v.Health
+            FROM legacy.videos v
+            JOIN directories d ON d.Path = substr(v.Path, 1, length(v.Path) - length(v.FileName))
+            ORDER BY v.Id;
+        """)
+    conn.execute("DETACH DATABASE legacy;")
+    directories = conn.execute("SELECT COUNT(*) FROM directories;").fetchone()[0]
+    conn.close()
+    return directories
+
+
+def make_rows(channel_ids, count, files_per_dir):
+    """Synthetic library rows spread over channels, shows and seasons on a NAS share"""
+    rows = []
+    for i in range(count):
+        d = i // files_per_dir
+        path = Path(f"/mnt/nas/media/library/channel{d % len(channel_ids) + 1}/show_{d // 20:05d}/"
+                    f"season_{d % 20:02d}/episode_{i % files_per_dir:04d} - a fairly long title.mkv")
+        rows.append((channel_ids[d % len(channel_ids)], path, 1200.0 + i % 600, 500_000_000 + i,
+                     "2024-01-01T00:00:00", f"{500_000_000 + i}:{i:032x}"))
+    return rows
+
+
+def vacuumed_size(db_path):
+    conn = sqlite3.connect(db_path)
+    conn.execute("VACUUM;")
+    conn.close()
+    return os.path.getsize(db_path)
+
+
+def time_per_call(fn, args):
+    started = time.perf_counter()
+    for a in args:
+        fn(a)
+    return (time.perf_counter() - started) / len(args)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=200_000, help='videos in the catalog')
+    parser.add_argument('--files-per-dir', type=int, default=25, help='videos per season folder')
+    parser.add_argument('--lookups', type=int, default=20_000, help='random path lookups timed')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        legacy_path = os.path.join(tmpdir, 'legacy.db')
+        compact_path = os.path.join(tmpdir, 'compact.db')
+        db = DbHandler(legacy_path)
+        db.init_db()
+        channel_ids = [db.get_or_create_channel(f"channel{i}") for i in (1, 2, 3)]
+        rows = make_rows(channel_ids, args.rows, args.files_per_dir)
+        db.upsert_videos(rows, batch_size=5000)
+        db.refresh_schedules()
+        db.close()
+
+        started = time.perf_counter()
+        directories = build_compact(legacy_path, compact_path)
+        copy_seconds = time.perf_counter() - started
+        legacy_size = vacuumed_size(legacy_path)
+        compact_size = vacuumed_size(compact_path)
+
+        sample = [str(r[1]) for r in random.Random(0).sample(rows, min(args.lookups, len(rows)))]
+        db = DbHandler(legacy_path)
+        legacy_conn = db._reader()
+        legacy_lookup = time_per_call(lambda p: dict(legacy_conn.execute(
+            "SELECT * FROM videos WHERE Path = ?;", (p,)).fetchone()), sample)
+        legacy_playlist = time_per_call(lambda c: [dict(r) for r in legacy_conn.execute(
+            DbHandler._PLAYLIST_SQL, (c,)).fetchall()], channel_ids)
+        db.close()
+
+        compact = sqlite3.connect(compact_path)
+        compact.row_factory = sqlite3.Row
+        compact_lookup = time_per_call(lambda p: dict(compact.execute(
+            COMPACT_LOOKUP_SQL, (os.path.dirname(p) + os.sep, os.path.basename(p))).fetchone()), sample)
+        compact_playlist = time_per_call(lambda c: [dict(r) for r in compact.execute(
+            COMPACT_PLAYLIST_SQL, (c,)).fetchall()], channel_ids)
+        compact.close()
+
+    print(f"Rows: {args.rows:,}  |  Directories: {directories:,}  |  Copy: {copy_seconds:.2f} s")
+    print(f"  {'':<10} {'size':>14} {'path lookup':>14} {'playlist':>12}")
+    print(f"  {'legacy':<10} {legacy_size:>12,} B {legacy_lookup * 1e6:>11.1f} us {legacy_playlist * 1e3:>9.1f} ms")
+    print(f"  {'compact':<10} {compact_size:>12,} B {compact_lookup * 1e6:>11.1f} us {compact_playlist * 1e3:>9.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
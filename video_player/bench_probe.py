@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Benchmark - Per-file probe time of each probe backend (ffprobe subprocess, in-process
+ffpyplayer, and the default fallback chain a scan uses; ffprobe's time is also what
+DbHandler.fill_metadata spends per file after the scan) over the video files of a folder
+"""
+
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from probe_backends import FfprobeBackend, FfpyplayerBackend, ProbeError, default_probe_backend
+from video_duration_sum import iter_video_files
+
+
+def time_calls(probe, files, repeat):
+    """(ms per file, files that failed) calling probe(path) over 'repeat' passes"""
+    failed = 0
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for f in files:
+            try:
+                if probe(f) is None:
+                    failed += 1
+            except ProbeError:
+                failed += 1
+    elapsed = time.perf_counter() - started
+    return elapsed / (len(files) * repeat) * 1000, failed // repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('folder', help='folder of video files (searched recursively)')
+    parser.add_argument('--repeat', type=int, default=5, help='passes over the files per backend')
+    parser.add_argument('--timeout', type=float, default=30.0, help='probe timeout per file, seconds')
+    args = parser.parse_args()
+
+    files = [Path(f) for f in iter_video_files(Path(args.folder), recursive=True)]
+    if not files:
+        print(f"No video files in {args.folder}")
+        return
+    default = default_probe_backend()
+    runs = [('default (scan)', default.name, lambda f: default.probe(f, timeout=args.timeout))]
+    backends = []
+    if FfprobeBackend().ffprobe_path:
+        backends.append(FfprobeBackend())
+    if FfpyplayerBackend.available():
+        backends.append(FfpyplayerBackend())
+    for backend in backends:
+        runs.append((backend.name, backend.name, lambda f, b=backend: b.probe(f, timeout=args.timeout)))
+
+    print(f"Files: {len(files)}  |  Passes: {args.repeat}")
+    for label, name, probe in runs:
+        ms, failed = time_calls(probe, files, args.repeat)
+        print(f"  {label:<17} ({name:<19}) {ms:8.1f} ms/file   {failed} failed")
+
+
+if __name__ == '__main__':
+    main()
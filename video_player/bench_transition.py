@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Benchmark - Transition gap (switch to next video until its first frame can be shown) when
+the next MediaPlayer is opened cold at the switch, versus prepared ahead of time by
+prefetch.PreparedPlayer and just taken and unpaused
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+from ffpyplayer.player import MediaPlayer
+
+from prefetch import PreparedPlayer
+from video_duration_sum import iter_video_files
+
+
+def open_player(path, start_time=0.0, paused=False):
+    """Opened like VideoPlayer.open_media_player"""
+    return MediaPlayer(str(path), ff_opts={'paused': paused, 'autoexit': False, 'ss': start_time})
+
+
+def cold_gap(path, timeout=5.0):
+    """Seconds from opening 'path' until its first frame is decoded"""
+    started = time.perf_counter()
+    player = open_player(path)
+    try:
+        while time.perf_counter() - started < timeout:
+            frame, val = player.get_frame()
+            if frame is not None or val == 'eof':
+                break
+            time.sleep(0.001)
+        return time.perf_counter() - started
+    finally:
+        player.close_player()
+
+
+def prepared_gap(path, timeout=5.0):
+    """Seconds to take a pre-rolled player and unpause it (its first frame is already decoded)"""
+    prepared = PreparedPlayer(lambda p, start: open_player(p, start, paused=True), str(path),
+                              preroll_timeout=timeout)
+    if not prepared.wait(timeout):
+        prepared.close()
+        return None
+    started = time.perf_counter()
+    player, _first_frame = prepared.take()
+    player.set_pause(False)
+    gap = time.perf_counter() - started
+    player.close_player()
+    return gap
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('folder', help='folder of video files (searched recursively)')
+    parser.add_argument('--repeat', type=int, default=5, help='transitions per file and kind')
+    args = parser.parse_args()
+
+    files = [Path(f) for f in iter_video_files(Path(args.folder), recursive=True)]
+    if not files:
+        print(f"No video files in {args.folder}")
+        return
+    print(f"Files: {len(files)}  |  Transitions per file: {args.repeat}")
+    for label, gap in (('cold open', cold_gap), ('prepared', prepared_gap)):
+        gaps = [gap(f) for _ in range(args.repeat) for f in files]
+        gaps = [g for g in gaps if g is not None]
+        if not gaps:
+            print(f"  {label:<10} no frame decoded")
+            continue
+        print(f"  {label:<10} median {statistics.median(gaps) * 1000:7.2f} ms   "
+              f"max {max(gaps) * 1000:7.2f} ms   ({len(gaps)} transitions)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Benchmark - Compares per-row DbHandler.upsert_video with batched DbHandler.upsert_videos
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from DBHandler import DbHandler
+
+
+def make_rows(channel_id, count, prefix):
+    """Synthetic probe results: (channel_id, path, duration, size, mtime)"""
+    return [(channel_id, Path(f"/media/{prefix}/video_{i:07d}.mp4"), 60.0 + i % 600,
+             1_000_000 + i, "2024-01-01T00:00:00") for i in range(count)]
+
+
+def time_rows_per_second(fn, rows):
+    started = time.perf_counter()
+    fn(rows)
+    elapsed = time.perf_counter() - started
+    return len(rows) / elapsed if elapsed > 0 else float('inf')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=5000, help='rows written by each method')
+    parser.add_argument('--batch-size', type=int, default=500, help='rows per transaction for upsert_videos')
+    parser.add_argument('--wal', action='store_true', help='enable WAL journal mode')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db = DbHandler(os.path.join(tmpdir, 'bench.db'), enable_wal=args.wal)
+        db.init_db()
+        ch_id = db.get_or_create_channel('bench')
+
+        def per_row(rows):
+            for row in rows:
+                db.upsert_video(*row)
+
+        results = [
+            ('upsert_video (insert)', time_rows_per_second(per_row, make_rows(ch_id, args.rows, 'a'))),
+            ('upsert_videos (insert)', time_rows_per_second(
+                lambda rows: db.upsert_videos(rows, batch_size=args.batch_size), make_rows(ch_id, args.rows, 'b'))),
+            ('upsert_video (update)', time_rows_per_second(per_row, make_rows(ch_id, args.rows, 'a'))),
+            ('upsert_videos (update)', time_rows_per_second(
+                lambda rows: db.upsert_videos(rows, batch_size=args.batch_size), make_rows(ch_id, args.rows, 'b'))),
+        ]
+        db.close()
+
+    print(f"Rows: {args.rows}  |  Batch size: {args.batch_size}  |  WAL: {args.wal}")
+    for name, rate in results:
+        print(f"  {name:<24} {rate:>12,.0f} rows/s")
+
+
+if __name__ == '__main__':
+    main()
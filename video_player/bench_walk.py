@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Benchmark - Compares the Path.rglob walk the scan used to do with video_duration_sum.walk_video_files
+on a synthetic library tree (1M files by default)
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from video_duration_sum import VIDEO_EXTS, walk_video_files
+
+# Non-video files typically found next to videos in a media library
+OTHER_EXTS = ('.nfo', '.jpg', '.srt', '.txt')
+
+
+def make_tree(root, files, files_per_dir, video_ratio):
+    """Creates 'files' empty files, 'files_per_dir' per folder in two levels of folders"""
+    every = max(int(round(1 / video_ratio)), 1) if video_ratio > 0 else 0
+    dirs_per_top = 50
+    created = 0
+    d = 0
+    while created < files:
+        folder = Path(root, f"show_{d // dirs_per_top:04d}", f"season_{d % dirs_per_top:02d}")
+        folder.mkdir(parents=True, exist_ok=True)
+        for i in range(min(files_per_dir, files - created)):
+            ext = '.mkv' if every and (created % every == 0) else OTHER_EXTS[created % len(OTHER_EXTS)]
+            os.close(os.open(folder / f"file_{i:05d}{ext}", os.O_CREAT | os.O_WRONLY, 0o644))
+            created += 1
+        d += 1
+
+
+def rglob_walk(root):
+    """The previous scan: rglob every entry, is_file() and the extension check, then stat"""
+    count = 0
+    for f in Path(root).rglob("*"):
+        if f.is_file() and f.suffix.lower() in VIDEO_EXTS:
+            f.stat()
+            count += 1
+    return count
+
+
+def scandir_walk(root):
+    """walk_video_files, with the stat the scan needs for each video file"""
+    count = 0
+    for entry in walk_video_files(root):
+        entry.stat()
+        count += 1
+    return count
+
+
+def timed(fn, root):
+    started = time.perf_counter()
+    count = fn(root)
+    return count, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--files', type=int, default=1_000_000, help='files in the synthetic tree')
+    parser.add_argument('--files-per-dir', type=int, default=500, help='files per folder')
+    parser.add_argument('--video-ratio', type=float, default=0.2, help='fraction of files that are videos')
+    parser.add_argument('--root', help='walk this existing tree instead of creating one')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        root = args.root
+        if root is None:
+            root = tmpdir
+            started = time.perf_counter()
+            make_tree(root, args.files, args.files_per_dir, args.video_ratio)
+            print(f"Created {args.files:,} files in {time.perf_counter() - started:.1f} s")
+
+        results = [
+            ('Path.rglob + is_file', *timed(rglob_walk, root)),
+            ('walk_video_files', *timed(scandir_walk, root)),
+        ]
+
+    print(f"Tree: {root if args.root else 'synthetic'}")
+    for name, count, elapsed in results:
+        print(f"  {name:<22} {count:>10,} videos in {elapsed:7.2f} s")
+
+
+if __name__ == '__main__':
+    main()
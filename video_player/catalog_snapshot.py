@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+# catalog_snapshot.py
+"""
+Catalog snapshots: bootstrap a new player node from another node's catalog instead of
+probing the whole media share again.
+
+A snapshot is gzip-compressed JSON lines, written and read as a stream:
+    {"format": "video-catalog-snapshot", "version": 1, "created": <epoch seconds>}
+    {"channel": "channel1", "description": "..."}                  (one per channel)
+    {"channel": "channel1", "path": "sub/dir/file.mkv", "duration": 1320.5, "size": ...,
+     "mtime": <epoch seconds>, "fingerprint": "...", "probe": {<METADATA_KEYS>...}}
+Paths are relative to the library root ('/' separated) and mtimes are epoch seconds, so
+a snapshot works on a node that mounts the share elsewhere or runs in another time zone.
+
+Import loads the snapshot in a single transaction and then runs an incremental scan of
+the library as verification: unchanged files are only stat'ed, changed ones re-probed.
+
+    python catalog_snapshot.py export db/showsequencer.db freevideos catalog.jsonl.gz
+    python catalog_snapshot.py import db/showsequencer.db freevideos catalog.jsonl.gz
+"""
+import argparse
+import gzip
+import itertools
+import json
+import time
+from pathlib import Path, PurePath
+from typing import Iterator, Optional
+
+from DBHandler import DbHandler, METADATA_COLUMNS
+
+SNAPSHOT_FORMAT = "video-catalog-snapshot"
+SNAPSHOT_VERSION = 1
+
+
+def iso_to_epoch(modified_at_iso: Optional[str]) -> Optional[int]:
+    """Epoch seconds for a DbHandler.file_attrs ModifiedAt string (local time)."""
+    if modified_at_iso is None:
+        return None
+    return int(time.mktime(time.strptime(modified_at_iso, "%Y-%m-%dT%H:%M:%S")))
+
+
+def export_snapshot(db: DbHandler, root_folder: str | Path, snapshot_path: str | Path) -> dict:
+    """
+    Writes the channels and videos of 'db' to 'snapshot_path'. Videos outside 'root_folder'
+    are left out. Returns { 'channels': int, 'videos': int, 'skipped': int }.
+    """
+    root = PurePath(root_folder)
+    videos = skipped = 0
+    with gzip.open(snapshot_path, "wt", encoding="utf-8") as out:
+        channels = db.list_channels()
+        out.write(json.dumps({"format": SNAPSHOT_FORMAT, "version": SNAPSHOT_VERSION,
+                              "created": int(time.time())}) + "\n")
+        for ch in channels:
+            out.write(json.dumps({"channel": ch["Name"], "description": ch.get("Description") or ""}) + "\n")
+        for row in db.iter_catalog():
+            try:
+                rel = PurePath(row["Path"]).relative_to(root)
+            except ValueError:
+                skipped += 1
+                continue
+            probe = {key: row[col] for col, (key, _) in METADATA_COLUMNS.items()}
+            if probe["has_audio"] is not None:
+                probe["has_audio"] = bool(probe["has_audio"])
+            out.write(json.dumps({
+                "channel": row["Channel"],
+                "path": rel.as_posix(),
+                "duration": row["DurationSeconds"],
+                "size": row["SizeBytes"],
+                "mtime": iso_to_epoch(row["ModifiedAt"]),
+                "fingerprint": row["Fingerprint"],
+                "probe": probe,
+            }) + "\n")
+            videos += 1
+    return {"channels": len(channels), "videos": videos, "skipped": skipped}
+
+
+def read_snapshot(snapshot_path: str | Path) -> Iterator[dict]:
+    """Streams the records of a snapshot after checking its header."""
+    with gzip.open(snapshot_path, "rt", encoding="utf-8") as f:
+        header = json.loads(f.readline() or "{}")
+        if header.get("format") != SNAPSHOT_FORMAT:
+            raise ValueError(f"{snapshot_path} is not a catalog snapshot")
+        if header.get("version") != SNAPSHOT_VERSION:
+            raise ValueError(f"unsupported snapshot version {header.get('version')}")
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def import_snapshot(db: DbHandler,
+                    root_folder: str | Path,
+                    snapshot_path: str | Path,
+                    verify: bool = True,
+                    recursive: bool = False,
+                    workers: int = 1,
+                    probe_timeout: Optional[float] = None) -> dict:
+    """
+    Loads 'snapshot_path' into 'db' (paths resolved under this node's 'root_folder') in a
+    single transaction, then, with 'verify', runs an incremental scan of the imported
+    channels so files that changed since the export are re-probed ('recursive' as for
+    DbHandler.scan_and_store_durations; it must match how the library is scanned, as rows
+    the verification does not see are swept).
+    Returns { 'channels': int, 'videos': int, 'verification': scan summary or None }.
+    """
+    root = Path(root_folder)
+    records = read_snapshot(snapshot_path)
+    channels: list[tuple[str, str]] = []
+    first_video = None
+    for record in records:
+        if "path" in record:
+            first_video = record
+            break
+        channels.append((record["channel"], record.get("description", "")))
+
+    def video_rows() -> Iterator[tuple]:
+        if first_video is None:
+            return
+        for record in itertools.chain([first_video], records):
+            mtime = record.get("mtime")
+            probe = dict(record.get("probe") or {})
+            probe["duration_seconds"] = record["duration"]
+            yield (record["channel"], root.joinpath(*record["path"].split("/")), record["duration"],
+                   record.get("size"),
+                   time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(mtime)) if mtime is not None else None,
+                   record.get("fingerprint"), probe)
+
+    loaded = db.load_catalog(channels, video_rows())
+    verification = None
+    if verify:
+        names = [name for name, _ in channels]
+        verification = db.scan_and_store_durations(root, channel_names=names, recursive=recursive,
+                                                   incremental=True, workers=workers,
+                                                   probe_timeout=probe_timeout)
+    return {"channels": loaded["channels"], "videos": loaded["videos"], "verification": verification}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export or import a catalog snapshot")
+    parser.add_argument('command', choices=('export', 'import'))
+    parser.add_argument('db', help='catalog database (e.g. db/showsequencer.db)')
+    parser.add_argument('root', help='library root folder the paths are relative to')
+    parser.add_argument('snapshot', help='snapshot file (.jsonl.gz)')
+    parser.add_argument('--no-verify', action='store_true', help='import without the verification scan')
+    parser.add_argument('--recursive', action='store_true', help='verify channel subfolders too')
+    parser.add_argument('--workers', type=int, default=8, help='concurrent probes during verification')
+    args = parser.parse_args()
+
+    db = DbHandler(args.db, enable_wal=True)
+    db.init_db()
+    try:
+        if args.command == 'export':
+            result = export_snapshot(db, args.root, args.snapshot)
+            print(f"Exported {result['videos']:,} videos in {result['channels']} channels "
+                  f"({result['skipped']} outside {args.root})")
+        else:
+            result = import_snapshot(db, args.root, args.snapshot, verify=not args.no_verify,
+                                     recursive=args.recursive, workers=args.workers)
+            print(f"Imported {result['videos']:,} videos in {result['channels']} channels")
+            summary = result['verification']
+            if summary:
+                print(f"Verified: {summary['files_unchanged']} unchanged, {summary['files_scanned']} re-probed, "
+                      f"{summary['files_removed']} removed, {summary['files_failed']} failed")
+    finally:
+        db.close()
+
+
+if __name__ == '__main__':
+    main()
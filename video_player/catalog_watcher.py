@@ -0,0 +1,187 @@
+# catalog_watcher.py
+"""
+Keeps the 'videos' catalog in sync with the channel folders while the player runs.
+
+Filesystem events (inotify on Linux, via the optional 'watchdog' package) are
+collected per path and applied once the folder has been quiet for
+'debounce_seconds', so a large copy produces one probe per file rather than one
+per write. Added or changed files are probed and upserted; removed files are
+deleted from the catalog.
+"""
+import threading
+import time
+from pathlib import Path
+from typing import Iterable, Optional
+
+from DBHandler import DbHandler
+from video_duration_sum import VIDEO_EXTS
+
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:  # optional dependency: watching is simply unavailable
+    Observer = None
+    FileSystemEventHandler = object
+
+
+CHANGED = "changed"
+REMOVED = "removed"
+
+
+class _EventHandler(FileSystemEventHandler):
+    """Forwards watchdog events for files to CatalogWatcher.notify"""
+
+    def __init__(self, watcher: "CatalogWatcher"):
+        super().__init__()
+        self.watcher = watcher
+
+    def on_created(self, event):
+        if not event.is_directory:
+            self.watcher.notify(event.src_path)
+
+    def on_modified(self, event):
+        if not event.is_directory:
+            self.watcher.notify(event.src_path)
+
+    def on_closed(self, event):
+        if not event.is_directory:
+            self.watcher.notify(event.src_path)
+
+    def on_deleted(self, event):
+        if not event.is_directory:
+            self.watcher.notify(event.src_path, removed=True)
+
+    def on_moved(self, event):
+        if not event.is_directory:
+            self.watcher.notify(event.src_path, removed=True)
+            self.watcher.notify(event.dest_path)
+
+
+class CatalogWatcher:
+    """Watches channel subfolders of 'root_folder' and applies changes to the catalog"""
+
+    def __init__(self,
+                 db: DbHandler,
+                 root_folder: str | Path,
+                 channel_names: Iterable[str],
+                 debounce_seconds: float = 2.0,
+                 probe_timeout: Optional[float] = None,
+                 use_stream_duration: bool = False):
+        self.db = db
+        # Not resolved: event paths must match the form the scan stored in 'videos'
+        self.root = Path(root_folder)
+        self.channel_names = list(channel_names)
+        self.debounce_seconds = debounce_seconds
+        self.probe_timeout = probe_timeout
+        self.use_stream_duration = use_stream_duration
+
+        self._pending: dict[Path, str] = {}
+        self._last_event = 0.0
+        self._cond = threading.Condition()
+        self._stopping = False
+        self._observer = None
+        self._flusher: Optional[threading.Thread] = None
+
+    @staticmethod
+    def available() -> bool:
+        """True if the optional 'watchdog' package is installed"""
+        return Observer is not None
+
+    def start(self) -> None:
+        """Starts watching. Raises RuntimeError if 'watchdog' is not installed."""
+        if Observer is None:
+            raise RuntimeError("catalog watching requires the 'watchdog' package")
+        self._stopping = False
+        self._observer = Observer()
+        handler = _EventHandler(self)
+        for ch_name in self.channel_names:
+            ch_path = self.root / ch_name
+            if ch_path.is_dir():
+                self._observer.schedule(handler, str(ch_path), recursive=False)
+        self._observer.start()
+        self._flusher = threading.Thread(target=self._flush_loop, name="CatalogWatcher", daemon=True)
+        self._flusher.start()
+
+    def stop(self) -> None:
+        """Stops watching; changes still waiting for their debounce are applied first."""
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+            self._observer = None
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        if self._flusher is not None:
+            self._flusher.join()
+            self._flusher = None
+
+    def notify(self, path: str | Path, removed: bool = False) -> None:
+        """Records a change to 'path'; the latest event for a path wins."""
+        path = Path(path)
+        if path.suffix.lower() not in VIDEO_EXTS:
+            return
+        with self._cond:
+            self._pending[path] = REMOVED if removed else CHANGED
+            self._last_event = time.monotonic()
+            self._cond.notify_all()
+
+    def _flush_loop(self) -> None:
+        while True:
+            with self._cond:
+                while not self._pending and not self._stopping:
+                    self._cond.wait()
+                # Wait for the burst to go quiet
+                while self._pending and not self._stopping:
+                    quiet_for = time.monotonic() - self._last_event
+                    if quiet_for >= self.debounce_seconds:
+                        break
+                    self._cond.wait(self.debounce_seconds - quiet_for)
+                changes, self._pending = self._pending, {}
+                stopping = self._stopping
+            if changes:
+                try:
+                    self.flush(changes)
+                except Exception as e:
+                    print(f"Catalog watcher: failed to apply {len(changes)} change(s): {e}")
+            if stopping:
+                return
+
+    def _channel_of(self, path: Path) -> Optional[str]:
+        """Name of the watched channel folder directly containing 'path', if any."""
+        if path.parent.parent != self.root:
+            return None
+        return path.parent.name if path.parent.name in self.channel_names else None
+
+    def flush(self, changes: dict[Path, str]) -> dict:
+        """
+        Applies a batch of {path: 'changed' | 'removed'} to the catalog.
+        Returns a summary dict: { 'upserted': int, 'deleted': int, 'failed': int }.
+        """
+        removed = [p for p, kind in changes.items() if kind == REMOVED or not p.is_file()]
+        changed = [p for p, kind in changes.items() if kind == CHANGED and p.is_file()]
+
+        rows = []
+        failures = []
+        for path in changed:
+            ch_name = self._channel_of(path)
+            if ch_name is None:
+                continue
+            try:
+                stat = path.stat()
+            except OSError:
+                stat = None
+            outcome = self.db.probe_file(path, stat.st_size if stat else None,
+                                         self.use_stream_duration, self.probe_timeout)
+            if outcome.probe is None:
+                # Often still being written; the next event for it retries
+                failures.append((path, *self.db.file_attrs(stat), outcome.error))
+                continue
+            ch_id = self.db.get_or_create_channel(ch_name, description=f"Auto-discovered in {self.root}")
+            rows.append((ch_id, path, outcome.probe["duration_seconds"], *self.db.file_attrs(stat),
+                         outcome.fingerprint, outcome.probe))
+
+        self.db.upsert_videos(rows)
+        self.db.record_probe_failures(failures)
+        deleted = self.db.delete_videos(removed)
+        self.db.refresh_schedules()
+        return {"upserted": len(rows), "deleted": deleted, "failed": len(failures)}
@@ -6,7 +6,12 @@
 CREATE TABLE IF NOT EXISTS channels (
     Id INTEGER PRIMARY KEY,
     Name TEXT NOT NULL UNIQUE,
-    Description TEXT DEFAULT ''
+    Description TEXT DEFAULT '',
+    FolderMtimeNs INTEGER,                  -- channel folder mtime at the last complete scan
+    TotalSeconds REAL NOT NULL DEFAULT 0,   -- length of one loop of the playlist
+    ScheduleDirty INTEGER NOT NULL DEFAULT 1, -- set by triggers, cleared when offsets are recomputed
+    PlaylistVersion INTEGER NOT NULL DEFAULT 0, -- bumped when offsets are recomputed (keys cached playlists)
+    ScanGeneration INTEGER NOT NULL DEFAULT 0 -- bumped by each scan of the channel folder
 );
 
 -- Videos table: one row per physical file
@@ -19,9 +24,94 @@ CREATE TABLE IF NOT EXISTS videos (
     SizeBytes INTEGER,                      -- file size at scan time
     ModifiedAt TEXT,                        -- ISO8601 timestamp (filesystem mtime)
     ScannedAt TEXT DEFAULT CURRENT_TIMESTAMP,
+    Fingerprint TEXT,                       -- size + hash of first/last 2 MiB (see probe_cache)
+    StartOffsetSeconds REAL,                -- start within the channel loop (play order: FileName, Id)
+    Container TEXT,                         -- media metadata from the same probe as the duration
+    VideoCodec TEXT,
+    AudioCodec TEXT,
+    Width INTEGER,
+    Height INTEGER,
+    FrameRate REAL,
+    HasAudio INTEGER,
+    BitRate INTEGER,
+    ScanGeneration INTEGER NOT NULL DEFAULT 0, -- last channel scan that saw the file; older rows are swept
+    Health TEXT,                            -- decode check: 'ok', 'quarantined' or NULL (not checked since it changed)
+    HealthError TEXT,                       -- first decode error of a quarantined file
+    HealthCheckedAt TEXT,
     FOREIGN KEY (ChannelId) REFERENCES channels(Id) ON DELETE CASCADE
 );
 
--- Helpful indexes
-CREATE INDEX IF NOT EXISTS idx_videos_channel ON videos(ChannelId);
-CREATE UNIQUE INDEX IF NOT EXISTS idx_videos_path ON videos(Path);
+-- Helpful indexes (Path is indexed by its UNIQUE constraint; lookups by ChannelId use
+-- idx_videos_schedule)
+CREATE INDEX IF NOT EXISTS idx_videos_fingerprint ON videos(Fingerprint);
+CREATE INDEX IF NOT EXISTS idx_videos_schedule ON videos(ChannelId, StartOffsetSeconds);
+-- Playlist order without a sort (not covering for the playlist query, which reads each
+-- row for its other columns); covers the schedule's running-sum query
+CREATE INDEX IF NOT EXISTS idx_videos_playlist ON videos(ChannelId, FileName, Id, DurationSeconds, Health);
+
+-- Schedule maintenance: triggers only flag the channel, on any change to what its playlist
+-- returns; DbHandler.refresh_schedules() recomputes StartOffsetSeconds (running SUM window)
+-- and TotalSeconds for dirty channels and bumps their PlaylistVersion.
+-- Quarantined videos are left out of the schedule.
+CREATE TRIGGER IF NOT EXISTS trg_videos_schedule_insert AFTER INSERT ON videos
+BEGIN
+    UPDATE channels SET ScheduleDirty = 1 WHERE Id = NEW.ChannelId AND ScheduleDirty = 0;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_videos_schedule_delete AFTER DELETE ON videos
+BEGIN
+    UPDATE channels SET ScheduleDirty = 1 WHERE Id = OLD.ChannelId AND ScheduleDirty = 0;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_videos_schedule_update
+AFTER UPDATE OF ChannelId, FileName, DurationSeconds, Health, Path, SizeBytes, ModifiedAt, ScannedAt,
+    Fingerprint, Container, VideoCodec, AudioCodec, Width, Height, FrameRate, HasAudio, BitRate
+ON videos
+WHEN OLD.ChannelId IS NOT NEW.ChannelId
+  OR OLD.FileName IS NOT NEW.FileName
+  OR OLD.DurationSeconds IS NOT NEW.DurationSeconds
+  OR (OLD.Health IS 'quarantined') IS NOT (NEW.Health IS 'quarantined')
+  OR OLD.Path IS NOT NEW.Path OR OLD.SizeBytes IS NOT NEW.SizeBytes
+  OR OLD.ModifiedAt IS NOT NEW.ModifiedAt OR OLD.ScannedAt IS NOT NEW.ScannedAt
+  OR OLD.Fingerprint IS NOT NEW.Fingerprint OR OLD.Container IS NOT NEW.Container
+  OR OLD.VideoCodec IS NOT NEW.VideoCodec OR OLD.AudioCodec IS NOT NEW.AudioCodec
+  OR OLD.Width IS NOT NEW.Width OR OLD.Height IS NOT NEW.Height
+  OR OLD.FrameRate IS NOT NEW.FrameRate OR OLD.HasAudio IS NOT NEW.HasAudio
+  OR OLD.BitRate IS NOT NEW.BitRate
+BEGIN
+    UPDATE channels SET ScheduleDirty = 1
+    WHERE Id IN (OLD.ChannelId, NEW.ChannelId) AND ScheduleDirty = 0;
+END;
+
+-- Probe results by content fingerprint: moved/renamed files reuse them instead of re-probing.
+-- Entries no videos row references are evicted after scans.
+CREATE TABLE IF NOT EXISTS probe_cache (
+    Fingerprint TEXT PRIMARY KEY,
+    DurationSeconds REAL NOT NULL,
+    Probe TEXT NOT NULL,                    -- JSON probe result
+    CachedAt TEXT DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Negative cache: files that failed probing. Scans skip a file while its size/mtime are
+-- unchanged and RetryAfter (epoch seconds, exponential back-off) has not passed.
+CREATE TABLE IF NOT EXISTS probe_failures (
+    Path TEXT PRIMARY KEY,
+    SizeBytes INTEGER,
+    ModifiedAt TEXT,
+    Error TEXT,
+    FailureCount INTEGER NOT NULL DEFAULT 1,
+    FirstFailedAt TEXT DEFAULT CURRENT_TIMESTAMP,
+    LastFailedAt TEXT DEFAULT CURRENT_TIMESTAMP,
+    RetryAfter REAL NOT NULL
+);
+
+-- Keyframe timestamps per video: milliseconds, delta-encoded, packed as little-endian uint32
+-- (keyframe_index.py). A Fingerprint that no longer matches the video's marks a stale index;
+-- an empty Data blob marks a file that could not be indexed.
+CREATE TABLE IF NOT EXISTS keyframes (
+    VideoId INTEGER PRIMARY KEY REFERENCES videos(Id) ON DELETE CASCADE,
+    Fingerprint TEXT,
+    KeyframeCount INTEGER NOT NULL,
+    Data BLOB NOT NULL,
+    IndexedAt TEXT DEFAULT CURRENT_TIMESTAMP
+);
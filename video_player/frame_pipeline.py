@@ -0,0 +1,313 @@
+# frame_pipeline.py
+"""
+Decoding off the UI thread.
+
+FrameProducer pulls frames from a player (ffpyplayer MediaPlayer interface: get_frame)
+on its own thread, sleeping as the player asks between frames, and hands them to the UI
+thread through a FrameQueue: a bounded ring of preallocated slots. The UI loop then only
+handles events and presents whatever frames are queued, so key presses never wait behind
+a slow frame or a sleep. A full queue holds the producer back (the decoder's own queues
+then fill and it pauses); an empty queue when the UI wants a frame is an underrun.
+
+A producer given a start pts decodes on to it: a player opened with a start time begins
+at the keyframe before it, so when the first frame is early the producer seeks
+accurately to the start pts and discards the frames before it, instead of playing the
+stream from the keyframe (up to a GOP behind). The seek waits for that first frame, as
+the stream must be open to be sought.
+
+Queue depth and producer latency (time spent in get_frame) are kept in
+FrameProducer.stats() for tuning; underruns are counted by the FramePresenter, which is
+what takes frames off the queue.
+
+FramePresenter decides when the UI shows each queued frame: at its pts, mapped onto a
+monotonic master clock, no faster than a maximum frame rate, and skipping frames that are
+already too late when a newer one is waiting. sleep_until() then waits for the deadline
+precisely. This module does not depend on pygame or ffpyplayer.
+"""
+import threading
+import time
+from typing import Any, Callable, NamedTuple, Optional
+
+# Queued after the last frame when the player reports end of file
+END_OF_STREAM = object()
+
+IDLE_POLL_SECONDS = 0.005   # between get_frame calls that returned no frame and no delay
+MAX_SLEEP_SECONDS = 0.1     # cap on the player's requested delay, so stop() is honoured quickly
+SPIN_SECONDS = 0.002        # sleep_until() yields instead of sleeping for the last stretch
+RESYNC_SECONDS = 1.0        # a frame this far from its expected time re-anchors the clock (seek, stall)
+START_TOLERANCE_SECONDS = 0.25  # a first frame this close before the start pts is not sought past
+
+
+class Frame(NamedTuple):
+    image: Any          # decoder image (ffpyplayer.pic.Image)
+    pts: float          # presentation time in the stream, seconds
+    decoded_at: float   # time.perf_counter() when get_frame returned it
+
+
+class FrameQueue:
+    """
+    Bounded single-producer, single-consumer FIFO over a ring of 'depth' slots allocated
+    up front. put() blocks while the queue is full; get() never blocks.
+    """
+
+    def __init__(self, depth: int):
+        if depth < 1:
+            raise ValueError("depth must be at least 1")
+        self._slots: list[Any] = [None] * depth
+        self._head = 0
+        self._count = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+    @property
+    def depth(self) -> int:
+        return len(self._slots)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def put(self, item: Any, timeout: Optional[float] = None) -> bool:
+        """Appends 'item', waiting for a free slot; False if the queue was closed or 'timeout' passed."""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._closed or self._count < len(self._slots), timeout):
+                return False
+            if self._closed:
+                return False
+            self._slots[(self._head + self._count) % len(self._slots)] = item
+            self._count += 1
+            return True
+
+    def get(self) -> Optional[Any]:
+        """Removes and returns the oldest item, or None when the queue is empty."""
+        with self._cond:
+            if self._count == 0:
+                return None
+            item = self._slots[self._head]
+            self._slots[self._head] = None
+            self._head = (self._head + 1) % len(self._slots)
+            self._count -= 1
+            self._cond.notify()
+            return item
+
+    def peek(self, index: int = 0) -> Optional[Any]:
+        """The item 'index' places from the oldest, without removing it; None if there is none."""
+        with self._cond:
+            if index >= self._count:
+                return None
+            return self._slots[(self._head + index) % len(self._slots)]
+
+    def close(self) -> None:
+        """Empties the queue and wakes a blocked put(), which then returns False."""
+        with self._cond:
+            self._closed = True
+            for i in range(len(self._slots)):
+                self._slots[i] = None
+            self._count = 0
+            self._cond.notify_all()
+
+
+class FrameProducer:
+    """
+    Decodes frames from 'player' into a FrameQueue of 'depth' frames on a background
+    thread, from 'start_pts' on when given (earlier frames are skipped, see above)
+    """
+
+    def __init__(self, player: Any, depth: int = 8, start_pts: Optional[float] = None):
+        self.player = player
+        self.queue = FrameQueue(depth)
+        self.start_pts = start_pts
+        self.eof = False
+        self.error: Optional[str] = None
+        self._stop = threading.Event()
+        self._produced = 0
+        self._skipped = 0
+        self._sought = False
+        self._calls = 0
+        self._max_depth = 0
+        self._latency_total = 0.0
+        self._latency_max = 0.0
+        self._thread = threading.Thread(target=self._run, name="FrameProducer", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        try:
+            while not self._stop.is_set():
+                started = time.perf_counter()
+                frame, val = self.player.get_frame()
+                decoded_at = time.perf_counter()
+                latency = decoded_at - started
+                self._calls += 1
+                self._latency_total += latency
+                self._latency_max = max(self._latency_max, latency)
+                if val == 'eof':
+                    self.eof = True
+                    self.queue.put(END_OF_STREAM)
+                    return
+                if frame is not None:
+                    image, pts = frame
+                    if self.start_pts is not None:
+                        if pts < self.start_pts - START_TOLERANCE_SECONDS:
+                            if not self._sought:
+                                self._sought = True
+                                self.player.seek(self.start_pts, relative=False, accurate=True)
+                            self._skipped += 1
+                            continue
+                        self.start_pts = None
+                    if not self.queue.put(Frame(image, pts, decoded_at)):
+                        return
+                    self._produced += 1
+                    self._max_depth = max(self._max_depth, len(self.queue))
+                # The player's val is the delay before its next frame is due ('paused' etc. otherwise)
+                delay = val if isinstance(val, (int, float)) and val > 0 else IDLE_POLL_SECONDS
+                self._stop.wait(min(delay, MAX_SLEEP_SECONDS))
+        except Exception as e:
+            self.error = str(e)
+            self.eof = True
+            self.queue.put(END_OF_STREAM, timeout=1.0)
+
+    def stop(self, timeout: Optional[float] = 1.0) -> None:
+        """Stops the thread; the player can be closed afterwards."""
+        self._stop.set()
+        self.queue.close()
+        if self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+
+    def stats(self) -> dict:
+        """
+        { 'depth': frames queued now, 'max_depth': most queued at once, 'capacity': queue
+          depth, 'produced': frames decoded, 'skipped': frames before the start pts,
+          'producer_latency_ms': mean time per get_frame call, 'producer_latency_max_ms' }
+        """
+        calls = max(self._calls, 1)
+        return {
+            "depth": len(self.queue),
+            "max_depth": self._max_depth,
+            "capacity": self.queue.depth,
+            "produced": self._produced,
+            "skipped": self._skipped,
+            "producer_latency_ms": self._latency_total / calls * 1000,
+            "producer_latency_max_ms": self._latency_max * 1000,
+        }
+
+
+def sleep_until(deadline: float, clock: Callable[[], float] = time.monotonic) -> None:
+    """Sleeps until clock() reaches 'deadline': a regular sleep, then yielding for the last few ms."""
+    remaining = deadline - clock()
+    if remaining > SPIN_SECONDS:
+        time.sleep(remaining - SPIN_SECONDS)
+    while clock() < deadline:
+        time.sleep(0)
+
+
+class FramePresenter:
+    """
+    Picks the frame to show from a FrameQueue by presentation time.
+
+    The first frame after start() anchors the stream's pts to the master clock (monotonic
+    by default); every later frame is due at anchor + (pts - anchor pts). Streams faster
+    than 'max_fps' are held to it: a frame is due no sooner than 1 / max_fps after the
+    previous one shown, and is dropped if the frame after it is due by then. A frame more
+    than 'late_threshold' seconds past its pts is dropped when a newer frame is already
+    queued, and shown anyway (counted as late) when it is the newest. A pts jump of more
+    than RESYNC_SECONDS (a seek, a long stall) re-anchors the clock. An empty queue a
+    frame period (plus 'late_threshold') after the last frame shown counts as an underrun.
+    A stream whose first frame was already shown from elsewhere (a pre-rolled player) is
+    started with that frame's pts: the clock is anchored to it, and queued frames up to it
+    are skipped rather than shown a second time.
+    """
+
+    def __init__(self,
+                 late_threshold: float = 0.05,
+                 max_fps: Optional[float] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        self.late_threshold = late_threshold
+        self.max_fps = max_fps
+        self.clock = clock
+        self.min_interval = 0.0
+        self._frame_period: Optional[float] = None
+        self._starved = False
+        self._anchor: Optional[tuple[float, float]] = None     # (clock time, pts)
+        self._last_shown: Optional[float] = None
+        self._shown_pts: Optional[float] = None                 # skip queued frames up to this pts
+        self.presented = 0
+        self.dropped = 0
+        self.late = 0
+        self.underruns = 0
+
+    def start(self, fps: Optional[float] = None, shown_pts: Optional[float] = None) -> None:
+        """
+        Begins a new stream of 'fps' frames per second (None: unknown): the next frame is
+        shown at once and anchors the clock. With 'shown_pts', the frame at that pts was
+        just shown: it anchors the clock instead, and is not shown again.
+        """
+        throttle = self.max_fps and (fps is None or fps > self.max_fps)
+        self.min_interval = 1.0 / self.max_fps if throttle else 0.0
+        self._frame_period = 1.0 / fps if fps else None
+        self._starved = False
+        self._anchor = None
+        self._last_shown = None
+        self._shown_pts = shown_pts
+        if shown_pts is not None:
+            now = self.clock()
+            self._anchor = (now, shown_pts)
+            self._last_shown = now
+
+    def _pts_due(self, frame: Frame, now: float) -> float:
+        """When 'frame' is due by its pts alone, anchoring (or re-anchoring) the clock as needed"""
+        if self._anchor is None:
+            self._anchor = (now, frame.pts)
+        anchor_time, anchor_pts = self._anchor
+        due = anchor_time + (frame.pts - anchor_pts)
+        if abs(due - now) > RESYNC_SECONDS:
+            self._anchor = (now, frame.pts)
+            due = now
+        return due
+
+    def next(self, queue: FrameQueue) -> tuple[Optional[Any], Optional[float]]:
+        """
+        (item to show now, seconds until the next deadline). The item is a Frame,
+        END_OF_STREAM once every frame before it was handled, or None when nothing is due
+        yet; the wait is 0 when an item is returned and None when the queue is empty.
+        """
+        now = self.clock()
+        while True:
+            head = queue.peek()
+            if head is None:
+                if (not self._starved and self._last_shown is not None and self._frame_period
+                        and now - self._last_shown > self._frame_period + self.late_threshold):
+                    self._starved = True
+                    self.underruns += 1
+                return None, None
+            if head is END_OF_STREAM:
+                return queue.get(), 0.0
+            if self._shown_pts is not None:
+                if head.pts <= self._shown_pts:
+                    queue.get()
+                    continue
+                self._shown_pts = None
+            pts_due = self._pts_due(head, now)
+            due = pts_due
+            if self._last_shown is not None and self.min_interval:
+                due = max(due, self._last_shown + self.min_interval)
+            if due > now:
+                return None, due - now
+            late = now - pts_due > self.late_threshold
+            newer = queue.peek(1)
+            if isinstance(newer, Frame):
+                # Throttled streams skip a frame whose successor is already due as well
+                superseded = bool(self.min_interval) and self._pts_due(newer, now) <= now
+                if late or superseded:
+                    queue.get()
+                    self.dropped += 1
+                    continue
+            if late:
+                self.late += 1
+            self.presented += 1
+            self._last_shown = now
+            self._starved = False
+            return queue.get(), 0.0
+
+    def stats(self) -> dict:
+        """{ 'presented': int, 'dropped': late frames skipped, 'late': late frames shown, 'underruns': int }"""
+        return {"presented": self.presented, "dropped": self.dropped, "late": self.late,
+                "underruns": self.underruns}
@@ -0,0 +1,98 @@
+# integrity.py
+"""
+Decode checks for catalogued videos.
+
+A file can report a valid container duration and still fail part way through decoding.
+decode_check() decodes the whole file with ffmpeg (discarding the output) and reports
+the first decode error; DbHandler.verify_integrity() runs it over the catalog in a
+process pool at low CPU priority and quarantines the files that fail.
+"""
+import os
+import shutil
+import signal
+import subprocess
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+HEALTH_OK = "ok"
+HEALTH_QUARANTINED = "quarantined"
+
+# Niceness added to verification workers and their ffmpeg processes (POSIX)
+NICE_INCREMENT = 10
+
+_FFMPEG = shutil.which("ffmpeg")
+
+
+def available() -> bool:
+    """True when ffmpeg is on PATH, so decode checks can run."""
+    return _FFMPEG is not None
+
+
+def lower_priority() -> None:
+    """Process pool initializer: run this worker (and the ffmpeg it starts) at low CPU priority."""
+    if hasattr(os, "nice"):
+        try:
+            os.nice(NICE_INCREMENT)
+        except OSError:
+            pass
+
+
+def init_worker() -> None:
+    """
+    Process pool initializer: low CPU priority, and (POSIX) a process group of its own, so
+    terminate_workers() also ends the ffmpeg the worker started.
+    """
+    lower_priority()
+    if hasattr(os, "setpgid"):
+        try:
+            os.setpgid(0, 0)
+        except OSError:
+            pass
+
+
+def terminate_workers(pool: ProcessPoolExecutor) -> None:
+    """
+    Shuts down a pool of init_worker() processes without waiting: queued jobs are
+    cancelled, and running ones are ended with their worker processes and (POSIX) the
+    ffmpeg processes those started. Used on shutdown, where a whole-file decode or
+    transcode could otherwise hold up the exit for as long as it takes.
+    """
+    # The executor has no public way to end running jobs: its workers are ended directly
+    processes = list((getattr(pool, "_processes", None) or {}).values())
+    pool.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        try:
+            if hasattr(os, "killpg"):
+                os.killpg(process.pid, signal.SIGTERM)
+            else:
+                process.terminate()
+        except OSError:
+            pass
+    for process in processes:
+        process.join(timeout=1.0)
+
+
+def decode_check(path: str, timeout: Optional[float] = None) -> tuple[Optional[str], Optional[str]]:
+    """
+    Decodes every stream of 'path' and returns (health, error):
+    (HEALTH_OK, None), (HEALTH_QUARANTINED, first error line), or (None, reason) when
+    the check could not be completed (ffmpeg missing, timeout), so it is retried later.
+    """
+    if _FFMPEG is None:
+        return None, "ffmpeg not found on PATH"
+    cmd = [_FFMPEG, "-nostdin", "-v", "error", "-xerror", "-i", str(path), "-f", "null", "-"]
+    kwargs = {}
+    if sys.platform == "win32":
+        kwargs["creationflags"] = subprocess.BELOW_NORMAL_PRIORITY_CLASS
+    try:
+        result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                                timeout=timeout, **kwargs)
+    except subprocess.TimeoutExpired:
+        return None, f"decode check timed out after {timeout} s"
+    except OSError as e:
+        return None, str(e)
+    errors = result.stderr.decode(errors="replace").strip()
+    if result.returncode != 0 or errors:
+        return HEALTH_QUARANTINED, errors.splitlines()[0] if errors else f"ffmpeg exited with {result.returncode}"
+    return HEALTH_OK, None
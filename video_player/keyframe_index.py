@@ -0,0 +1,41 @@
+# keyframe_index.py
+"""
+Compact keyframe timestamp arrays, as stored per video in the catalog's 'keyframes' table.
+
+Timestamps are kept in whole milliseconds, delta-encoded (the first value is absolute,
+each later one the gap to its predecessor) and packed as little-endian unsigned 32-bit
+integers: 4 bytes per keyframe, e.g. about 7 KB for a two-hour film with a keyframe
+every 4 seconds.
+"""
+import bisect
+import sys
+from array import array
+from typing import Iterable, Optional
+
+
+def encode_keyframes(times: Iterable[float]) -> bytes:
+    """Packs keyframe times (seconds, any order; negative times count as 0) into a blob."""
+    millis = sorted({max(int(round(t * 1000)), 0) for t in times})
+    deltas = array("I", (b - a for a, b in zip([0] + millis, millis)))
+    if sys.byteorder == "big":
+        deltas.byteswap()
+    return deltas.tobytes()
+
+
+def decode_keyframes(data: bytes) -> list[float]:
+    """Keyframe times in seconds, ascending, from a blob made by encode_keyframes."""
+    deltas = array("I")
+    deltas.frombytes(data)
+    if sys.byteorder == "big":
+        deltas.byteswap()
+    times, t = [], 0
+    for d in deltas:
+        t += d
+        times.append(t / 1000.0)
+    return times
+
+
+def preceding_keyframe(times: list[float], position: float) -> Optional[float]:
+    """Latest keyframe time at or before 'position' (seconds), or None if there is none."""
+    i = bisect.bisect_right(times, position)
+    return times[i - 1] if i else None
@@ -0,0 +1,254 @@
+# mezzanine.py
+"""
+Mezzanine copies of decode-expensive videos.
+
+Some sources (HEVC, high bitrate, 4K or 60 fps) cannot be decoded in real time on modest
+playout hardware: frames arrive late and A/V sync drifts. decode_cost() estimates from the
+catalog metadata how expensive a file is relative to 1080p30 H.264; files over the budget
+are transcoded once with ffmpeg into H.264 tuned for fast decoding (at most 1080p30,
+a keyframe every 2 s, AAC audio) and kept in a MezzanineCache directory.
+
+Copies are named after the source's content fingerprint, so a moved file keeps its copy and
+a changed file gets a new one. The cache is bounded in bytes and evicts the least recently
+played copies first (a copy's mtime is refreshed each time it is played).
+
+    python mezzanine.py db/showsequencer.db mezzanine --max-gb 50 --workers 2
+"""
+import argparse
+import multiprocessing
+import os
+import shutil
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+from typing import Iterable, Optional
+
+from integrity import init_worker, terminate_workers
+
+MEZZANINE_EXT = ".mp4"
+MAX_HEIGHT = 1080
+MAX_FPS = 30
+KEYFRAME_INTERVAL_SECONDS = 2
+
+# Relative decode cost per codec, against H.264 (software decoders)
+CODEC_COST = {
+    "h264": 1.0, "mpeg4": 0.7, "msmpeg4v3": 0.7, "mpeg2video": 0.6, "mjpeg": 0.8,
+    "vp8": 1.1, "vp9": 1.6, "hevc": 2.0, "av1": 2.5, "prores": 1.5,
+}
+# Reference workload of cost 1.0: 1080p at 30 fps, up to REFERENCE_BIT_RATE
+REFERENCE_PIXEL_RATE = 1920 * 1080 * 30
+REFERENCE_BIT_RATE = 20_000_000
+
+_FFMPEG = shutil.which("ffmpeg")
+
+
+def available() -> bool:
+    """True when ffmpeg is on PATH, so mezzanine copies can be made."""
+    return _FFMPEG is not None
+
+
+def decode_cost(row: dict) -> Optional[float]:
+    """
+    Estimated decode cost of a catalog row (Width, Height, FrameRate, VideoCodec, BitRate)
+    relative to 1080p30 H.264; None when the resolution, frame rate or codec is unknown
+    (an HEVC or AV1 source must not be priced as H.264).
+    """
+    if not (row.get("Width") and row.get("Height") and row.get("FrameRate") and row.get("VideoCodec")):
+        return None
+    cost = row["Width"] * row["Height"] * row["FrameRate"] / REFERENCE_PIXEL_RATE
+    cost *= CODEC_COST.get(row["VideoCodec"], 1.0)
+    if row.get("BitRate"):
+        # Entropy decoding grows with the bitrate once it is far above typical
+        cost *= max(1.0, row["BitRate"] / REFERENCE_BIT_RATE)
+    return cost
+
+
+def transcode_command(source: str, target: str) -> list[str]:
+    """ffmpeg arguments writing the mezzanine copy of 'source' to 'target'."""
+    return [
+        _FFMPEG or "ffmpeg", "-nostdin", "-v", "error", "-y", "-i", source,
+        "-map", "0:v:0", "-map", "0:a:0?",
+        "-vf", f"scale=-2:'min(ih,{MAX_HEIGHT})'", "-fpsmax", str(MAX_FPS),
+        "-c:v", "libx264", "-preset", "veryfast", "-tune", "fastdecode", "-crf", "20",
+        "-pix_fmt", "yuv420p",
+        "-force_key_frames", f"expr:gte(t,n_forced*{KEYFRAME_INTERVAL_SECONDS})",
+        "-c:a", "aac", "-b:a", "192k",
+        "-movflags", "+faststart", "-f", "mp4", target,
+    ]
+
+
+def _transcode(job: tuple[str, str, Optional[float]]) -> tuple[str, Optional[str]]:
+    """Runs in a transcode worker process: (source, target, timeout) -> (target, error or None)."""
+    source, target, timeout = job
+    partial = target + ".part"
+    kwargs = {}
+    if sys.platform == "win32":
+        kwargs["creationflags"] = subprocess.BELOW_NORMAL_PRIORITY_CLASS
+    try:
+        result = subprocess.run(transcode_command(source, partial), stdout=subprocess.DEVNULL,
+                                stderr=subprocess.PIPE, timeout=timeout, **kwargs)
+        if result.returncode != 0:
+            errors = result.stderr.decode(errors="replace").strip()
+            return target, errors.splitlines()[0] if errors else f"ffmpeg exited with {result.returncode}"
+        os.replace(partial, target)
+        return target, None
+    except subprocess.TimeoutExpired:
+        return target, f"transcode timed out after {timeout} s"
+    except OSError as e:
+        return target, str(e)
+    finally:
+        if os.path.exists(partial):
+            os.remove(partial)
+
+
+class MezzanineCache:
+    """Directory of mezzanine copies, keyed by source fingerprint, bounded to 'max_bytes' (LRU)"""
+
+    def __init__(self, cache_dir: str | Path, max_bytes: int, decode_budget: float = 1.0):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.decode_budget = decode_budget
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def path_for(self, fingerprint: str) -> Path:
+        return self.cache_dir / f"{fingerprint}{MEZZANINE_EXT}"
+
+    def lookup(self, row: dict) -> Optional[str]:
+        """
+        Path of the mezzanine copy of a catalog row (with Fingerprint), or None. Marks the
+        copy as recently used.
+        """
+        if not row.get("Fingerprint"):
+            return None
+        path = self.path_for(row["Fingerprint"])
+        try:
+            os.utime(path)
+        except OSError:
+            return None
+        return str(path)
+
+    def needs_mezzanine(self, row: dict) -> bool:
+        """True when the row's decode cost exceeds the budget and it has no copy yet."""
+        cost = decode_cost(row)
+        return (cost is not None and cost > self.decode_budget and bool(row.get("Fingerprint"))
+                and not self.path_for(row["Fingerprint"]).exists())
+
+    def size_bytes(self) -> int:
+        """Total size of the finished copies."""
+        return sum(e.stat().st_size for e in os.scandir(self.cache_dir)
+                   if e.is_file() and e.name.endswith(MEZZANINE_EXT))
+
+    def evict(self) -> int:
+        """Deletes least recently used copies until the cache fits max_bytes. Returns the count deleted."""
+        with self._lock:
+            entries = []
+            for e in os.scandir(self.cache_dir):
+                if e.is_file() and e.name.endswith(MEZZANINE_EXT):
+                    st = e.stat()
+                    entries.append((st.st_mtime_ns, st.st_size, e.path))
+            total = sum(size for _, size, _ in entries)
+            deleted = 0
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue  # e.g. open for playback on Windows; try again next time
+                total -= size
+                deleted += 1
+            return deleted
+
+    # How often a build waiting on transcodes checks its stop event
+    STOP_POLL_SECONDS = 0.2
+
+    def build(self,
+              rows: Iterable[dict],
+              workers: int = 1,
+              timeout: Optional[float] = None,
+              stop: Optional[threading.Event] = None) -> dict:
+        """
+        Background stage: transcodes every row over the decode budget that has no copy yet,
+        in a pool of 'workers' low-priority processes (each running one ffmpeg), evicting
+        after each copy. Rows need Path, Fingerprint and the metadata columns (as returned
+        by DbHandler.list_videos). Setting 'stop' ends the stage within STOP_POLL_SECONDS:
+        running transcodes are killed and their partial files removed.
+        Returns { 'transcoded': int, 'failed': int, 'evicted': int, 'elapsed_seconds': float }.
+        """
+        started = time.perf_counter()
+        counts = {"transcoded": 0, "failed": 0, "evicted": 0}
+        jobs = iter([(row["Path"], str(self.path_for(row["Fingerprint"])), timeout)
+                     for row in rows if self.needs_mezzanine(row)])
+        # Spawned rather than forked: the player has decoder and database threads running
+        pool = ProcessPoolExecutor(max_workers=max(workers, 1), initializer=init_worker,
+                                   mp_context=multiprocessing.get_context("spawn"))
+        pending: dict = {}      # future -> target path
+        try:
+            while stop is None or not stop.is_set():
+                while len(pending) < max(workers, 1):
+                    job = next(jobs, None)
+                    if job is None:
+                        break
+                    pending[pool.submit(_transcode, job)] = job[1]
+                if not pending:
+                    break
+                done, _ = wait(pending, timeout=self.STOP_POLL_SECONDS if stop is not None else None,
+                               return_when=FIRST_COMPLETED)
+                for fut in done:
+                    del pending[fut]
+                    target, error = fut.result()
+                    if error is None:
+                        counts["transcoded"] += 1
+                        counts["evicted"] += self.evict()
+                    else:
+                        counts["failed"] += 1
+                        print(f"Mezzanine transcode failed for {target}: {error}")
+        finally:
+            if pending:
+                # Stopped: ffmpeg is killed with its worker, which then cannot clean up after it
+                terminate_workers(pool)
+                for target in pending.values():
+                    try:
+                        os.remove(target + ".part")
+                    except OSError:
+                        pass
+            else:
+                pool.shutdown()
+        counts["elapsed_seconds"] = time.perf_counter() - started
+        return counts
+
+
+def main():
+    from DBHandler import DbHandler
+
+    parser = argparse.ArgumentParser(description="Build mezzanine copies of decode-expensive videos")
+    parser.add_argument('db', help='catalog database (e.g. db/showsequencer.db)')
+    parser.add_argument('cache_dir', help='mezzanine cache directory')
+    parser.add_argument('--max-gb', type=float, default=50.0, help='cache size limit')
+    parser.add_argument('--budget', type=float, default=1.0, help='decode cost budget (1.0 = 1080p30 H.264)')
+    parser.add_argument('--workers', type=int, default=1, help='concurrent ffmpeg transcodes')
+    parser.add_argument('--dry-run', action='store_true', help='only list the files over the budget')
+    args = parser.parse_args()
+
+    db = DbHandler(args.db)
+    cache = MezzanineCache(args.cache_dir, int(args.max_gb * 1e9), args.budget)
+    try:
+        rows = db.list_videos()
+        if args.dry_run:
+            for row in rows:
+                if cache.needs_mezzanine(row):
+                    print(f"{decode_cost(row):5.2f}  {row['Path']}")
+            return
+        result = cache.build(rows, workers=args.workers)
+        print(f"Transcoded {result['transcoded']} ({result['failed']} failed, {result['evicted']} evicted) "
+              f"in {result['elapsed_seconds']:.1f} s")
+    finally:
+        db.close()
+
+
+if __name__ == '__main__':
+    main()
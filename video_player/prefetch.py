@@ -0,0 +1,274 @@
+# prefetch.py
+"""
+Players opened ahead of time.
+
+Opening a MediaPlayer (demuxer, decoder threads, audio device) and decoding its first frame
+takes long enough to show as a black or frozen gap when it happens at the moment a video
+ends. PreparedPlayer does that work on a background thread while the current video is
+still playing: the player is opened paused and pre-rolled until its first frame is
+decoded, so switching to it is just unpausing it and presenting the frame it already has.
+
+StandbyPool applies the same to channel switching: it keeps a PreparedPlayer at the live
+point of each neighbouring channel and seeks it along as the live point moves on, on a
+thread of its own, so looking up live points never holds up the caller.
+
+The player itself is created by an 'open_player(path, start_time)' callable, which must
+return a paused player (it may open at the keyframe before 'start_time': the pre-roll
+then seeks on to 'start_time', as a stream can only be sought once it is open) with the ffpyplayer MediaPlayer interface (get_frame, set_pause,
+seek, close_player); this module does not depend on ffpyplayer.
+"""
+import threading
+import time
+from typing import Any, Callable, Hashable, Iterable, Optional
+
+PREROLL_POLL_SECONDS = 0.005
+SEEK_TOLERANCE_SECONDS = 0.25   # a frame this close to the seek target is the one sought
+
+
+class PreparedPlayer:
+    """A player for 'path' at 'start_time', opened paused on a background thread with its first frame decoded"""
+
+    def __init__(self,
+                 open_player: Callable[[str, float], Any],
+                 path: str,
+                 start_time: float = 0.0,
+                 preroll_timeout: float = 5.0,
+                 key: Any = None):
+        self.path = path
+        self.start_time = start_time
+        self.key = key                  # caller's tag, e.g. the playlist index or path
+        self.player = None
+        self.first_frame = None         # (image, pts) decoded during pre-roll
+        self.error: Optional[str] = None
+        self.prepare_seconds: Optional[float] = None
+        self.prepared_at = time.monotonic()    # when the player was last put at start_time
+        self._open_player = open_player
+        self._preroll_timeout = preroll_timeout
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._closed = False
+        self._taken = False
+        self._seeking = False
+        self._thread = threading.Thread(target=self._run, name="PreparePlayer", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        started = time.perf_counter()
+        player = None
+        try:
+            player = self._open_player(self.path, self.start_time)
+            frame = self._preroll(player)
+            if frame is not None and frame[1] < self.start_time - SEEK_TOLERANCE_SECONDS:
+                # Opened at the keyframe before start_time: decode on to it
+                player.seek(self.start_time, relative=False, accurate=True)
+                frame = self._preroll(player, self.start_time)
+            self.first_frame = frame
+            if self.first_frame is None and not self._closed:
+                self.error = "no frame decoded during pre-roll"
+        except Exception as e:
+            self.error = str(e)
+        finally:
+            self.prepare_seconds = time.perf_counter() - started
+            with self._lock:
+                if player is not None and (self._closed or self.error):
+                    player.close_player()
+                    player = None
+                self.player = player
+                self._ready.set()
+
+    def _preroll(self, player, target: Optional[float] = None):
+        """Polls the paused player until it has decoded a frame (near 'target' if given); None on timeout or eof"""
+        deadline = time.monotonic() + self._preroll_timeout
+        while not self._closed and time.monotonic() < deadline:
+            # force_refresh: a paused player still hands over its current frame
+            frame, val = player.get_frame(force_refresh=True)
+            if frame is not None and (target is None or abs(frame[1] - target) < SEEK_TOLERANCE_SECONDS):
+                return frame
+            if val == 'eof':
+                break
+            time.sleep(PREROLL_POLL_SECONDS)
+        return None
+
+    def seek(self, start_time: float) -> bool:
+        """
+        Moves the ready, untaken player to 'start_time' and pre-rolls the frame there, on the
+        calling thread; take() hands out nothing meanwhile. False when there is no player to
+        move, or no frame was decoded there (the player is then discarded).
+        """
+        with self._lock:
+            if self._closed or self._taken or self.player is None:
+                return False
+            if abs(start_time - self.start_time) < SEEK_TOLERANCE_SECONDS:
+                # Already there, e.g. the live point moved on within the same GOP
+                self.prepared_at = time.monotonic()
+                return True
+            self._seeking = True
+            player = self.player
+        frame = None
+        try:
+            # Accurate: the sought frame is told apart from the one shown before by its pts
+            player.seek(start_time, relative=False, accurate=True)
+            frame = self._preroll(player, start_time)
+        except Exception as e:
+            self.error = str(e)
+        with self._lock:
+            self._seeking = False
+            if frame is None or self._closed:
+                player.close_player()
+                self.player = None
+                self.error = self.error or "no frame decoded after seek"
+                return False
+            self.first_frame = frame
+            self.start_time = start_time
+            self.prepared_at = time.monotonic()
+            return True
+
+    def done(self) -> bool:
+        """True once preparation has finished, successfully or not."""
+        return self._ready.is_set()
+
+    def ready(self) -> bool:
+        """True once the player is open and pre-rolled (False while preparing or after a failure)."""
+        return self._ready.is_set() and self.player is not None
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Waits until preparation has finished; returns ready()."""
+        self._ready.wait(timeout)
+        return self.ready()
+
+    def take(self) -> Optional[tuple[Any, Any]]:
+        """
+        Hands over (player, first_frame) if ready, else None. The caller then owns the
+        player (still paused) and closes it.
+        """
+        with self._lock:
+            if self._closed or self._taken or self._seeking or self.player is None:
+                return None
+            self._taken = True
+            return self.player, self.first_frame
+
+    def close(self) -> None:
+        """Discards the player unless it was taken; a preparation still running closes it when done."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            if self.player is not None and not self._taken and not self._seeking:
+                self.player.close_player()
+                self.player = None
+
+
+class StandbyPool:
+    """
+    Warm standby players for the channels the viewer may switch to next.
+
+    For each wanted channel a PreparedPlayer is kept paused (so muted) at the channel's
+    live point. Paused players fall behind the wall clock, so every 'refresh_seconds' each
+    is sought to where its channel is live now; a new player is only opened when the live
+    point has moved on to another video. That work runs on the pool's thread, as do the
+    'live_point(channel)' calls, which return (key, path, start_time) for where the channel
+    is live now, or None when it has nothing to play; the key identifies the video (e.g. its
+    catalog path) so the caller can check a promoted standby still matches its playlist.
+    """
+
+    def __init__(self,
+                 open_player: Callable[[str, float], Any],
+                 live_point: Callable[[Hashable], Optional[tuple[Any, str, float]]],
+                 refresh_seconds: float = 2.0,
+                 preroll_timeout: float = 5.0):
+        self._open_player = open_player
+        self._live_point = live_point
+        self.refresh_seconds = refresh_seconds
+        self.preroll_timeout = preroll_timeout
+        self.error: Optional[str] = None        # last failure to find a live point
+        self._standbys: dict[Hashable, PreparedPlayer] = {}
+        self._wanted: frozenset = frozenset()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="StandbyPool", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        while not self._closed:
+            self._wake.clear()
+            self._refresh()
+            self._wake.wait(self.refresh_seconds)
+
+    def _refresh(self) -> None:
+        with self._lock:
+            wanted = self._wanted
+            unwanted = [self._standbys.pop(c) for c in list(self._standbys) if c not in wanted]
+        for prepared in unwanted:
+            prepared.close()
+        for channel in wanted:
+            if self._closed:
+                return
+            with self._lock:
+                current = self._standbys.get(channel)
+            if current is not None and not current.done():
+                continue
+            if current is not None and current.ready() and \
+                    time.monotonic() - current.prepared_at < self.refresh_seconds:
+                continue
+            try:
+                live = self._live_point(channel)
+            except Exception as e:
+                self.error = str(e)
+                continue
+            if live is not None:
+                key, path, start_time = live
+                if current is not None and current.key == key and current.path == path and \
+                        current.seek(start_time):
+                    continue
+            replacement = None
+            if live is not None:
+                replacement = PreparedPlayer(self._open_player, path, start_time, self.preroll_timeout, key=key)
+            with self._lock:
+                if self._closed or channel not in self._wanted:
+                    previous = replacement
+                else:
+                    previous = self._standbys.pop(channel, None)
+                    if replacement is not None:
+                        self._standbys[channel] = replacement
+            if previous is not None:
+                previous.close()
+
+    def update(self, channels: Iterable[Hashable]) -> None:
+        """
+        Keeps standbys for exactly 'channels' from now on. The standbys are opened, sought
+        and closed on the pool's thread, so this is cheap enough to run every frame.
+        """
+        wanted = frozenset(channels)
+        with self._lock:
+            if wanted == self._wanted:
+                return
+            self._wanted = wanted
+        self._wake.set()
+
+    def promote(self, channel: Hashable) -> Optional[tuple[Any, Any, Any, float]]:
+        """
+        Hands over the channel's standby if one is ready: (key, player, first_frame,
+        age_seconds), the player still paused at where the channel was live 'age_seconds'
+        ago. The caller owns the player. None when there is no ready standby.
+        """
+        with self._lock:
+            standby = self._standbys.pop(channel, None)
+        taken = standby.take() if standby is not None else None
+        if standby is not None:
+            standby.close()
+        if taken is None:
+            return None
+        player, first_frame = taken
+        return standby.key, player, first_frame, time.monotonic() - standby.prepared_at
+
+    def close(self) -> None:
+        """Stops the pool's thread and closes all standbys."""
+        self._closed = True
+        self._wake.set()
+        self._thread.join(timeout=self.preroll_timeout)
+        with self._lock:
+            standbys = list(self._standbys.values())
+            self._standbys.clear()
+        for prepared in standbys:
+            prepared.close()
@@ -0,0 +1,274 @@
+# probe_backends.py
+"""
+Backends that read a video file's duration and media metadata in one probe.
+
+- FfpyplayerBackend: in process, through the libav bindings shipped with ffpyplayer
+  (no process spawn per file)
+- FfprobeBackend: runs the ffprobe executable (resolved on PATH once per backend)
+- FallbackProbeBackend: tries several backends in order
+
+default_probe_backend() returns the in-process backend with ffprobe as fallback,
+or ffprobe alone when ffpyplayer is not installed. The in-process backend only
+reports durations, so a scan through it leaves the metadata keys None; DbHandler
+fills them in afterwards with one ffprobe run per file, in a background pass
+(DbHandler.fill_metadata), so the scan itself spawns no process per file.
+"""
+import json
+import subprocess
+import shutil
+import time
+from pathlib import Path
+from typing import Callable, Optional, TypeVar
+
+try:
+    from ffpyplayer.player import MediaPlayer
+except ImportError:  # optional: ffprobe is used instead
+    MediaPlayer = None
+
+T = TypeVar("T")
+
+
+class ProbeError(Exception):
+    """Raised by ProbeBackend.probe when a file cannot be probed"""
+
+
+# Keys of a probe result besides 'duration_seconds'; None when a backend cannot tell
+METADATA_KEYS = ("container", "video_codec", "audio_codec", "width", "height",
+                 "frame_rate", "has_audio", "bit_rate")
+
+
+def parse_rate(rate) -> Optional[float]:
+    """Frame rate from '30000/1001' or (30000, 1001); None for unknown ('0/0')."""
+    try:
+        num, den = (rate.split("/") if isinstance(rate, str) else rate)
+        num, den = float(num), float(den)
+    except (TypeError, ValueError, AttributeError):
+        return None
+    return num / den if num > 0 and den > 0 else None
+
+
+class ProbeBackend:
+    """Interface for probe backends"""
+
+    name = "base"
+    # False for backends whose results leave every METADATA_KEYS entry None
+    reports_metadata = True
+
+    def probe(self, path: Path, use_stream_duration: bool = False, timeout: Optional[float] = None) -> dict:
+        """
+        Returns { 'duration_seconds': float, <METADATA_KEYS>... } for 'path', or raises ProbeError.
+        - use_stream_duration: duration of the first video stream instead of the container
+        - timeout: seconds to give up after
+        """
+        raise NotImplementedError
+
+    def duration_seconds(self,
+                         path: Path,
+                         use_stream_duration: bool = False,
+                         timeout: Optional[float] = None) -> Optional[float]:
+        """Duration in seconds, or None if the file could not be probed."""
+        try:
+            return self.probe(path, use_stream_duration, timeout)["duration_seconds"]
+        except ProbeError:
+            return None
+
+    def keyframe_times(self, path: Path, timeout: Optional[float] = None) -> list[float]:
+        """Timestamps (seconds) of the first video stream's keyframes, or raises ProbeError."""
+        raise ProbeError(f"{self.name} cannot list keyframes")
+
+    def available(self) -> bool:
+        """False when the backend cannot probe anything here (e.g. its executable is missing)."""
+        return True
+
+
+class FfprobeBackend(ProbeBackend):
+    """Probes by running ffprobe; a probe that exceeds its timeout is killed"""
+
+    name = "ffprobe"
+
+    ENTRIES = ("format=duration,format_name,bit_rate:"
+               "stream=codec_type,codec_name,width,height,avg_frame_rate,r_frame_rate,duration")
+
+    def __init__(self, ffprobe_path: Optional[str] = None):
+        self.ffprobe_path = ffprobe_path or shutil.which("ffprobe")
+
+    def available(self) -> bool:
+        return self.ffprobe_path is not None
+
+    def probe(self, path: Path, use_stream_duration: bool = False, timeout: Optional[float] = None) -> dict:
+        if not self.ffprobe_path:
+            raise ProbeError("ffprobe not found on PATH")
+        # One run reports the container (format=...) and every stream (stream=...):
+        # duration comes from format=duration, or the first video stream's stream=duration
+        cmd = [self.ffprobe_path, "-v", "error", "-show_entries", self.ENTRIES, "-of", "json", str(path)]
+        try:
+            out = subprocess.check_output(cmd, stderr=subprocess.STDOUT, timeout=timeout)
+        except subprocess.TimeoutExpired:
+            raise ProbeError(f"ffprobe timed out after {timeout} s")
+        except subprocess.CalledProcessError as e:
+            raise ProbeError(e.output.decode(errors="replace").strip() or f"ffprobe exited with {e.returncode}")
+        except OSError as e:
+            raise ProbeError(str(e))
+        try:
+            info = json.loads(out.decode(errors="replace"))
+        except ValueError:
+            raise ProbeError("unreadable ffprobe output")
+        return self._result(info, use_stream_duration)
+
+    def keyframe_times(self, path: Path, timeout: Optional[float] = None) -> list[float]:
+        if not self.ffprobe_path:
+            raise ProbeError("ffprobe not found on PATH")
+        # Packets are read without decoding; keyframe packets carry a 'K' flag
+        cmd = [self.ffprobe_path, "-v", "error", "-select_streams", "v:0",
+               "-show_entries", "packet=pts_time,flags", "-of", "csv=p=0", str(path)]
+        try:
+            out = subprocess.check_output(cmd, stderr=subprocess.DEVNULL, timeout=timeout)
+        except subprocess.TimeoutExpired:
+            raise ProbeError(f"ffprobe timed out after {timeout} s")
+        except subprocess.CalledProcessError as e:
+            raise ProbeError(f"ffprobe exited with {e.returncode}")
+        except OSError as e:
+            raise ProbeError(str(e))
+        return self._keyframes(out.decode(errors="replace"))
+
+    @staticmethod
+    def _keyframes(csv: str) -> list[float]:
+        times = []
+        for line in csv.splitlines():
+            pts, _, flags = line.partition(",")
+            if "K" in flags:
+                try:
+                    times.append(float(pts))
+                except ValueError:
+                    continue  # pts_time=N/A
+        if not times:
+            raise ProbeError("no keyframes reported")
+        return sorted(times)
+
+    @staticmethod
+    def _result(info: dict, use_stream_duration: bool) -> dict:
+        fmt = info.get("format", {})
+        streams = info.get("streams", [])
+        video = next((st for st in streams if st.get("codec_type") == "video"), {})
+        audio = next((st for st in streams if st.get("codec_type") == "audio"), None)
+
+        duration = video.get("duration") if use_stream_duration else fmt.get("duration")
+        try:
+            duration = float(duration)
+        except (TypeError, ValueError):
+            raise ProbeError("no duration reported")
+
+        def to_int(value):
+            try:
+                return int(value)
+            except (TypeError, ValueError):
+                return None
+
+        return {
+            "duration_seconds": duration,
+            "container": fmt.get("format_name"),
+            "video_codec": video.get("codec_name"),
+            "audio_codec": audio.get("codec_name") if audio else None,
+            "width": to_int(video.get("width")),
+            "height": to_int(video.get("height")),
+            "frame_rate": parse_rate(video.get("avg_frame_rate")) or parse_rate(video.get("r_frame_rate")),
+            "has_audio": audio is not None,
+            "bit_rate": to_int(fmt.get("bit_rate")),
+        }
+
+
+class FfpyplayerBackend(ProbeBackend):
+    """
+    Probes in process by opening the file with ffpyplayer (libavformat), paused and
+    with every stream disabled so no decoder starts, and reading the container
+    duration. Stream details (codecs, frame size and rate, audio presence, bitrate)
+    are only known once a decoder opens, so every metadata key is None; use
+    FfprobeBackend for them.
+    Per-stream durations are not exposed either, so use_stream_duration raises
+    ProbeError and a FallbackProbeBackend moves on to ffprobe.
+    """
+
+    name = "ffpyplayer"
+    reports_metadata = False
+    DEFAULT_TIMEOUT = 10.0
+    POLL_INTERVAL = 0.002
+
+    @staticmethod
+    def available() -> bool:
+        return MediaPlayer is not None
+
+    def probe(self, path: Path, use_stream_duration: bool = False, timeout: Optional[float] = None) -> dict:
+        if MediaPlayer is None:
+            raise ProbeError("ffpyplayer is not installed")
+        if use_stream_duration:
+            raise ProbeError("ffpyplayer does not report per-stream durations")
+        deadline = time.monotonic() + (timeout if timeout is not None else self.DEFAULT_TIMEOUT)
+        try:
+            player = MediaPlayer(str(path), ff_opts={"paused": True, "an": True, "vn": True, "sn": True})
+        except Exception as e:
+            raise ProbeError(str(e))
+        try:
+            # The file is opened on ffpyplayer's read thread; the duration fills in once it is
+            while True:
+                duration = player.get_metadata().get("duration")
+                if duration:
+                    break
+                if time.monotonic() >= deadline:
+                    raise ProbeError("no duration reported before timeout")
+                time.sleep(self.POLL_INTERVAL)
+            result = dict.fromkeys(METADATA_KEYS)
+            result["duration_seconds"] = float(duration)
+            return result
+        finally:
+            player.close_player()
+
+
+class FallbackProbeBackend(ProbeBackend):
+    """
+    Tries each backend in turn and returns the first successful probe. A timeout is one
+    deadline for the whole call, shared by the backends in order, not given to each.
+    """
+
+    def __init__(self, *backends: ProbeBackend):
+        self.backends = backends
+        self.name = "+".join(b.name for b in backends)
+
+    def _each(self,
+              call: Callable[[ProbeBackend, Optional[float]], T],
+              timeout: Optional[float]) -> T:
+        """call(backend, seconds left) for each backend until one succeeds; ProbeError listing every failure otherwise"""
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        errors = []
+        for backend in self.backends:
+            remaining = max(deadline - time.monotonic(), 0.0) if deadline is not None else None
+            if remaining == 0.0:
+                errors.append(f"{backend.name}: not tried, {timeout} s timeout used up")
+                break
+            try:
+                return call(backend, remaining)
+            except ProbeError as e:
+                errors.append(f"{backend.name}: {e}")
+        raise ProbeError("; ".join(errors))
+
+    def probe(self, path: Path, use_stream_duration: bool = False, timeout: Optional[float] = None) -> dict:
+        return self._each(lambda backend, remaining: backend.probe(path, use_stream_duration, remaining), timeout)
+
+    def duration_seconds(self,
+                         path: Path,
+                         use_stream_duration: bool = False,
+                         timeout: Optional[float] = None) -> Optional[float]:
+        try:
+            return self._each(lambda backend, remaining: backend.probe(path, use_stream_duration, remaining)[
+                "duration_seconds"], timeout)
+        except ProbeError:
+            return None
+
+    def keyframe_times(self, path: Path, timeout: Optional[float] = None) -> list[float]:
+        return self._each(lambda backend, remaining: backend.keyframe_times(path, remaining), timeout)
+
+
+def default_probe_backend() -> ProbeBackend:
+    """In-process probing with ffprobe as fallback, or ffprobe alone without ffpyplayer."""
+    if FfpyplayerBackend.available():
+        return FallbackProbeBackend(FfpyplayerBackend(), FfprobeBackend())
+    return FfprobeBackend()
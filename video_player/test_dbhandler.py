@@ -0,0 +1,1169 @@
+#!/usr/bin/env python3
+"""
+Tests for DbHandler (catalog scanning and queries)
+"""
+
+import gzip
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import DBHandler
+import probe_backends
+from DBHandler import DbHandler
+from catalog_watcher import CatalogWatcher
+from catalog_snapshot import export_snapshot, import_snapshot, read_snapshot
+from video_duration_sum import walk_video_files, iter_video_files
+from mezzanine import MezzanineCache, decode_cost, transcode_command
+from keyframe_index import encode_keyframes, decode_keyframes, preceding_keyframe
+from probe_backends import ProbeBackend, ProbeError, FallbackProbeBackend, FfprobeBackend, FfpyplayerBackend
+
+
+class FakeProbeBackend(ProbeBackend):
+    """
+    Probe backend returning a fixed duration per file and recording what it probed.
+    .mkv files report as 720p HEVC without audio, anything else as 1080p H.264 with AAC.
+    """
+
+    name = "fake"
+
+    def __init__(self, duration=10.0):
+        self.duration = duration
+        self.probed = []
+        self._lock = threading.Lock()
+
+    def probe(self, path, use_stream_duration=False, timeout=None):
+        with self._lock:
+            self.probed.append(Path(path).name)
+        if Path(path).stem.startswith('broken'):
+            raise ProbeError("Invalid data found when processing input")
+        if Path(path).suffix == '.mkv':
+            return {"duration_seconds": self.duration, "container": "matroska,webm",
+                    "video_codec": "hevc", "audio_codec": None, "width": 1280, "height": 720,
+                    "frame_rate": 25.0, "has_audio": False, "bit_rate": 2_000_000}
+        return {"duration_seconds": self.duration, "container": "mov,mp4,m4a,3gp,3g2,mj2",
+                "video_codec": "h264", "audio_codec": "aac", "width": 1920, "height": 1080,
+                "frame_rate": 30000 / 1001, "has_audio": True, "bit_rate": 5_000_000}
+
+    def keyframe_times(self, path, timeout=None):
+        """A keyframe every 2 seconds"""
+        if Path(path).stem.startswith('broken'):
+            raise ProbeError("Invalid data found when processing input")
+        return [i * 2.0 for i in range(int(self.duration // 2) + 1)]
+
+
+class FakeProbeDbHandler(DbHandler):
+    """DbHandler wired to a FakeProbeBackend"""
+
+    def __init__(self, *args, duration=10.0, **kwargs):
+        self.fake_probe = FakeProbeBackend(duration)
+        super().__init__(*args, probe_backend=self.fake_probe, **kwargs)
+
+    @property
+    def probed(self):
+        return self.fake_probe.probed
+
+
+class DurationOnlyBackend(ProbeBackend):
+    """Probe backend reporting only a duration, like the in-process one"""
+
+    name = "duration-only"
+    reports_metadata = False
+
+    def __init__(self, duration=7.0):
+        self.duration = duration
+        self.probed = []
+
+    def probe(self, path, use_stream_duration=False, timeout=None):
+        self.probed.append(Path(path).name)
+        result = dict.fromkeys(probe_backends.METADATA_KEYS)
+        result["duration_seconds"] = self.duration
+        return result
+
+
+def make_library(root, channels=('channel1', 'channel2'), per_channel=3):
+    """Create placeholder video files (with unique content) in channel subfolders"""
+    for ch in channels:
+        ch_path = Path(root) / ch
+        ch_path.mkdir(parents=True, exist_ok=True)
+        for i in range(per_channel):
+            (ch_path / f"video_{i}.mp4").write_text(f"{ch}/video_{i}")
+        (ch_path / "notes.txt").touch()
+
+
+def test_parallel_scan():
+    """Test that a pooled scan stores every file and reports throughput"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        make_library(os.path.join(tmpdir, 'lib'), per_channel=20)
+        db = FakeProbeDbHandler(os.path.join(tmpdir, 'db', 'test.db'))
+        db.init_db()
+
+        summary = db.scan_and_store_durations(os.path.join(tmpdir, 'lib'), workers=4, probe_timeout=5)
+
+        assert summary['files_scanned'] == 40
+        assert summary['by_channel'] == {'channel1': 200.0, 'channel2': 200.0}
+        assert summary['total_seconds'] == 400.0
+        assert summary['files_per_second'] > 0
+        assert len(db.list_videos()) == 40
+        assert 'notes.txt' not in db.probed
+
+        # Pool threads' read connections are closed with the pool, so repeated scans don't pile them up
+        for _ in range(3):
+            db.scan_and_store_durations(os.path.join(tmpdir, 'lib'), workers=4, probe_timeout=5)
+        assert set(db._readers) == {threading.current_thread()}
+        db.close()
+
+        print("✓ Parallel scan test passed")
+
+
+def test_incremental_rescan():
+    """Test that an incremental rescan only probes new or changed files"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        lib = os.path.join(tmpdir, 'lib')
+        make_library(lib)
+        db = FakeProbeDbHandler(os.path.join(tmpdir, 'test.db'))
+        db.init_db()
+
+        first = db.scan_and_store_durations(lib, incremental=True)
+        assert first['files_scanned'] == 6
+
+        # Warm restart on an unchanged library: no probes at all
+        db.probed.clear()
+        warm = db.scan_and_store_durations(lib, incremental=True)
+        assert db.probed == []
+        assert warm['channels_skipped'] == 2
+        assert warm['by_channel'] == first['by_channel']
+
+        # Grow one file and add another: only those two are probed
+        Path(lib, 'channel1', 'video_0.mp4').write_bytes(b'changed')
+        Path(lib, 'channel1', 'video_9.mp4').touch()
+        rescan = db.scan_and_store_durations(lib, incremental=True)
+        assert sorted(db.probed) == ['video_0.mp4', 'video_9.mp4']
+        assert rescan['files_unchanged'] == 2
+        assert rescan['channels_skipped'] == 1
+        assert rescan['by_channel']['channel1'] == 40.0
+        db.close()
+
+        print("✓ Incremental rescan test passed")
+
+
+def test_concurrent_reads_during_writes():
+    """Test that reads on other threads proceed while the writer thread is busy"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db = DbHandler(os.path.join(tmpdir, 'test.db'), enable_wal=True)
+        db.init_db()
+        ch_id = db.get_or_create_channel('channel1')
+        errors = []
+
+        def write_rows():
+            try:
+                for i in range(200):
+                    db.upsert_video(ch_id, Path(tmpdir, f"video_{i:03d}.mp4"), 1.0, 0, None)
+            except Exception as e:
+                errors.append(e)
+
+        def read_rows():
+            try:
+                for _ in range(200):
+                    db.list_videos_by_channelId(ch_id)
+                    db.channel_video_seconds('channel1')
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=write_rows)] + [threading.Thread(target=read_rows) for _ in range(3)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert errors == []
+        assert db.channel_video_seconds('channel1') == 200.0
+        # Same connection is reused by a thread, and a second channel lookup is a read
+        assert db._reader() is db._reader()
+        assert db.get_or_create_channel('channel1') == ch_id
+        db.close()
+
+        # Writes after close() are refused rather than left waiting on a stopped writer
+        try:
+            db.upsert_video(ch_id, Path(tmpdir, "late.mp4"), 1.0, 0, None)
+            assert False, "a closed DbHandler must refuse writes"
+        except RuntimeError:
+            pass
+
+        # A writer that cannot open the database fails the queued writes instead of leaving them waiting
+        db = DbHandler(tmpdir)
+        for _ in range(2):
+            try:
+                db.init_db()
+                assert False, "a directory is not a database"
+            except sqlite3.OperationalError:
+                pass
+        db.close()
+
+        print("✓ Concurrent reads during writes test passed")
+
+
+def test_bulk_upsert():
+    """Test that batched upserts return ids in input order and update in place"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db = DbHandler(os.path.join(tmpdir, 'test.db'))
+        db.init_db()
+        ch_id = db.get_or_create_channel('channel1')
+        rows = [(ch_id, Path(tmpdir, f"video_{i:03d}.mp4"), 5.0, i, None) for i in range(400)]
+
+        ids = db.upsert_videos(rows, batch_size=64)
+        assert len(ids) == 400 and len(set(ids)) == 400
+        assert ids[10] == db.upsert_video(*rows[10])
+
+        # Re-upserting updates existing rows and hands back the same ids
+        updated = [(ch_id, path, 7.0, size, None) for _, path, _, size, _ in reversed(rows)]
+        assert db.upsert_videos(updated) == list(reversed(ids))
+        assert db.channel_video_seconds('channel1') == 2800.0
+        db.close()
+
+        print("✓ Bulk upsert test passed")
+
+
+def test_watcher_flush():
+    """Test that a debounced batch of changes upserts new files and deletes removed ones"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        lib = os.path.join(tmpdir, 'lib')
+        make_library(lib, channels=('channel1',), per_channel=2)
+        db = FakeProbeDbHandler(os.path.join(tmpdir, 'test.db'))
+        db.init_db()
+        db.scan_and_store_durations(lib)
+        watcher = CatalogWatcher(db, lib, ['channel1'])
+
+        added = Path(lib, 'channel1', 'video_new.mkv')
+        added.touch()
+        gone = Path(lib, 'channel1', 'video_0.mp4')
+        gone.unlink()
+        outside = Path(lib, 'elsewhere.mp4')
+        outside.touch()
+
+        watcher.notify(added)
+        watcher.notify(gone, removed=True)
+        watcher.notify(outside)
+        watcher.notify(Path(lib, 'channel1', 'notes.txt'))
+        result = watcher.flush(watcher._pending)
+
+        assert result == {'upserted': 1, 'deleted': 1, 'failed': 0}
+        names = [Path(r['Path']).name for r in db.list_videos()]
+        assert names == ['video_1.mp4', 'video_new.mkv']
+        db.close()
+
+        print("✓ Watcher flush test passed")
+
+
+def test_watcher_live_events():
+    """Test that filesystem events reach the catalog after the debounce delay"""
+    if not CatalogWatcher.available():
+        print("- Watcher live events test skipped (watchdog not installed)")
+        return
+    with tempfile.TemporaryDirectory() as tmpdir:
+        lib = os.path.join(tmpdir, 'lib')
+        make_library(lib, channels=('channel1',), per_channel=1)
+        db = FakeProbeDbHandler(os.path.join(tmpdir, 'test.db'))
+        db.init_db()
+        db.scan_and_store_durations(lib)
+        watcher = CatalogWatcher(db, lib, ['channel1'], debounce_seconds=0.1)
+        watcher.start()
+        try:
+            for i in range(5):
+                Path(lib, 'channel1', f"burst_{i}.mp4").write_bytes(b'x' * 10)
+            Path(lib, 'channel1', 'video_0.mp4').unlink()
+            deadline = time.monotonic() + 5
+            while time.monotonic() < deadline and len(db.list_videos()) != 5:
+                time.sleep(0.05)
+        finally:
+            watcher.stop()
+
+        names = sorted(Path(r['Path']).name for r in db.list_videos())
+        assert names == [f"burst_{i}.mp4" for i in range(5)], names
+        db.close()
+
+        print("✓ Watcher live events test passed")
+
+
+def test_fallback_probe_backend():
+    """Test that the fallback backend moves on when a backend fails"""
+
+    class FailingBackend(ProbeBackend):
+        name = "failing"
+
+        def probe(self, path, use_stream_duration=False, timeout=None):
+            raise ProbeError("cannot open")
+
+    fake = FakeProbeBackend(duration=3.5)
+    backend = FallbackProbeBackend(FailingBackend(), fake)
+    assert backend.duration_seconds(Path('a.mp4')) == 3.5
+    assert fake.probed == ['a.mp4']
+    assert FallbackProbeBackend(FailingBackend()).duration_seconds(Path('a.mp4')) is None
+
+    # Full probes keep the order too: the in-process backend answers scans without metadata
+    quick, full = DurationOnlyBackend(), FakeProbeBackend(duration=3.5)
+    backend = FallbackProbeBackend(quick, full)
+    probe = backend.probe(Path('b.mkv'))
+    assert probe['duration_seconds'] == 7.0 and probe['video_codec'] is None and full.probed == []
+    assert FallbackProbeBackend(FailingBackend(), full).probe(Path('c.mkv'))['video_codec'] == 'hevc'
+
+    # One deadline for the whole call: later backends get what is left of it, or are not tried
+    class SlowBackend(ProbeBackend):
+        name = "slow"
+
+        def __init__(self):
+            self.timeouts = []
+
+        def probe(self, path, use_stream_duration=False, timeout=None):
+            self.timeouts.append(timeout)
+            time.sleep(min(timeout, 0.1))
+            raise ProbeError("timed out")
+    first, second, third = SlowBackend(), SlowBackend(), SlowBackend()
+    started = time.monotonic()
+    try:
+        FallbackProbeBackend(first, second, third).probe(Path('a.mp4'), timeout=0.15)
+        assert False, "every backend fails"
+    except ProbeError as e:
+        assert str(e).endswith("slow: not tried, 0.15 s timeout used up"), str(e)
+    assert time.monotonic() - started < 0.3
+    assert 0.14 < first.timeouts[0] <= 0.15 and 0 < second.timeouts[0] <= 0.05 and third.timeouts == []
+
+    print("✓ Fallback probe backend test passed")
+
+
+class FakeLibavPlayer:
+    """Stands in for ffpyplayer's MediaPlayer in FfpyplayerBackend: metadata fills in after 'polls' calls"""
+
+    instances = []
+
+    def __init__(self, filename, ff_opts=None):
+        if 'missing' in filename:
+            raise OSError("No such file or directory")
+        self.ff_opts = ff_opts
+        self.closed = False
+        self.polls = 0
+        self.metadata = {'duration': 12.5, 'src_vid_size': (0, 0), 'frame_rate': (0, 0)}
+        if 'hang' in filename:
+            self.metadata['duration'] = None
+        FakeLibavPlayer.instances.append(self)
+
+    def get_metadata(self):
+        self.polls += 1
+        return self.metadata if self.polls > 2 else {'duration': None, 'src_vid_size': (0, 0)}
+
+    def close_player(self):
+        self.closed = True
+
+
+def test_ffpyplayer_probe_backend():
+    """Test the in-process backend against a stand-in MediaPlayer: duration, timeouts and errors"""
+    original = probe_backends.MediaPlayer
+    probe_backends.MediaPlayer = FakeLibavPlayer
+    try:
+        backend = FfpyplayerBackend()
+        # Returns as soon as the duration is known, without waiting for a frame size (audio-only files)
+        started = time.monotonic()
+        probe = backend.probe(Path('audio.m4a'), timeout=5)
+        assert time.monotonic() - started < 1
+        assert probe['duration_seconds'] == 12.5
+        assert all(probe[key] is None for key in probe_backends.METADATA_KEYS)
+        player = FakeLibavPlayer.instances[-1]
+        assert player.closed and all(player.ff_opts[k] for k in ('paused', 'an', 'vn', 'sn'))  # no decoder started
+
+        try:
+            backend.probe(Path('hang.mp4'), timeout=0.05)
+            assert False, "no duration within the timeout"
+        except ProbeError as e:
+            assert 'timeout' in str(e)
+        assert FakeLibavPlayer.instances[-1].closed
+        for path, kwargs in (('missing.mp4', {}), ('a.mp4', {'use_stream_duration': True})):
+            try:
+                backend.probe(Path(path), **kwargs)
+                assert False, "probe must fail"
+            except ProbeError:
+                pass
+    finally:
+        probe_backends.MediaPlayer = original
+
+    print("✓ ffpyplayer probe backend test passed")
+
+
+def test_probe_cache_survives_moves():
+    """Test that moved and renamed files reuse the cached probe instead of being probed"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        lib = os.path.join(tmpdir, 'lib')
+        make_library(lib, per_channel=2)
+        db = FakeProbeDbHandler(os.path.join(tmpdir, 'test.db'))
+        db.init_db()
+        db.scan_and_store_durations(lib)
+
+        Path(lib, 'channel1', 'video_0.mp4').rename(Path(lib, 'channel2', 'moved.mp4'))
+        Path(lib, 'channel1', 'video_1.mp4').rename(Path(lib, 'channel1', 'renamed.mp4'))
+        db.probed.clear()
+        summary = db.scan_and_store_durations(lib, incremental=True)
+        assert db.probed == []
+        assert summary['cache_hits'] == 2
+        assert summary['by_channel'] == {'channel1': 10.0, 'channel2': 30.0}
+
+        # Fingerprints still referenced by a row survive eviction; orphans do not
+        db.delete_videos([Path(lib, 'channel2', 'moved.mp4')])
+        assert db.evict_probe_cache() == 1
+        assert db.evict_probe_cache() == 0
+
+        # A fingerprint read that stalls (e.g. network mount) fails the file within its probe timeout
+        stalled = threading.Event()
+        original = DBHandler.content_fingerprint
+        DBHandler.content_fingerprint = lambda path, size: stalled.wait(5)
+        try:
+            started = time.monotonic()
+            outcome = db.probe_file(Path(lib, 'channel1', 'renamed.mp4'), 10, timeout=0.2)
+            assert time.monotonic() - started < 2
+            assert outcome.probe is None and 'timed out' in outcome.error
+        finally:
+            stalled.set()
+            DBHandler.content_fingerprint = original
+        db.close()
+
+        print("✓ Probe cache survives moves test passed")
+
+
+def test_schedule_offsets_and_live_position():
+    """Test that start offsets follow catalog changes and live_position finds the live video"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db = DbHandler(os.path.join(tmpdir, 'test.db'))
+        db.init_db()
+        ch_id = db.get_or_create_channel('channel1')
+        db.upsert_videos([(ch_id, Path(tmpdir, name), dur, 0, None)
+                          for name, dur in (('c.mp4', 30.0), ('a.mp4', 10.0), ('e.mp4', 50.0))])
+
+        offsets = [(Path(r['Path']).name, r['StartOffsetSeconds']) for r in db.list_videos_by_channelId(ch_id)]
+        assert offsets == [('a.mp4', 0.0), ('c.mp4', 10.0), ('e.mp4', 40.0)]
+        assert db.channel_total_seconds(ch_id) == 90.0
+
+        # Insert in the middle, then remove the first: later offsets shift
+        db.upsert_video(ch_id, Path(tmpdir, 'b.mp4'), 5.0, 0, None)
+        db.delete_videos([Path(tmpdir, 'a.mp4')])
+        assert db.refresh_schedules() == 1
+        assert db.refresh_schedules() == 0
+        offsets = [r['StartOffsetSeconds'] for r in db.list_videos_by_channelId(ch_id)]
+        assert offsets == [0.0, 5.0, 35.0]
+
+        live = db.live_position(ch_id, elapsed_seconds=3 * 85.0 + 40.0)
+        assert Path(live['Path']).name == 'e.mp4' and live['OffsetSeconds'] == 5.0
+        live = db.live_position(ch_id, elapsed_seconds=5.0)
+        assert Path(live['Path']).name == 'c.mp4' and live['OffsetSeconds'] == 0.0
+        assert db.live_position(db.get_or_create_channel('empty'), 100.0) is None
+        db.close()
+
+    # Rows committed between the dirty-schedule check and the playlist read never come back unscheduled
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db = DbHandler(os.path.join(tmpdir, 'test.db'), enable_wal=True)
+        db.init_db()
+        ch_id = db.get_or_create_channel('channel1')
+        done = threading.Event()
+
+        def add_videos():
+            for i in range(300):
+                db.upsert_video(ch_id, Path(tmpdir, f"video_{i:03d}.mp4"), 1.0, 0, None)
+            done.set()
+        writer = threading.Thread(target=add_videos)
+        writer.start()
+        while not done.is_set():
+            offsets = [r['StartOffsetSeconds'] for r in db.list_videos_by_channelId(ch_id)]
+            assert None not in offsets and offsets == [float(i) for i in range(len(offsets))], offsets
+            live = db.live_position(ch_id, 0.5)
+            assert live is None or live['OffsetSeconds'] == 0.5
+        writer.join()
+        db.close()
+
+        print("✓ Schedule offsets and live position test passed")
+
+
+def test_playlist_cache():
+    """Test that repeat playlist reads skip SQLite and writes to the channel invalidate them"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db_path = os.path.join(tmpdir, 'test.db')
+        db = DbHandler(db_path)
+        db.init_db()
+        ch_id = db.get_or_create_channel('channel1')
+        db.upsert_videos([(ch_id, Path(tmpdir, name), 10.0, 0, None) for name in ('b.mp4', 'a.mp4')])
+        first = db.list_videos_by_channelId(ch_id)
+        assert [Path(r['Path']).name for r in first] == ['a.mp4', 'b.mp4']
+
+        # The playlist is read in index order without a sort (rows are still looked up for
+        # their other columns); the schedule's running sum is answered from the index alone
+        def plan(sql):
+            return [r['detail'] for r in db._reader().execute("EXPLAIN QUERY PLAN " + sql, (ch_id,))]
+        assert plan(db._PLAYLIST_SQL) == ['SEARCH videos USING INDEX idx_videos_playlist (ChannelId=?)']
+        assert 'SEARCH videos USING COVERING INDEX idx_videos_playlist (ChannelId=?)' in plan(db._START_OFFSETS_SQL)
+
+        reader = db._reader
+        db._reader = None  # a cache hit must not touch a connection
+        assert db.list_videos_by_channelId(ch_id) == first
+        db._reader = reader
+
+        db.upsert_video(ch_id, Path(tmpdir, 'c.mp4'), 5.0, 0, None)
+        assert [r['StartOffsetSeconds'] for r in db.list_videos_by_channelId(ch_id)] == [0.0, 10.0, 20.0]
+
+        # Read connections are read-only
+        try:
+            db._reader().execute("DELETE FROM videos;")
+            assert False, "reader connection accepted a write"
+        except sqlite3.OperationalError:
+            db._reader().rollback()
+
+        # Writes from another process are picked up once the cache is invalidated
+        other = DbHandler(db_path)
+        other.delete_videos([Path(tmpdir, 'a.mp4')])
+        other.close()
+        assert len(db.list_videos_by_channelId(ch_id)) == 3
+        db.invalidate_playlist_cache()
+        assert [Path(r['Path']).name for r in db.list_videos_by_channelId(ch_id)] == ['b.mp4', 'c.mp4']
+        db.close()
+
+        print("✓ Playlist cache test passed")
+
+
+def test_playlist_cache_per_channel():
+    """Test that a cached playlist survives writes that do not change it, and only those"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db = DbHandler(os.path.join(tmpdir, 'test.db'))
+        db.init_db()
+        ch1, ch2 = db.get_or_create_channel('channel1'), db.get_or_create_channel('channel2')
+        a = db.upsert_video(ch1, Path(tmpdir, 'a.mp4'), 10.0, 100, None)
+        b = db.upsert_video(ch1, Path(tmpdir, 'b.mp4'), 10.0, 100, None)
+        db.upsert_video(ch2, Path(tmpdir, 'c.mp4'), 10.0, 100, None)
+        first = db.list_videos_by_channelId(ch1)
+
+        # Keyframes, passed decode checks, probe failures and other channels' rows
+        db.store_keyframes([(a, None, [0.0, 2.0])])
+        db.set_health([(a, 'ok', None), (b, 'ok', None)])
+        db.record_probe_failures([(Path(tmpdir, 'broken.mp4'), 1, None, 'no streams')])
+        db.upsert_video(ch2, Path(tmpdir, 'd.mp4'), 5.0, 100, None)
+        assert db.list_videos_by_channelId(ch1)[0] is first[0]
+        assert len(db.list_videos_by_channelId(ch2)) == 2
+
+        # A changed row of the channel, or a file quarantined, is read again
+        db.upsert_video(ch1, Path(tmpdir, 'b.mp4'), 10.0, 200, None)
+        second = db.list_videos_by_channelId(ch1)
+        assert second[0] is not first[0] and second[1]['SizeBytes'] == 200
+        db.set_health([(a, 'quarantined', 'Invalid data')])
+        assert [Path(r['Path']).name for r in db.list_videos_by_channelId(ch1)] == ['b.mp4']
+        db.close()
+
+        print("✓ Playlist cache per channel test passed")
+
+
+def test_probe_failures_are_skipped_until_changed():
+    """Test that files failing to probe are recorded and not retried until they change"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        lib = os.path.join(tmpdir, 'lib')
+        make_library(lib, channels=('channel1',), per_channel=1)
+        broken = Path(lib, 'channel1', 'broken.mp4')
+        broken.write_text('partial upload')
+        db = FakeProbeDbHandler(os.path.join(tmpdir, 'test.db'))
+        db.init_db()
+
+        first = db.scan_and_store_durations(lib, incremental=True)
+        assert first['files_failed'] == 1
+        failures = db.list_probe_failures()
+        assert [Path(f['Path']).name for f in failures] == ['broken.mp4']
+        assert failures[0]['Error'] == 'Invalid data found when processing input'
+        assert failures[0]['FailureCount'] == 1
+
+        # Unchanged: skipped without probing
+        db.probed.clear()
+        second = db.scan_and_store_durations(lib, incremental=True)
+        assert db.probed == []
+        assert second['files_known_bad'] == 1
+
+        # Forced retry backs off further; a change on disk is probed again
+        db.scan_and_store_durations(lib, incremental=True, retry_failed=True)
+        again = db.list_probe_failures()[0]
+        assert again['FailureCount'] == 2
+        assert again['RetryAfter'] - failures[0]['RetryAfter'] >= db.FAILURE_RETRY_BASE_SECONDS
+        broken.write_text('complete upload, still broken')
+        db.probed.clear()
+        db.scan_and_store_durations(lib, incremental=True)
+        assert db.probed == ['broken.mp4']
+        assert db.list_probe_failures()[0]['FailureCount'] == 1
+
+        # Failures of files that are gone are swept with the channel; a non-recursive scan
+        # leaves those in subfolders it did not look at, and deleting a row drops its failure
+        nested = Path(lib, 'channel1', 'season1', 'broken.mp4')
+        db.record_probe_failures([(nested, 1, None, 'moov atom not found'),
+                                  (Path(lib, 'channel10', 'broken.mp4'), 1, None, 'moov atom not found')])
+        broken.unlink()
+        db.scan_and_store_durations(lib, incremental=True)
+        assert sorted(f['Path'] for f in db.list_probe_failures()) == sorted(
+            [str(nested), str(Path(lib, 'channel10', 'broken.mp4'))])
+        db.delete_videos([nested])
+        assert [f['Path'] for f in db.list_probe_failures()] == [str(Path(lib, 'channel10', 'broken.mp4'))]
+        db.close()
+
+        print("✓ Probe failures skipped until changed test passed")
+
+
+def test_media_metadata_in_catalog():
+    """Test that one probe fills the metadata columns and the library can be queried by format"""
+    info = {
+        "format": {"format_name": "matroska,webm", "duration": "61.5", "bit_rate": "1500000"},
+        "streams": [{"codec_type": "audio", "codec_name": "opus"},
+                    {"codec_type": "video", "codec_name": "vp9", "width": 640, "height": 360,
+                     "avg_frame_rate": "0/0", "r_frame_rate": "24000/1001", "duration": "61.4"}],
+    }
+    probe = FfprobeBackend._result(info, use_stream_duration=False)
+    assert probe['duration_seconds'] == 61.5 and probe['bit_rate'] == 1500000
+    assert (probe['video_codec'], probe['audio_codec'], probe['has_audio']) == ('vp9', 'opus', True)
+    assert (probe['width'], probe['height']) == (640, 360)
+    assert abs(probe['frame_rate'] - 23.976) < 0.001
+    assert FfprobeBackend._result(info, use_stream_duration=True)['duration_seconds'] == 61.4
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        lib = os.path.join(tmpdir, 'lib')
+        make_library(lib, per_channel=2)
+        Path(lib, 'channel2', 'clip.mkv').write_text('channel2/clip')
+        db = FakeProbeDbHandler(os.path.join(tmpdir, 'test.db'))
+        db.init_db()
+        db.scan_and_store_durations(lib)
+
+        hevc = db.list_videos_by_format(video_codec='hevc')
+        assert [(v['Channel'], v['FileName']) for v in hevc] == [('channel2', 'clip.mkv')]
+        assert hevc[0]['HasAudio'] == 0 and hevc[0]['AudioCodec'] is None
+        assert [v['FileName'] for v in db.list_videos_by_format(has_audio=False)] == ['clip.mkv']
+        assert len(db.list_videos_by_format(container='mp4', min_height=1080)) == 4
+        assert db.list_videos_by_format(container='webm', has_audio=True) == []
+
+        playlist = db.list_videos_by_channelId(db.get_or_create_channel('channel2'))
+        assert [(r['Width'], r['Height']) for r in playlist] == [(1280, 720), (1920, 1080), (1920, 1080)]
+        assert playlist[0]['FrameRate'] == 25.0
+
+        # A moved file keeps its metadata through the probe cache; a row of an unchanged
+        # file upserted without a probe keeps the metadata already stored, a changed one not
+        Path(lib, 'channel2', 'clip.mkv').rename(Path(lib, 'channel1', 'clip.mkv'))
+        db.probed.clear()
+        db.scan_and_store_durations(lib, incremental=True)
+        assert db.probed == []
+        moved = db.list_videos_by_format(video_codec='hevc')
+        assert [(v['Channel'], v['Width']) for v in moved] == [('channel1', 1280)]
+        ch1 = db.get_or_create_channel('channel1')
+        stored = next(r for r in db.list_videos_by_channelId(ch1) if r['Path'] == moved[0]['Path'])
+        db.upsert_videos([(ch1, moved[0]['Path'], 99.0, stored['SizeBytes'], stored['ModifiedAt'])])
+        assert db.list_videos_by_format(video_codec='hevc')[0]['DurationSeconds'] == 99.0
+        db.upsert_videos([(ch1, moved[0]['Path'], 99.0, 0, None)])
+        assert db.list_videos_by_format(video_codec='hevc') == []
+        db.close()
+
+        print("✓ Media metadata in catalog test passed")
+
+
+def test_fill_metadata():
+    """Test that a scan through a duration-only backend gets its metadata from a background pass"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        lib = os.path.join(tmpdir, 'lib')
+        make_library(lib, channels=('channel1',), per_channel=2)
+        Path(lib, 'channel1', 'clip.mkv').write_text('channel1/clip')
+        Path(lib, 'channel1', 'broken_meta.mp4').write_text('channel1/broken')
+        metadata = FakeProbeBackend()
+        db = DbHandler(os.path.join(tmpdir, 'test.db'), probe_backend=DurationOnlyBackend(),
+                       metadata_backend=metadata)
+        db.init_db()
+        db.scan_and_store_durations(lib)
+        assert db.list_videos_by_format(video_codec='hevc') == [] and len(db.videos_needing_metadata()) == 4
+
+        # A stop request ends the pass before any probe
+        stop = threading.Event()
+        stop.set()
+        assert db.fill_metadata(stop=stop)['filled'] == 0 and metadata.probed == []
+
+        result = db.fill_metadata(workers=2)
+        assert (result['filled'], result['failed']) == (3, 1)
+        hevc = db.list_videos_by_format(video_codec='hevc')
+        assert [(v['FileName'], v['Width'], v['DurationSeconds']) for v in hevc] == [('clip.mkv', 1280, 7.0)]
+        assert [Path(v['Path']).name for v in db.videos_needing_metadata()] == ['broken_meta.mp4']
+        assert db.list_videos_by_channelId(1)[1]['FrameRate'] == 25.0
+
+        # The probe cache holds the metadata too: a moved copy needs no pass
+        Path(lib, 'channel1', 'clip.mkv').rename(Path(lib, 'channel1', 'clip_moved.mkv'))
+        db.scan_and_store_durations(lib, incremental=True)
+        assert [v['FileName'] for v in db.list_videos_by_format(video_codec='hevc')] == ['clip_moved.mkv']
+
+        # A changed file is read again
+        Path(lib, 'channel1', 'clip_moved.mkv').write_text('channel1/clip, re-encoded')
+        db.scan_and_store_durations(lib, incremental=True, recursive=True)
+        assert sorted(Path(v['Path']).name for v in db.videos_needing_metadata()) == ['broken_meta.mp4', 'clip_moved.mkv']
+
+        # No backend to read metadata with: nothing to do
+        db.metadata_backend = FfprobeBackend(ffprobe_path=None)
+        db.metadata_backend.ffprobe_path = None
+        assert db.fill_metadata() == {'filled': 0, 'failed': 0, 'elapsed_seconds': 0.0}
+        db.close()
+
+        print("✓ Fill metadata test passed")
+
+
+def test_keyframe_index():
+    """Test keyframe encoding, the indexing pass and lookups of the preceding keyframe"""
+    times = [0.0, 4.004, 8.008, 12.5, 7200.0]
+    data = encode_keyframes(reversed(times))
+    assert len(data) == 4 * len(times)
+    assert decode_keyframes(data) == times
+    assert preceding_keyframe(times, 12.4) == 8.008
+    assert preceding_keyframe(times, 12.5) == 12.5
+    assert preceding_keyframe([1.0], 0.5) is None
+    csv = "-0.042,K__\n0.000,___\nN/A,K__\n2.002,K_\n4.004,__\n"
+    assert FfprobeBackend._keyframes(csv) == [-0.042, 2.002]
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        lib = os.path.join(tmpdir, 'lib')
+        make_library(lib, channels=('channel1',), per_channel=2)
+        db = FakeProbeDbHandler(os.path.join(tmpdir, 'test.db'), duration=9.0)
+        db.init_db()
+        db.scan_and_store_durations(lib)
+        Path(lib, 'channel1', 'broken.mp4').write_text('channel1/broken')
+        broken_id = db.upsert_videos([(1, Path(lib, 'channel1', 'broken.mp4'), 9.0, 0, None)])[0]
+
+        result = db.index_keyframes(workers=2)
+        assert (result['indexed'], result['failed']) == (2, 1)
+        video = Path(lib, 'channel1', 'video_0.mp4')
+        assert db.keyframes_for(video) == [0.0, 2.0, 4.0, 6.0, 8.0]
+        assert db.keyframes_for(Path(lib, 'channel1', 'broken.mp4')) is None
+        assert db.index_keyframes()['indexed'] == 0
+        assert db.videos_needing_keyframes() == []
+
+        # New content makes the index stale; deleting the video drops it
+        video.write_text('re-encoded')
+        db.scan_and_store_durations(lib, incremental=True)
+        assert db.keyframes_for(video) is None
+        assert [Path(v['Path']).name for v in db.videos_needing_keyframes()] == ['video_0.mp4']
+        assert db.index_keyframes()['indexed'] == 1 and db.keyframes_for(video)
+        db.delete_videos([video, Path(lib, 'channel1', 'broken.mp4')])
+        count = db._reader().execute("SELECT COUNT(*) FROM keyframes WHERE VideoId = ?;", (broken_id,)).fetchone()[0]
+        assert count == 0
+        db.close()
+
+        print("✓ Keyframe index test passed")
+
+
+def test_reconcile_removes_vanished_files():
+    """Test that scans sweep rows of deleted files but leave skipped and missing folders alone"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        lib = os.path.join(tmpdir, 'lib')
+        make_library(lib, channels=('channel1', 'channel2', 'channel3'), per_channel=3)
+        db = FakeProbeDbHandler(os.path.join(tmpdir, 'test.db'))
+        db.init_db()
+        db.scan_and_store_durations(lib, incremental=True)
+
+        def names(channel):
+            return [Path(r['Path']).name for r in db.list_videos_by_channelId(db.get_or_create_channel(channel))]
+
+        # channel1: one file deleted, one turned unprobeable (its last good row is kept)
+        Path(lib, 'channel1', 'video_0.mp4').unlink()
+        Path(lib, 'channel1', 'video_1.mp4').rename(Path(lib, 'channel1', 'broken.mp4'))
+        Path(lib, 'channel1', 'video_2.mp4').write_text('re-encoded')
+        db.upsert_videos([(db.get_or_create_channel('channel1'), Path(lib, 'channel1', 'broken.mp4'), 10.0, 0, None)])
+        # channel2: folder gone (e.g. unmounted share); channel3 unchanged
+        Path(lib, 'channel2').rename(Path(tmpdir, 'offline'))
+
+        summary = db.scan_and_store_durations(lib, incremental=True)
+        assert summary['files_removed'] == 2
+        assert names('channel1') == ['broken.mp4', 'video_2.mp4']
+        assert names('channel2') == ['video_0.mp4', 'video_1.mp4', 'video_2.mp4']
+        assert names('channel3') == ['video_0.mp4', 'video_1.mp4', 'video_2.mp4']
+        assert db.channel_total_seconds(db.get_or_create_channel('channel1')) == 20.0
+
+        # A full (non-incremental) rescan keeps everything still on disk
+        assert db.scan_and_store_durations(lib)['files_removed'] == 0
+        assert names('channel1') == ['broken.mp4', 'video_2.mp4']
+        Path(lib, 'channel1', 'broken.mp4').unlink()
+        assert db.scan_and_store_durations(lib, incremental=True)['files_removed'] == 1
+        db.close()
+
+        print("✓ Reconcile removes vanished files test passed")
+
+
+def test_walk_video_files():
+    """Test the scandir walker: extension filter, exclusion and pruning rules, recursion"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        root = Path(tmpdir, 'lib')
+        for rel in ('a.mp4', 'B.MKV', 'notes.txt', 'movie.part', 'season1/e1.mkv', 'season1/e1.nfo',
+                    'season1/extras.mp4/trailer.mov', '.cache/thumb.mp4', '@eaDir/a.mp4',
+                    'sample-a.mp4'):
+            path = root / rel
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(rel)
+        os.symlink(root / 'season1', root / 'linked')
+
+        def rel_paths(**options):
+            return sorted(Path(e.path).relative_to(root).as_posix() for e in walk_video_files(root, **options))
+
+        assert rel_paths(recursive=False) == ['B.MKV', 'a.mp4', 'sample-a.mp4']
+        everything = rel_paths()
+        assert everything == ['.cache/thumb.mp4', '@eaDir/a.mp4', 'B.MKV', 'a.mp4', 'sample-a.mp4',
+                              'season1/e1.mkv', 'season1/extras.mp4/trailer.mov']
+        assert rel_paths(exclude=('sample-*',), prune=('.*', '@eaDir')) == [
+            'B.MKV', 'a.mp4', 'season1/e1.mkv', 'season1/extras.mp4/trailer.mov']
+        assert rel_paths(extensions={'.MKV'}) == ['B.MKV', 'season1/e1.mkv']
+        assert len(rel_paths(follow_dir_symlinks=True)) == len(everything) + 2
+        assert sorted(p.name for p in iter_video_files(root, recursive=False)) == ['B.MKV', 'a.mp4', 'sample-a.mp4']
+
+        # Entries are produced lazily and unlistable folders are reported, not raised
+        walker = walk_video_files(root)
+        assert next(walker).is_file()
+        errors = []
+        assert list(walk_video_files(root / 'missing', onerror=errors.append)) == []
+        assert len(errors) == 1 and isinstance(errors[0], FileNotFoundError)
+
+        print("✓ Walk video files test passed")
+
+
+def test_no_redundant_indexes():
+    """Test that the schema has no index duplicating a UNIQUE constraint or a prefix of another index"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db = DbHandler(os.path.join(tmpdir, 'test.db'))
+        db.init_db()
+        indexes = {r[0] for r in db._reader().execute("SELECT name FROM sqlite_master WHERE type = 'index';")}
+        assert not indexes & {'idx_videos_path', 'idx_videos_channel', 'idx_channels_name'}
+        db.close()
+
+        print("✓ No redundant indexes test passed")
+
+
+def test_catalog_snapshot_round_trip():
+    """Test bootstrapping a second node from a snapshot with only an incremental verification"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        lib = Path(tmpdir, 'share_a')
+        make_library(lib, per_channel=3)
+        Path(lib, 'channel2', 'sub').mkdir()
+        Path(lib, 'channel2', 'sub', 'clip.mkv').write_text('channel2/clip')
+        source = FakeProbeDbHandler(os.path.join(tmpdir, 'source.db'))
+        source.init_db()
+        source.scan_and_store_durations(lib, recursive=True)
+        snapshot = os.path.join(tmpdir, 'catalog.jsonl.gz')
+        assert export_snapshot(source, lib, snapshot) == {'channels': 2, 'videos': 7, 'skipped': 0}
+        source.close()
+        records = list(read_snapshot(snapshot))
+        assert [r['channel'] for r in records[:2]] == ['channel1', 'channel2']
+        assert {r['path'] for r in records[2:]} >= {'channel1/video_0.mp4', 'channel2/sub/clip.mkv'}
+
+        # The second node mounts the share elsewhere; one file changed and one went away since the export
+        other = Path(tmpdir, 'share_b')
+        lib.rename(other)
+        Path(other, 'channel1', 'video_0.mp4').write_text('re-encoded')
+        Path(other, 'channel1', 'video_1.mp4').unlink()
+        node = FakeProbeDbHandler(os.path.join(tmpdir, 'node.db'))
+        node.init_db()
+        result = import_snapshot(node, other, snapshot, recursive=True)
+        assert (result['channels'], result['videos']) == (2, 7)
+        summary = result['verification']
+        assert summary['files_unchanged'] == 5 and summary['files_removed'] == 1
+        assert node.probed == ['video_0.mp4']
+
+        clip = node.list_videos_by_format(video_codec='hevc')
+        assert [v['Path'] for v in clip] == [str(Path(other, 'channel2', 'sub', 'clip.mkv'))]
+        assert clip[0]['HasAudio'] == 0 and clip[0]['Width'] == 1280
+        assert node.channel_video_seconds('channel1') == 20.0
+
+        # Import is one transaction: a bad record leaves nothing behind
+        empty = DbHandler(os.path.join(tmpdir, 'empty.db'))
+        empty.init_db()
+        bad = os.path.join(tmpdir, 'bad.jsonl.gz')
+        with gzip.open(snapshot, 'rt') as f, gzip.open(bad, 'wt') as out:
+            out.writelines(f.readlines()[:5])
+            out.write('{"channel": "channel1", "path": "broken.mp4"}\n')
+        try:
+            import_snapshot(empty, other, bad, verify=False)
+            assert False, "import of a truncated record should fail"
+        except KeyError:
+            pass
+        assert empty.list_videos() == [] and empty.list_channels() == []
+        empty.close()
+        node.close()
+
+        print("✓ Catalog snapshot round trip test passed")
+
+
+def fake_decode_check(path, timeout=None):
+    """Module-level so verification worker processes can load it: files starting 'corrupt' fail to decode"""
+    content = Path(path).read_text()
+    if content.startswith('corrupt'):
+        return 'quarantined', 'Invalid data found when processing input'
+    if content.startswith('slow'):
+        return None, f'decode check timed out after {timeout} s'
+    return 'ok', None
+
+
+def hanging_decode_check(path, timeout=None):
+    """Module-level for the worker processes: a decode check whose child process (as ffmpeg) outlasts the test"""
+    child = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(60)'])
+    Path(path).with_suffix('.pid').write_text(str(child.pid))
+    child.wait()
+    return 'ok', None
+
+
+def process_ended(pid):
+    """True when 'pid' has exited (an unreaped zombie counts as ended)"""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return True
+    try:
+        return Path(f'/proc/{pid}/stat').read_text().split(')')[-1].split()[0] == 'Z'
+    except OSError:
+        return True
+
+
+def test_integrity_stop_ends_running_checks():
+    """Test that stopping verification ends the running check and its child process instead of waiting for them"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        lib = os.path.join(tmpdir, 'lib')
+        make_library(lib, channels=('channel1',), per_channel=3)
+        db = FakeProbeDbHandler(os.path.join(tmpdir, 'test.db'))
+        db.init_db()
+        db.scan_and_store_durations(lib)
+
+        stop = threading.Event()
+        result = {}
+        job = threading.Thread(target=lambda: result.update(
+            db.verify_integrity(checker=hanging_decode_check, stop=stop)))
+        job.start()
+        deadline = time.monotonic() + 30
+        while not list(Path(lib, 'channel1').glob('*.pid')) and time.monotonic() < deadline:
+            time.sleep(0.05)
+        time.sleep(0.1)
+        stop.set()
+        stopped_at = time.monotonic()
+        job.join(timeout=10)
+        assert not job.is_alive() and time.monotonic() - stopped_at < 3
+        assert result['checked'] == 0 and len(db.videos_needing_verification()) == 3
+        if hasattr(os, 'killpg'):
+            child = int(next(Path(lib, 'channel1').glob('*.pid')).read_text())
+            deadline = time.monotonic() + 2
+            while not process_ended(child) and time.monotonic() < deadline:
+                time.sleep(0.05)
+            assert process_ended(child)
+        db.close()
+
+        print("✓ Integrity stop test passed")
+
+
+def test_integrity_quarantine():
+    """Test that files failing the decode check leave the playlist and schedule until they change"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        lib = os.path.join(tmpdir, 'lib')
+        make_library(lib, channels=('channel1',), per_channel=4)
+        bad = Path(lib, 'channel1', 'video_1.mp4')
+        bad.write_text('corrupt channel1/1')
+        Path(lib, 'channel1', 'video_3.mp4').write_text('slow channel1/3')
+        db = FakeProbeDbHandler(os.path.join(tmpdir, 'test.db'), duration=10.0)
+        db.init_db()
+        db.scan_and_store_durations(lib)
+        assert len(db.videos_needing_verification()) == 4
+
+        result = db.verify_integrity(workers=2, checker=fake_decode_check)
+        assert (result['checked'], result['ok'], result['quarantined'], result['undetermined']) == (4, 2, 1, 1)
+        assert [Path(v['Path']).name for v in db.videos_needing_verification()] == ['video_3.mp4']
+        quarantined = db.list_quarantined()
+        assert [(q['Channel'], Path(q['Path']).name) for q in quarantined] == [('channel1', 'video_1.mp4')]
+        assert quarantined[0]['HealthError'].startswith('Invalid data')
+        assert db.quarantined_paths(1) == {str(bad)}
+
+        playlist = db.list_videos_by_channelId(1)
+        assert [Path(v['Path']).name for v in playlist] == ['video_0.mp4', 'video_2.mp4', 'video_3.mp4']
+        assert [v['StartOffsetSeconds'] for v in playlist] == [0.0, 10.0, 20.0]
+        assert db.channel_total_seconds(1) == 30.0
+        # A channel skipped by an incremental scan reports the same total as a scanned one
+        skipped = db.scan_and_store_durations(lib, incremental=True)
+        assert skipped['channels_skipped'] == 1 and skipped['by_channel']['channel1'] == 30.0
+        # ... and so does one scanned again (a recursive scan never skips a folder)
+        scanned = db.scan_and_store_durations(lib, incremental=True, recursive=True)
+        assert scanned['channels_skipped'] == 0 and scanned['files_unchanged'] == 4
+        assert scanned['by_channel']['channel1'] == 30.0 and scanned['total_seconds'] == 30.0
+
+        # A stop request ends the job before any check
+        stop = threading.Event()
+        stop.set()
+        assert db.verify_integrity(checker=fake_decode_check, stop=stop)['checked'] == 0
+
+        # A repaired file is checked again and returns to the schedule
+        bad.write_text('channel1/1 repaired')
+        # (recursive: an in-place rewrite leaves the folder mtime alone, which would skip the folder)
+        db.scan_and_store_durations(lib, incremental=True, recursive=True)
+        assert db.quarantined_paths(1) == set()
+        assert sorted(Path(v['Path']).name for v in db.videos_needing_verification()) == ['video_1.mp4', 'video_3.mp4']
+        assert db.channel_total_seconds(1) == 40.0
+        db.verify_integrity(checker=fake_decode_check)
+        assert len(db.list_videos_by_channelId(1)) == 4
+        db.close()
+
+        print("✓ Integrity quarantine test passed")
+
+
+def test_quarantine_cleared_without_probe_cache():
+    """Test that with the probe cache off, a rewritten file leaves quarantine and stored fingerprints are kept"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        lib = os.path.join(tmpdir, 'lib')
+        make_library(lib, channels=('channel1',), per_channel=3)
+        bad = Path(lib, 'channel1', 'video_1.mp4')
+        bad.write_text('corrupt channel1/1')
+        db_path = os.path.join(tmpdir, 'test.db')
+        db = FakeProbeDbHandler(db_path)
+        db.init_db()
+        db.scan_and_store_durations(lib)
+        fingerprints = {v['Path']: v['Fingerprint'] for v in db.list_videos()}
+        db.close()
+
+        db = FakeProbeDbHandler(db_path, use_probe_cache=False)
+        db.verify_integrity(checker=fake_decode_check)
+        assert db.quarantined_paths(1) == {str(bad)}
+
+        # Unchanged files: fingerprints and health survive a full rescan that computes no fingerprints
+        db.scan_and_store_durations(lib)
+        assert {v['Path']: v['Fingerprint'] for v in db.list_videos()} == fingerprints
+        assert db.quarantined_paths(1) == {str(bad)} and db.videos_needing_verification() == []
+
+        # The rewritten file is checked again, and its old fingerprint no longer describes it
+        bad.write_text('channel1/1 repaired')
+        os.utime(bad, (time.time() + 5, time.time() + 5))
+        db.scan_and_store_durations(lib)
+        assert db.quarantined_paths(1) == set()
+        assert [v['Path'] for v in db.videos_needing_verification()] == [str(bad)]
+        assert [v['Fingerprint'] for v in db.list_videos() if v['Path'] == str(bad)] == [None]
+        db.close()
+
+        print("✓ Quarantine cleared without probe cache test passed")
+
+
+def test_mezzanine_cache():
+    """Test decode-cost selection, lookups and LRU eviction of the mezzanine cache"""
+    assert decode_cost({'Width': 1920, 'Height': 1080, 'FrameRate': 30.0, 'VideoCodec': 'h264'}) == 1.0
+    assert decode_cost({'Width': 3840, 'Height': 2160, 'FrameRate': 30.0, 'VideoCodec': 'hevc'}) == 8.0
+    assert decode_cost({'Width': 1920, 'Height': 1080, 'FrameRate': 30.0, 'VideoCodec': 'h264',
+                        'BitRate': 40_000_000}) == 2.0
+    assert decode_cost({'Width': 1920, 'Height': None, 'FrameRate': 30.0, 'VideoCodec': 'h264'}) is None
+    # Unknown codec (e.g. probed without ffprobe): no estimate rather than assuming H.264
+    assert decode_cost({'Width': 3840, 'Height': 2160, 'FrameRate': 25.0, 'VideoCodec': None}) is None
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        cache = MezzanineCache(os.path.join(tmpdir, 'mezz'), max_bytes=250)
+        expensive = {'Path': 'a.mkv', 'Fingerprint': 'fp-a', 'Width': 3840, 'Height': 2160,
+                     'FrameRate': 60.0, 'VideoCodec': 'hevc'}
+        cheap = {'Path': 'b.mp4', 'Fingerprint': 'fp-b', 'Width': 1280, 'Height': 720,
+                 'FrameRate': 25.0, 'VideoCodec': 'h264'}
+        assert cache.needs_mezzanine(expensive) and not cache.needs_mezzanine(cheap)
+        assert not cache.needs_mezzanine(dict(expensive, Fingerprint=None))
+        assert cache.lookup(expensive) is None
+        command = transcode_command('a.mkv', 'out.mp4')
+        assert command[command.index('-i') + 1] == 'a.mkv' and command[-1] == 'out.mp4'
+
+        # Three 100-byte copies, oldest first; playing 'fp-0' makes it the most recently used
+        for i in range(3):
+            cache.path_for(f'fp-{i}').write_bytes(b'x' * 100)
+            os.utime(cache.path_for(f'fp-{i}'), (1000 + i, 1000 + i))
+        cache.path_for('fp-9').with_suffix('.mp4.part').write_bytes(b'x' * 1000)  # unfinished transcode
+        assert cache.lookup({'Fingerprint': 'fp-0'}) == str(cache.path_for('fp-0'))
+        assert cache.size_bytes() == 300
+        assert cache.evict() == 1
+        assert not cache.path_for('fp-1').exists()
+        assert cache.path_for('fp-0').exists() and cache.path_for('fp-2').exists()
+        assert cache.evict() == 0
+
+        cache.path_for('fp-a').write_bytes(b'x')
+        assert not cache.needs_mezzanine(expensive)
+        assert cache.lookup(expensive) == str(cache.path_for('fp-a'))
+
+        print("✓ Mezzanine cache test passed")
+
+
+
+def test_mezzanine_stop_kills_transcode():
+    """Test that stopping the mezzanine stage kills the running ffmpeg and removes its partial file"""
+    if not hasattr(os, 'killpg'):
+        return
+    with tempfile.TemporaryDirectory() as tmpdir:
+        # An ffmpeg on PATH (found by the spawned workers) that starts the output file and hangs
+        bin_dir = Path(tmpdir, 'bin')
+        bin_dir.mkdir()
+        fake_ffmpeg = bin_dir / 'ffmpeg'
+        fake_ffmpeg.write_text(f'#!/bin/sh\necho $$ > {tmpdir}/ffmpeg.pid\n'
+                               'for a; do last=$a; done\n: > "$last"\nexec sleep 60\n')
+        fake_ffmpeg.chmod(0o755)
+        cache = MezzanineCache(os.path.join(tmpdir, 'mezz'), max_bytes=10 ** 9)
+        row = {'Path': os.path.join(tmpdir, 'uhd.mkv'), 'Fingerprint': 'fp-uhd', 'Width': 3840,
+               'Height': 2160, 'FrameRate': 60.0, 'VideoCodec': 'hevc', 'BitRate': None}
+        stop = threading.Event()
+        result = {}
+        saved_path = os.environ['PATH']
+        os.environ['PATH'] = f"{bin_dir}{os.pathsep}{saved_path}"
+        try:
+            job = threading.Thread(target=lambda: result.update(cache.build([row], stop=stop)))
+            job.start()
+            pid_file = Path(tmpdir, 'ffmpeg.pid')
+            deadline = time.monotonic() + 30
+            while not pid_file.exists() and time.monotonic() < deadline:
+                time.sleep(0.05)
+            time.sleep(0.1)
+            stop.set()
+            stopped_at = time.monotonic()
+            job.join(timeout=10)
+        finally:
+            os.environ['PATH'] = saved_path
+        assert not job.is_alive() and time.monotonic() - stopped_at < 3
+        assert result['transcoded'] == 0 and os.listdir(cache.cache_dir) == []
+        ffmpeg = int(pid_file.read_text())
+        deadline = time.monotonic() + 2
+        while not process_ended(ffmpeg) and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert process_ended(ffmpeg)
+
+        print("✓ Mezzanine stop test passed")
+
+if __name__ == '__main__':
+    print("Running DbHandler Tests...")
+    print()
+
+    try:
+        test_parallel_scan()
+        test_incremental_rescan()
+        test_concurrent_reads_during_writes()
+        test_bulk_upsert()
+        test_watcher_flush()
+        test_watcher_live_events()
+        test_fallback_probe_backend()
+        test_ffpyplayer_probe_backend()
+        test_probe_cache_survives_moves()
+        test_schedule_offsets_and_live_position()
+        test_playlist_cache()
+        test_playlist_cache_per_channel()
+        test_probe_failures_are_skipped_until_changed()
+        test_media_metadata_in_catalog()
+        test_fill_metadata()
+        test_keyframe_index()
+        test_reconcile_removes_vanished_files()
+        test_walk_video_files()
+        test_no_redundant_indexes()
+        test_catalog_snapshot_round_trip()
+        test_integrity_quarantine()
+        test_integrity_stop_ends_running_checks()
+        test_quarantine_cleared_without_probe_cache()
+        test_mezzanine_cache()
+        test_mezzanine_stop_kills_transcode()
+
+        print()
+        print("All tests passed! ✓")
+    except AssertionError as e:
+        print(f"\nTest failed: {e}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"\nError running tests: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
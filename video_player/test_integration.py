@@ -43,6 +43,7 @@ def test_video_loading():
         from video_player import VideoPlayer
         
         player = VideoPlayer('freevideos')
+        player.wait_for_scan()
         
         # Check that videos were loaded
         assert len(player.videos_in_channel) > 0, "No videos loaded"
@@ -98,6 +99,7 @@ def test_video_extensions_filtering():
         from video_player import VideoPlayer
         
         player = VideoPlayer('freevideos')
+        player.wait_for_scan()
         
         # All loaded videos should have valid extensions
         for video_path in player.videos_in_channel:
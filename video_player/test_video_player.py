@@ -7,11 +7,65 @@ import os
 import sys
 import tempfile
 import shutil
+import threading
+import time
 from pathlib import Path
 
 # Add parent directory to path for imports
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
+from prefetch import PreparedPlayer, StandbyPool
+from frame_pipeline import END_OF_STREAM, Frame, FramePresenter, FrameProducer, FrameQueue
+
+
+class FakeMediaPlayer:
+    """Stands in for ffpyplayer's MediaPlayer: yields 'frames_before_first' empty polls, then frames every 1/fps s"""
+
+    def __init__(self, path, start_time=0.0, paused=True, frames_before_first=2, fps=25.0, frames=10):
+        self.path = path
+        self.start_time = start_time
+        self.paused = paused
+        self.closed = False
+        self.seeks = 0
+        self.fps = fps
+        self._polls_left = frames_before_first
+        self._next = 0
+        self._frames = frames
+
+    def get_frame(self, force_refresh=False, show=True):
+        if self._polls_left > 0:
+            self._polls_left -= 1
+            return None, 0.0
+        if self._next >= self._frames:
+            return None, 'eof'
+        pts = self.start_time + self._next / self.fps
+        if not self.paused or force_refresh:
+            if not self.paused:
+                self._next += 1
+            return (f"image@{pts:.2f}", pts), 0.0
+        return None, 'paused'
+
+    def set_pause(self, paused):
+        self.paused = paused
+
+    def get_metadata(self):
+        return {'frame_rate': (int(self.fps * 1000), 1000)}
+
+    def seek(self, pts, relative=False, accurate=True):
+        self.start_time = pts + self.start_time if relative else pts
+        self._next = 0
+        self.seeks += 1
+
+    def close_player(self):
+        self.closed = True
+
+
+class KeyframeMediaPlayer(FakeMediaPlayer):
+    """A FakeMediaPlayer opened like ffpyplayer with 'ss': at the keyframe before its start time (one every 'gop' s)"""
+
+    def __init__(self, path, start_time=0.0, gop=2.0, **kwargs):
+        super().__init__(path, start_time - start_time % gop, **kwargs)
+
 
 def test_folder_structure():
     """Test creating folder structure"""
@@ -117,6 +171,525 @@ def test_video_sorting():
     print("✓ Video sorting test passed")
 
 
+def test_prepared_player():
+    """Test that a prepared player is pre-rolled paused and handed over once, and discarded otherwise"""
+    opened = []
+
+    def open_player(path, start_time):
+        player = FakeMediaPlayer(path, start_time)
+        opened.append(player)
+        return player
+
+    prepared = PreparedPlayer(open_player, 'next.mp4', 12.0, key=3)
+    assert prepared.wait(timeout=2)
+    player, first_frame = prepared.take()
+    assert player.paused and first_frame == ('image@12.00', 12.0)
+    assert prepared.take() is None
+    prepared.close()
+    assert not player.closed  # taken: the caller owns it now
+
+    # Discarded before use, and failures to open or pre-roll
+    prepared = PreparedPlayer(open_player, 'other.mp4')
+    prepared.wait(timeout=2)
+    prepared.close()
+    assert opened[-1].closed and prepared.take() is None
+
+    def failing(path, start_time):
+        raise OSError("no such file")
+    prepared = PreparedPlayer(failing, 'missing.mp4')
+    assert not prepared.wait(timeout=2) and prepared.error == "no such file"
+
+    empty = []
+    prepared = PreparedPlayer(lambda p, s: empty.append(FakeMediaPlayer(p, s, frames=0)) or empty[-1], 'empty.mp4')
+    assert not prepared.wait(timeout=2) and prepared.error and empty[0].closed
+
+    # Closed while still opening: the player is closed when preparation finishes
+    release = threading.Event()
+    def slow(path, start_time):
+        release.wait(2)
+        return open_player(path, start_time)
+    prepared = PreparedPlayer(slow, 'slow.mp4')
+    prepared.close()
+    release.set()
+    prepared.wait(timeout=2)
+    assert opened[-1].path == 'slow.mp4' and opened[-1].closed
+
+    print("✓ Prepared player test passed")
+
+
+def wait_until(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+def test_standby_pool():
+    """Test that standbys follow the wanted channels, are sought along as they age and promoted once"""
+    opened = []
+    live = {1: ('b.mp4', 30.0), 2: ('c.mp4', 5.0), 3: None}
+    caller = []
+
+    def open_player(path, start_time):
+        player = FakeMediaPlayer(path, start_time, frames_before_first=0)
+        opened.append(player)
+        return player
+
+    def live_point(channel):
+        caller.append(threading.current_thread())
+        if live[channel] is None:
+            return None
+        path, start = live[channel]
+        return path, f"/media/{path}", start
+
+    def ready(channel):
+        standby = pool._standbys.get(channel)
+        return standby is not None and standby.ready()
+
+    pool = StandbyPool(open_player, live_point, refresh_seconds=60.0)
+    pool.update({1, 2, 3})
+    wait_until(lambda: ready(1) and ready(2))
+    assert sorted(p.path for p in opened) == ['/media/b.mp4', '/media/c.mp4']
+    assert 3 not in pool._standbys  # nothing live, nothing prepared
+    assert threading.current_thread() not in caller  # live points are looked up off the caller's thread
+
+    key, player, first_frame, age = pool.promote(1)
+    assert key == 'b.mp4' and player.paused and first_frame[1] == 30.0 and age >= 0
+    assert pool.promote(1) is None
+
+    # Refresh: the same video is sought to the new live point, not opened again
+    pool.refresh_seconds = 0.01
+    live[2] = ('c.mp4', 7.0)
+    standby = pool._standbys[2]
+    pool.update({2, 3})
+    wait_until(lambda: standby.start_time == 7.0)
+    assert pool._standbys[2] is standby and standby.first_frame[1] == 7.0
+    assert len(opened) == 2 and opened[1].seeks == 1 and not opened[1].closed
+
+    # The live point moved on to another video: that one is opened and the old one closed
+    live[2] = ('d.mp4', 0.0)
+    wait_until(lambda: ready(2) and pool._standbys[2].key == 'd.mp4')
+    assert opened[1].closed and opened[-1].path == '/media/d.mp4'
+
+    # Channels no longer wanted are closed
+    pool.update({3})
+    wait_until(lambda: 2 not in pool._standbys)
+    pool.close()
+    assert all(p.closed for p in opened if p is not player)
+    assert not player.closed and not pool._thread.is_alive()
+
+    print("✓ Standby pool test passed")
+
+
+def test_frame_queue():
+    """Test the bounded frame ring: FIFO order across wrap-around, blocking when full, closing"""
+    q = FrameQueue(3)
+    assert q.get() is None and q.peek() is None
+    for i in range(3):
+        assert q.put(i)
+    assert len(q) == 3 and not q.put(99, timeout=0.01)
+    assert q.get() == 0 and q.put(3)
+    assert q.peek() == 1
+    assert [q.get() for _ in range(4)] == [1, 2, 3, None]
+
+    # A put blocked on a full queue returns False when the queue is closed
+    for i in range(3):
+        q.put(i)
+    results = []
+    blocked = threading.Thread(target=lambda: results.append(q.put('late')))
+    blocked.start()
+    q.close()
+    blocked.join(timeout=2)
+    assert results == [False] and len(q) == 0 and q.get() is None
+
+    try:
+        FrameQueue(0)
+        assert False, "a queue needs at least one slot"
+    except ValueError:
+        pass
+
+    print("✓ Frame queue test passed")
+
+
+def test_frame_producer():
+    """Test that frames are decoded in order on the producer thread, bounded by the queue, up to end of stream"""
+    player = FakeMediaPlayer('a.mp4', 10.0, paused=False, frames_before_first=0, frames=6)
+    producer = FrameProducer(player, depth=2)
+    deadline = time.monotonic() + 2
+    while len(producer.queue) < 2 and time.monotonic() < deadline:
+        time.sleep(0.001)
+    time.sleep(0.02)
+    assert len(producer.queue) == 2  # a full queue holds the producer back
+
+    frames = []
+    while time.monotonic() < deadline:
+        item = producer.queue.get()
+        if item is END_OF_STREAM:
+            break
+        if item is not None:
+            frames.append(item)
+    assert [f.pts for f in frames] == [10.0 + i / 25.0 for i in range(6)]
+    assert frames[0].image == 'image@10.00' and producer.eof
+    stats = producer.stats()
+    assert stats['produced'] == 6 and stats['max_depth'] == 2 and stats['capacity'] == 2
+    assert stats['producer_latency_ms'] >= 0
+    producer.stop()
+
+    # Stopping while the producer waits on a full queue; errors end the stream
+    producer = FrameProducer(FakeMediaPlayer('b.mp4', paused=False, frames_before_first=0, frames=100), depth=1)
+    time.sleep(0.02)
+    producer.stop()
+    assert not producer._thread.is_alive() and producer.queue.get() is None
+
+    class BrokenPlayer:
+        def get_frame(self):
+            raise RuntimeError("decoder died")
+    producer = FrameProducer(BrokenPlayer())
+    producer._thread.join(timeout=2)
+    assert producer.queue.get() is END_OF_STREAM and producer.error == "decoder died"
+
+    print("✓ Frame producer test passed")
+
+
+def test_decode_on_to_start_time():
+    """Test that players opened at the keyframe before their start time are sought on to it, not played from there"""
+    player = KeyframeMediaPlayer('a.mp4', 11.3, paused=False, frames_before_first=0, frames=50)
+    producer = FrameProducer(player, depth=2, start_pts=11.3)
+    wait_until(lambda: len(producer.queue) == 2)
+    assert producer.queue.get().pts == 11.3 and player.seeks == 1
+    assert producer.stats()['skipped'] == 1
+    producer.stop()
+
+    # A first frame within the tolerance is played from
+    player = FakeMediaPlayer('a.mp4', 11.2, paused=False, frames_before_first=0)
+    producer = FrameProducer(player, depth=2, start_pts=11.3)
+    wait_until(lambda: len(producer.queue) == 2)
+    assert producer.queue.get().pts == 11.2 and player.seeks == 0
+    producer.stop()
+
+    # Pre-roll decodes on to the start time too, as a standby is shown at once
+    prepared = PreparedPlayer(lambda p, s: KeyframeMediaPlayer(p, s), 'b.mp4', 7.5)
+    assert prepared.wait(timeout=2)
+    player, first_frame = prepared.take()
+    assert first_frame == ('image@7.50', 7.5) and player.seeks == 1 and player.paused
+
+    print("✓ Decode on to start time test passed")
+
+
+def test_frame_presenter():
+    """Test frames are shown at their pts, late ones dropped, and fast streams held to max_fps"""
+    print("Testing frame presenter...")
+    
+    now = [100.0]
+    presenter = FramePresenter(late_threshold=0.05, max_fps=50, clock=lambda: now[0])
+    queue = FrameQueue(8)
+    for pts in (0.0, 0.04, 0.08, 0.12):
+        queue.put(Frame(f"image@{pts:.2f}", pts, 0.0))
+    
+    # The first frame anchors the clock and is shown at once; the next waits for its pts
+    presenter.start(25.0)
+    frame, wait = presenter.next(queue)
+    assert frame.pts == 0.0 and wait == 0.0
+    frame, wait = presenter.next(queue)
+    assert frame is None and abs(wait - 0.04) < 1e-9
+    now[0] += 0.04
+    assert presenter.next(queue)[0].pts == 0.04
+    
+    # Late with a newer frame waiting: skipped; the newest is shown late rather than dropped
+    now[0] += 0.15
+    frame, _ = presenter.next(queue)
+    assert frame.pts == 0.12 and len(queue) == 0
+    assert presenter.stats() == {'presented': 3, 'dropped': 1, 'late': 1, 'underruns': 0}
+    
+    # An empty queue past a frame period is one underrun, however often it is polled
+    now[0] += 0.1
+    assert presenter.next(queue) == (None, None)
+    assert presenter.next(queue) == (None, None)
+    assert presenter.stats()['underruns'] == 1
+    
+    # A pts jump (seek) re-anchors instead of waiting or dropping
+    queue.put(Frame("image@30.00", 30.0, 0.0))
+    assert presenter.next(queue)[0].pts == 30.0
+    
+    # 100 fps held to 50: every other frame falls late and is dropped
+    presenter = FramePresenter(late_threshold=0.005, max_fps=50, clock=lambda: now[0])
+    presenter.start(100.0)
+    assert presenter.min_interval == 0.02
+    queue = FrameQueue(8)
+    for i in range(6):
+        queue.put(Frame(None, i * 0.01, 0.0))
+    shown = []
+    for _ in range(20):
+        frame, wait = presenter.next(queue)
+        if frame is not None:
+            shown.append(round(frame.pts, 2))
+        now[0] += 0.01
+    assert shown == [0.0, 0.02, 0.04, 0.05], shown
+    assert presenter.stats()['dropped'] == 2
+    
+    # End of stream is handed over once the frames before it are gone
+    queue.put(END_OF_STREAM)
+    assert presenter.next(queue) == (END_OF_STREAM, 0.0)
+    
+    # Started after its pre-rolled frame was shown: that frame is not shown again, the next waits a period
+    presenter = FramePresenter(late_threshold=0.05, clock=lambda: now[0])
+    presenter.start(25.0, shown_pts=4.0)
+    for pts in (4.0, 4.04):
+        queue.put(Frame(None, pts, 0.0))
+    frame, wait = presenter.next(queue)
+    assert frame is None and abs(wait - 0.04) < 1e-9 and len(queue) == 1
+    now[0] += 0.04
+    assert presenter.next(queue)[0].pts == 4.04
+    assert presenter.stats() == {'presented': 1, 'dropped': 0, 'late': 0, 'underruns': 0}
+    
+    print("✓ Frame presenter test passed")
+
+
+def test_live_point_from_catalog():
+    """Test that the player finds a channel's live video through the catalog's live position"""
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    import video_player
+    from DBHandler import DbHandler
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db = DbHandler(os.path.join(tmpdir, 'test.db'))
+        db.init_db()
+        ch_id = db.get_or_create_channel('channel1')
+        for name in ('a.mp4', 'b.mp4', 'c.mp4'):
+            db.upsert_video(ch_id, Path(tmpdir, name), 10.0, 0, None)
+        player = type('Harness', (), {'db': db})()
+
+        original = video_player.time_since_golive
+        video_player.time_since_golive = lambda: 3 * 30.0 + 25.0  # three loops and 25 s in
+        try:
+            rows, index, in_video, duration, in_channel = video_player.VideoPlayer.live_point(player, 0)
+        finally:
+            video_player.time_since_golive = original
+        assert [Path(r['Path']).name for r in rows] == ['a.mp4', 'b.mp4', 'c.mp4']
+        assert (index, in_video, duration, in_channel) == (2, 5.0, 30.0, 25.0)
+        assert video_player.VideoPlayer.live_point(player, 1) == ([], 0, 0.0, 0.0, 0.0)
+        db.close()
+
+    print("✓ Live point from catalog test passed")
+
+
+def bare_video_player(paths):
+    """A VideoPlayer without window, catalog or decoders, playing 'paths' with FakeMediaPlayers"""
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    from video_player import VideoPlayer
+
+    class BareVideoPlayer(VideoPlayer):
+        def __init__(self):
+            self.presenter = FramePresenter(self.LATE_FRAME_SECONDS, self.MAX_FPS)
+            self.media_player = None
+            self.producer = None
+            self.pipeline_totals = {'produced': 0, 'skipped': 0, 'max_depth': 0, 'producer_latency_max_ms': 0.0}
+            self.is_playing = False
+            self.current_channel_index = 0
+            self.current_video_index = 0
+            self.current_video_fps = self.DEFAULT_FPS
+            self._prefetch = None
+            self._transition_kind = None
+            self.mezzanine = None
+            self.db = type('Catalog', (), {'quarantined_paths': lambda db, channel_id: set(),
+                                           'keyframes_for': lambda db, path: [0.0, 4.0, 8.0]})()
+            self.opened = []
+            self.shown = []
+            self.set_playlist(paths)
+
+        def set_playlist(self, paths):
+            self.videos_in_channel = list(paths)
+            self.playlist = [{'Path': p, 'DurationSeconds': 10.0, 'FrameRate': 25.0, 'Width': None, 'Height': None}
+                             for p in paths]
+
+        def open_media_player(self, source_path, start_time=0, paused=False):
+            player = FakeMediaPlayer(source_path, start_time, paused=paused, frames_before_first=0)
+            self.opened.append(player)
+            return player
+
+        def show_frame(self, img):
+            self.shown.append(img)
+
+    return BareVideoPlayer()
+
+
+def test_prefetched_player_matches_path():
+    """Test that the prefetched next video is only played for the file it was opened for"""
+    player = bare_video_player(['a.mp4', 'b.mp4', 'c.mp4'])
+    player.prefetch_next_video()
+    assert player._prefetch.key == 'b.mp4' and player._prefetch.wait(timeout=2)
+    prefetched = player._prefetch.player
+
+    # A rescan inserted a file before b.mp4: index 1 is now another file, which is opened cold
+    player.set_playlist(['a.mp4', 'a2.mp4', 'b.mp4', 'c.mp4'])
+    assert player.play_video(1)
+    assert player.media_player.path == 'a2.mp4' and player.media_player is not prefetched
+    assert prefetched.closed and player._prefetch is None
+
+    # Prefetched for the file about to play: handed over and unpaused instead of opened
+    player.prefetch_next_video()
+    player._prefetch.wait(timeout=2)
+    prefetched = player._prefetch.player
+    assert player.play_video(2)
+    assert player.media_player is prefetched and not prefetched.paused
+    assert player._transition_kind == 'end of file, prefetched'
+    player.close_media_player()
+
+    print("✓ Prefetched player matches path test passed")
+
+
+def test_preroll_frame_shown_once():
+    """Test that the frame a prefetched player pre-rolled is shown on the switch and not presented again"""
+    player = bare_video_player(['a.mp4', 'b.mp4'])
+    player.prefetch_next_video()
+    player._prefetch.wait(timeout=2)
+    assert player.play_video(1)
+    deadline = time.monotonic() + 2
+    while len(player.shown) < 3 and time.monotonic() < deadline:
+        player.update_video_frame()
+        time.sleep(0.002)
+    player.close_media_player()
+    assert player.shown[:3] == ['image@0.00', 'image@0.04', 'image@0.08'], player.shown
+
+    print("✓ Pre-rolled frame shown once test passed")
+
+
+def test_play_from_live_point():
+    """Test that playback starts at the live point, not at the keyframe the video was opened at"""
+    def play_until_shown(player, count):
+        deadline = time.monotonic() + 2
+        while len(player.shown) < count and time.monotonic() < deadline:
+            player.update_video_frame()
+            time.sleep(0.002)
+        player.close_media_player()
+        return player.shown[:count]
+
+    # Cold: opened at the keyframe at 4 s, then sought on to 5.3 s
+    player = bare_video_player(['a.mp4', 'b.mp4'])
+    assert player.play_video(0, 5.3)
+    assert player.opened[-1].start_time == 5.3 and player.opened[-1].seeks == 1
+    assert play_until_shown(player, 2) == ['image@5.30', 'image@5.34']
+
+    # A standby that fell behind skips ahead to the live point
+    player.shown.clear()
+    standby = FakeMediaPlayer('a.mp4', 6.0, frames_before_first=0)
+    assert player.play_video(0, 9.0, standby=(standby, ('image@6.00', 6.0)))
+    assert play_until_shown(player, 2) == ['image@6.00', 'image@9.00'] and standby.seeks == 1
+
+    # One close enough to the live point just plays on
+    player.shown.clear()
+    standby = FakeMediaPlayer('a.mp4', 8.6, frames_before_first=0)
+    assert player.play_video(0, 9.0, standby=(standby, ('image@8.60', 8.6)))
+    assert play_until_shown(player, 2) == ['image@8.60', 'image@8.64'] and standby.seeks == 0
+
+    print("✓ Play from live point test passed")
+
+
+def test_scan_removes_playing_video():
+    """Test that a rescan swaps its playlist in, and moves to the live point when the video on screen is gone"""
+    import video_player
+    from DBHandler import DbHandler
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db = DbHandler(os.path.join(tmpdir, 'test.db'))
+        db.init_db()
+        ch_id = db.get_or_create_channel('channel1')
+        paths = [str(Path(tmpdir, name)) for name in ('a.mp4', 'b.mp4', 'c.mp4', 'd.mp4')]
+        for path in paths:
+            db.upsert_video(ch_id, Path(path), 10.0, 0, None)
+        player = bare_video_player(paths[:3])
+        player.db = db
+        player.channels = ['channel1']
+        player.standbys = None
+        player.summary = None
+        player._scan_done = threading.Event()
+        player._scan_done.set()
+
+        # The playing video is still there: the new playlist is swapped in around it
+        assert player.play_video(1)
+        playing = player.media_player
+        player._scan_applied = False
+        player.apply_scan_result()
+        assert player.videos_in_channel == paths and player.current_video_index == 1
+        assert player.media_player is playing
+
+        # It was removed: the channel continues at its live point in the new schedule
+        db.delete_videos([Path(paths[1])])
+        original = video_player.time_since_golive
+        video_player.time_since_golive = lambda: 30.0 + 15.0  # one loop of a, c, d and 15 s in
+        try:
+            player._scan_applied = False
+            player.apply_scan_result()
+        finally:
+            video_player.time_since_golive = original
+        assert player.videos_in_channel == [paths[0], paths[2], paths[3]] and player.current_video_index == 1
+        assert playing.closed and player.media_player.path == paths[2]
+        assert player.media_player.start_time == 5.0
+        player.close_media_player()
+        db.close()
+
+    print("✓ Scan removes playing video test passed")
+
+
+class FakeRGBImage:
+    """RGB24 frame like ffpyplayer's Image: rows padded to 'linesize' bytes, pixel (x, y) colored (x, y, 7)"""
+
+    def __init__(self, width, height, linesize):
+        self.width, self.height, self.linesize = width, height, linesize
+        self.data = bytearray(linesize * height)
+        for y in range(height):
+            for x in range(width):
+                self.data[y * linesize + x * 3:y * linesize + x * 3 + 3] = bytes((x, y, 7))
+
+    def get_size(self):
+        return self.width, self.height
+
+    def get_linesizes(self, keep_align=False):
+        return [self.linesize if keep_align else self.width * 3, 0, 0, 0]
+
+    def to_memoryview(self, keep_align=False):
+        if keep_align:
+            return [memoryview(self.data), None, None, None]
+        rows = (self.data[y * self.linesize:y * self.linesize + self.width * 3] for y in range(self.height))
+        return [memoryview(bytearray(b"".join(rows))), None, None, None]
+
+
+def test_show_frame_padded_rows():
+    """Test that frames whose rows are padded for alignment are shown, in place where the padding is whole pixels"""
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    import pygame
+    from video_player import VideoPlayer
+
+    class RenderHarness:
+        fit_frame = VideoPlayer.fit_frame
+        show_frame = VideoPlayer.show_frame
+
+        def __init__(self, screen):
+            self.screen = screen
+            self._fit = {}
+            self._scaled = {}
+            self._video_rect = None
+            self.render_stats = {'frames': 0, 'cpu_seconds': 0.0, 'buffer_allocations': 0, 'frame_copies': 0}
+
+        def record_transition_gap(self):
+            pass
+
+    pygame.init()
+    try:
+        # Unpadded; padded by 10 pixels (wrapped as a wider frame); padded by 2 bytes (copied)
+        for width, linesize, copies in ((32, 96, 0), (22, 96, 0), (30, 92, 1)):
+            screen = pygame.display.set_mode((width, 16))
+            harness = RenderHarness(screen)
+            harness.show_frame(FakeRGBImage(width, 16, linesize))
+            assert harness.render_stats['frame_copies'] == copies
+            for x, y in ((0, 0), (width - 1, 3), (5, 15)):
+                assert tuple(screen.get_at((x, y)))[:3] == (x, y, 7), (width, x, y)
+    finally:
+        pygame.quit()
+
+    print("✓ Padded frame rows test passed")
+
+
 if __name__ == '__main__':
     print("Running Video Player Tests...")
     print()
@@ -126,6 +699,18 @@ if __name__ == '__main__':
         test_video_extensions()
         test_channel_cycling()
         test_video_sorting()
+        test_prepared_player()
+        test_standby_pool()
+        test_frame_queue()
+        test_frame_producer()
+        test_decode_on_to_start_time()
+        test_frame_presenter()
+        test_live_point_from_catalog()
+        test_prefetched_player_matches_path()
+        test_preroll_frame_shown_once()
+        test_play_from_live_point()
+        test_scan_removes_playing_video()
+        test_show_frame_padded_rows()
         
         print()
         print("All tests passed! ✓")
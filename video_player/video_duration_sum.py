@@ -1,18 +1,70 @@
 
 # video_duration_sum.py
+import fnmatch
+import os
 from pathlib import Path
-import subprocess
-import shlex
-import shutil
-from typing import Iterable, Optional
+from typing import Callable, Iterable, Iterator, Optional
+
+from probe_backends import ProbeBackend, FfprobeBackend, default_probe_backend
 
 VIDEO_EXTS = {".mp4", ".mkv", ".mov", ".avi", ".webm", ".m4v"}
 
-def iter_video_files(root: Path, recursive: bool = True) -> Iterable[Path]:
-    files = (root.rglob("*") if recursive else root.glob("*"))
-    for f in files:
-        if f.is_file() and f.suffix.lower() in VIDEO_EXTS:
-            yield f
+# ffprobe is looked up on PATH once, not per file
+_FFPROBE = FfprobeBackend()
+
+def walk_video_files(root: str | Path,
+                     recursive: bool = True,
+                     extensions: Iterable[str] = VIDEO_EXTS,
+                     exclude: Iterable[str] = (),
+                     prune: Iterable[str] = (),
+                     follow_dir_symlinks: bool = False,
+                     onerror: Optional[Callable[[OSError], None]] = None) -> Iterator[os.DirEntry]:
+    """
+    Lazily yields an os.DirEntry for each video file under 'root' (depth first, directory
+    order). Built on os.scandir: file/directory checks come from the directory listing
+    (d_type) rather than a stat per entry, and the extension is checked on the name before
+    the entry is looked at at all. entry.stat() is cached per entry (and free on Windows).
+    - extensions: lower-case suffixes to yield, e.g. {'.mp4', '.mkv'}
+    - exclude: fnmatch patterns on file names to skip, e.g. ('*.part', 'sample-*')
+    - prune: fnmatch patterns on directory names not to descend into, e.g. ('.*', '@eaDir', '#recycle')
+    - follow_dir_symlinks: descend into symlinked directories (off: no symlink loops)
+    - onerror: called with the OSError for a directory that cannot be listed (as in os.walk);
+      such directories are skipped either way
+
+    """
+    exts = {e.lower() for e in extensions}
+    exclude = tuple(exclude)
+    prune = tuple(prune)
+    stack = [os.fspath(root)]
+    while stack:
+        try:
+            it = os.scandir(stack.pop())
+        except OSError as e:
+            if onerror is not None:
+                onerror(e)
+            continue
+        subdirs = []
+        with it:
+            for entry in it:
+                name = entry.name
+                ext = os.path.splitext(name)[1].lower()
+                try:
+                    if ext in exts and entry.is_file():
+                        if not any(fnmatch.fnmatch(name, p) for p in exclude):
+                            yield entry
+                    elif recursive and entry.is_dir(follow_symlinks=follow_dir_symlinks):
+                        if not any(fnmatch.fnmatch(name, p) for p in prune):
+                            subdirs.append(entry.path)
+                except OSError:
+                    continue  # vanished or unreadable while listing
+        # Visit subdirectories in listing order
+        stack.extend(reversed(subdirs))
+
+
+def iter_video_files(root: Path, recursive: bool = True, **walk_options) -> Iterable[Path]:
+    """Paths of the video files under 'root'; see walk_video_files for 'walk_options'."""
+    for entry in walk_video_files(root, recursive=recursive, **walk_options):
+        yield Path(entry.path)
 
 def ffprobe_duration_seconds(path: Path, use_stream_duration: bool = False) -> Optional[float]:
     """
@@ -24,35 +76,22 @@ def ffprobe_duration_seconds(path: Path, use_stream_duration: bool = False) -> O
       ffprobe -v error -show_entries format=duration -of default=noprint_wrappers=1:nokey=1 file
       ffprobe -v error -select_streams v:0 -show_entries stream=duration -of default=noprint_wrappers=1:nokey=1 file
     """
-    if not shutil.which("ffprobe"):
-        # ffprobe not installed / not on PATH
-        return None
-
-    if use_stream_duration:
-        cmd = f'ffprobe -v error -select_streams v:0 -show_entries stream=duration ' \
-              f'-of default=noprint_wrappers=1:nokey=1 "{path}"'
-    else:
-        cmd = f'ffprobe -v error -show_entries format=duration ' \
-              f'-of default=noprint_wrappers=1:nokey=1 "{path}"'
-
-    try:
-        out = subprocess.check_output(shlex.split(cmd), stderr=subprocess.STDOUT)
-        text = out.decode().strip()
-        return float(text) if text else None
-    except Exception:
-        return None
+    return _FFPROBE.duration_seconds(path, use_stream_duration)
 
 def sum_folder_durations_seconds(folder: str | Path,
                                  recursive: bool = True,
-                                 use_stream_duration: bool = False) -> float:
+                                 use_stream_duration: bool = False,
+                                 backend: Optional[ProbeBackend] = None) -> float:
     """
     Scans the folder for video files and returns the total duration in seconds.
     Set use_stream_duration=True to use per-stream duration instead of container duration.
+    'backend' defaults to default_probe_backend() (in-process, ffprobe as fallback).
     """
     root = Path(folder)
+    backend = backend or default_probe_backend()
     total = 0.0
     for vf in iter_video_files(root, recursive=recursive):
-        dur = ffprobe_duration_seconds(vf, use_stream_duration=use_stream_duration)
+        dur = backend.duration_seconds(vf, use_stream_duration=use_stream_duration)
         if dur is not None:
             total += dur
         else:
@@ -62,15 +101,17 @@ def sum_folder_durations_seconds(folder: str | Path,
 
 def report_folder_durations(folder: str | Path,
                             recursive: bool = True,
-                            use_stream_duration: bool = False) -> None:
+                            use_stream_duration: bool = False,
+                            backend: Optional[ProbeBackend] = None) -> None:
     """
     Prints a table and totals.
     """
     root = Path(folder)
+    backend = backend or default_probe_backend()
     print("File\tDuration(s)")
     total = 0.0
     for vf in iter_video_files(root, recursive=recursive):
-        dur = ffprobe_duration_seconds(vf, use_stream_duration=use_stream_duration)
+        dur = backend.duration_seconds(vf, use_stream_duration=use_stream_duration)
         if dur is None:
             print(f"{vf}\tUNKNOWN")
         else:
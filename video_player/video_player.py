@@ -6,14 +6,22 @@ Supports MKV, AVI, and MP4 file formats
 
 import os
 import sys
+import threading
 import time
 import pygame
 from ffpyplayer.player import MediaPlayer
 from pathlib import Path
 from DBHandler import DbHandler
+from catalog_watcher import CatalogWatcher
+import integrity
+from mezzanine import MezzanineCache
+from prefetch import PreparedPlayer, StandbyPool
+from frame_pipeline import END_OF_STREAM, FramePresenter, FrameProducer, sleep_until
+import mezzanine
+from keyframe_index import preceding_keyframe
 from datetime import datetime
 from video_duration_sum import sum_folder_durations_seconds, report_folder_durations
-from channel_live import time_since_golive, time_to_seek_in_channel
+from channel_live import time_since_golive
 
 class VideoPlayer:
     """Video player that manages channel-based video playback"""
@@ -21,15 +29,37 @@ class VideoPlayer:
     # Class constants
     DEFAULT_WIDTH = 800
     DEFAULT_HEIGHT = 600
-    MAX_FPS = 120
+    MAX_FPS = 120                 # faster videos are shown at this rate (frames in between are dropped)
     DEFAULT_FPS = 30
+    SCAN_WORKERS = 8              # concurrent probes during the startup scan
+    PROBE_TIMEOUT_SECONDS = 30    # give up on a probe that hangs (e.g. stalled network mount)
+    WATCH_CATALOG = True          # keep the catalog in sync with the channel folders while running
+    INDEX_KEYFRAMES = True        # index keyframes after the scan so channel switches seek straight to one
+    KEYFRAME_INDEX_MIN_SECONDS = 600  # only long files are worth indexing
+    KEYFRAME_MAX_LAG_SECONDS = 10     # start at the preceding keyframe when it is at most this far behind
+    VERIFY_INTEGRITY = True       # decode-check the catalog in the background and skip files that fail
+    VERIFY_TIMEOUT_SECONDS = 1800     # a decode check still running is abandoned and retried next start
+    MEZZANINE_CACHE_DIR = None    # e.g. 'mezzanine': transcode files too expensive to decode in real time
+    MEZZANINE_MAX_BYTES = 50 * 1024 ** 3
+    MEZZANINE_DECODE_BUDGET = 1.0     # decode cost allowed (1.0 = 1080p30 H.264, see mezzanine.decode_cost)
+    MEZZANINE_TIMEOUT_SECONDS = 4 * 3600  # a transcode still running is abandoned and retried next start
+    PREFETCH_SECONDS = 5.0        # open and pre-roll the next video this long before the current one ends (0: off)
+    PREROLL_TIMEOUT_SECONDS = 5.0
+    ZAP_STANDBY = True            # keep paused players at the neighbouring channels' live points
+    STANDBY_REFRESH_SECONDS = 2.0     # seek each standby to its live point this often
+    STANDBY_MAX_DRIFT_SECONDS = 1.0   # skip a promoted standby ahead to the live point when it is further behind
+    FRAME_QUEUE_DEPTH = 8         # decoded frames buffered between the decode thread and the UI loop
+    LATE_FRAME_SECONDS = 0.05     # a frame this far past its time is dropped if a newer one is waiting
+    EVENT_POLL_SECONDS = 0.01     # longest the loop sleeps between input checks while waiting for a frame
     
-    def __init__(self, root_folder='freevideos'):
+    def __init__(self, root_folder='freevideos', background_scan=True):
         """
         Initialize the video player
         
         Args:
             root_folder: Root folder containing channel subfolders
+            background_scan: Start playing from the existing catalog right away and rescan
+                             the library on a background thread (False: scan first)
         """
         # Get the current date and time
         current_datetime = datetime.now()
@@ -48,33 +78,190 @@ class VideoPlayer:
         self.current_video_index = 0
         self.video_extensions = ['.mkv', '.avi', '.mp4']
         
-        # Clock for frame rate
-        self.clock = pygame.time.Clock()
+        # Frames are shown by pts against a monotonic clock
+        self.presenter = FramePresenter(self.LATE_FRAME_SECONDS, self.MAX_FPS)
         
         # Video state
         self.media_player = None
+        self.producer = None           # FrameProducer decoding media_player on its own thread
+        self.pipeline_totals = {'produced': 0, 'skipped': 0, 'max_depth': 0, 'producer_latency_max_ms': 0.0}
         self.is_playing = False
         self.videos_in_channel = []
+        self.playlist = []             # catalog rows of videos_in_channel (duration, frame rate, size...)
         self.current_video_fps = self.DEFAULT_FPS
-        
+        self._fit = {}                 # {frame size: (scaled size, position)} for the current window size
+        self._scaled = {}              # {scaled size: surface frames are scaled into}, reused every frame
+        self._video_rect = None        # where the last frame was drawn; None: repaint the whole window
+        self.render_stats = {'frames': 0, 'cpu_seconds': 0.0, 'buffer_allocations': 0, 'frame_copies': 0}
+        self._prefetch = None          # PreparedPlayer for the next playlist entry, keyed by its catalog path
+        self._transition_started = None    # perf_counter() at the last end of file or channel switch
+        self._transition_kind = None       # e.g. 'end of file, prefetched' or 'zap, standby'
+        self.transition_gaps_ms = {}       # {kind: [gap ms, ...]}
+        self.standbys = None
+        if self.ZAP_STANDBY:
+            self.standbys = StandbyPool(self.open_prepared_player,
+                                        self.standby_live_point, self.STANDBY_REFRESH_SECONDS,
+                                        self.PREROLL_TIMEOUT_SECONDS)
+        
+        self.mezzanine = None
+        if self.MEZZANINE_CACHE_DIR:
+            self.mezzanine = MezzanineCache(self.MEZZANINE_CACHE_DIR, self.MEZZANINE_MAX_BYTES,
+                                            self.MEZZANINE_DECODE_BUDGET)
+
         self.db = DbHandler(".\\db\\showsequencer.db", enable_wal=True)
         self.db.init_db()
         print("Database initialized.")
         print("All:", self.db.list_channels())
 
-        # Scan durations for your root folder (e.g., 'freevideos') before launching the player
-        self.summary = self.db.scan_and_store_durations(root_folder, channel_names=['channel1', 'channel2', 'channel3'],
-                                            recursive=False, use_stream_duration=False)
+        # Scan durations for your root folder (e.g., 'freevideos'); in the background by default
+        self.summary = None
+        self._scan_thread = None
+        self._scan_done = threading.Event()
+        self._scan_applied = False
+        self._background_thread = None
+        self._stop_background = threading.Event()
+        if background_scan:
+            self._scan_thread = threading.Thread(target=self._run_scan, name="LibraryScan", daemon=True)
+            self._scan_thread.start()
+        else:
+            self._run_scan()
+            self.apply_scan_result()
 
-        print(f"Files scanned: {self.summary['files_scanned']}")
-        print(f"Total duration: {self.summary['total_seconds']:.3f} s "
-            f"({self.summary['total_seconds']/60:.2f} min, {self.summary['total_seconds']/3600:.2f} h)")
-        for ch, secs in self.summary['by_channel'].items():
-            print(f"  {ch}: {secs:.3f} s ({secs/60:.2f} min)")
+        # Pick up added/changed/removed files while running; load_channel reads the catalog each time
+        self.watcher = None
+        if self.WATCH_CATALOG:
+            if CatalogWatcher.available():
+                self.watcher = CatalogWatcher(self.db, root_folder, self.channels,
+                                              probe_timeout=self.PROBE_TIMEOUT_SECONDS)
+                self.watcher.start()
+            else:
+                print("Catalog watching disabled (install 'watchdog' to enable it)")
 
-        # Initialize first channel
-        self.load_channel(self.current_channel_index)
+        # Initialize first channel from whatever the catalog already holds
+        if background_scan and self.db.total_video_seconds() == 0:
+            self.show_scanning_message()
+        else:
+            self.load_channel(self.current_channel_index)
         
+    def _run_scan(self):
+        """Incremental library scan (runs on the background scan thread when enabled)"""
+        try:
+            self.summary = self.db.scan_and_store_durations(self.root_folder, channel_names=self.channels,
+                                                recursive=False, use_stream_duration=False,
+                                                workers=self.SCAN_WORKERS,
+                                                probe_timeout=self.PROBE_TIMEOUT_SECONDS,
+                                                incremental=True)
+        except Exception as e:
+            print(f"Library scan failed: {e}")
+        finally:
+            self._scan_done.set()
+        if self.INDEX_KEYFRAMES or self.VERIFY_INTEGRITY or self.mezzanine:
+            self._background_thread = threading.Thread(target=self._run_background_jobs, name="CatalogJobs",
+                                                       daemon=True)
+            self._background_thread.start()
+
+    def _run_background_jobs(self):
+        """
+        Metadata the scan did not read, keyframe indexing, integrity verification, then
+        mezzanine transcodes, over the catalog (on their own background thread)
+        """
+        if not self._stop_background.is_set():
+            try:
+                result = self.db.fill_metadata(workers=2, timeout=self.PROBE_TIMEOUT_SECONDS,
+                                               stop=self._stop_background)
+                if result['filled'] or result['failed']:
+                    print(f"Metadata read: {result['filled']} files ({result['failed']} failed) "
+                          f"in {result['elapsed_seconds']:.2f} s")
+            except Exception as e:
+                print(f"Reading metadata failed: {e}")
+        if self.INDEX_KEYFRAMES and not self._stop_background.is_set():
+            try:
+                result = self.db.index_keyframes(workers=2, timeout=self.PROBE_TIMEOUT_SECONDS,
+                                                 min_duration_seconds=self.KEYFRAME_INDEX_MIN_SECONDS,
+                                                 stop=self._stop_background)
+                if result['indexed'] or result['failed']:
+                    print(f"Keyframes indexed: {result['indexed']} files ({result['failed']} failed) "
+                          f"in {result['elapsed_seconds']:.2f} s")
+            except Exception as e:
+                print(f"Keyframe indexing failed: {e}")
+        if self.VERIFY_INTEGRITY and integrity.available() and not self._stop_background.is_set():
+            try:
+                result = self.db.verify_integrity(workers=1, timeout=self.VERIFY_TIMEOUT_SECONDS,
+                                                 stop=self._stop_background)
+                if result['checked']:
+                    print(f"Integrity verified: {result['ok']} ok, {result['quarantined']} quarantined, "
+                          f"{result['undetermined']} undetermined in {result['elapsed_seconds']:.2f} s")
+            except Exception as e:
+                print(f"Integrity verification failed: {e}")
+        if self.mezzanine and mezzanine.available() and not self._stop_background.is_set():
+            try:
+                result = self.mezzanine.build(self.db.list_videos(), workers=1,
+                                             timeout=self.MEZZANINE_TIMEOUT_SECONDS, stop=self._stop_background)
+                if result['transcoded'] or result['failed']:
+                    print(f"Mezzanine copies: {result['transcoded']} made ({result['failed']} failed, "
+                          f"{result['evicted']} evicted) in {result['elapsed_seconds']:.1f} s")
+            except Exception as e:
+                print(f"Mezzanine transcoding failed: {e}")
+
+    def seek_start_time(self, video_path, start_time):
+        """
+        Where to open 'video_path' to show 'start_time': the preceding keyframe when the
+        catalog has an index and it is close enough, so the decoder lands on a picture at
+        once instead of decoding a long GOP up to the live point; 'start_time' otherwise.
+        """
+        if start_time <= 0:
+            return start_time
+        keyframes = self.db.keyframes_for(video_path)
+        keyframe = preceding_keyframe(keyframes, start_time) if keyframes else None
+        if keyframe is not None and start_time - keyframe <= self.KEYFRAME_MAX_LAG_SECONDS:
+            return keyframe
+        return start_time
+
+    def wait_for_scan(self, timeout=None):
+        """Block until the library scan has finished and its result is applied"""
+        if self._scan_done.wait(timeout):
+            self.apply_scan_result()
+
+    def apply_scan_result(self):
+        """
+        Once the scan has finished: print its summary and swap the rescanned playlist in.
+        The video on screen keeps playing; the next video and the channel totals come from
+        the updated catalog. When the scan removed the video on screen, the channel is
+        reloaded at its live point in the new schedule instead. Does nothing while the
+        scan is still running.
+        """
+        if self._scan_applied or not self._scan_done.is_set():
+            return
+        self._scan_applied = True
+
+        if self.summary:
+            print(f"Files scanned: {self.summary['files_scanned']} "
+                f"in {self.summary['elapsed_seconds']:.2f} s ({self.summary['files_per_second']:.1f} files/s), "
+                f"{self.summary['files_unchanged']} unchanged, {self.summary['channels_skipped']} channels skipped")
+            if self.summary['files_failed'] or self.summary['files_known_bad']:
+                print(f"Files that could not be probed: {self.summary['files_failed']} new, "
+                    f"{self.summary['files_known_bad']} known bad (see DbHandler.list_probe_failures)")
+            print(f"Total duration: {self.summary['total_seconds']:.3f} s "
+                f"({self.summary['total_seconds']/60:.2f} min, {self.summary['total_seconds']/3600:.2f} h)")
+            for ch, secs in self.summary['by_channel'].items():
+                print(f"  {ch}: {secs:.3f} s ({secs/60:.2f} min)")
+
+        if not self.media_player:
+            # Nothing was playable from the old catalog (first run): start now
+            self.load_channel(self.current_channel_index)
+            return
+
+        current_path = self.videos_in_channel[self.current_video_index] if self.videos_in_channel else None
+        channel_results = self.db.list_videos_by_channelId(self.current_channel_index + 1)
+        playlist = [row["Path"] for row in channel_results]
+        if current_path not in playlist:
+            # Gone from the catalog: there is no place in the new playlist to carry on from
+            self.load_channel(self.current_channel_index)
+            return
+        self.videos_in_channel = playlist
+        self.playlist = channel_results
+        self.current_video_index = playlist.index(current_path)
+
     def get_channel_path(self, channel_index):
         """Get the path for a specific channel"""
         channel_name = self.channels[channel_index]
@@ -108,91 +295,261 @@ class VideoPlayer:
         videos.sort()
         return videos
     
+    def live_point(self, channel_index):
+        """
+        Where a channel is live right now: (playlist rows, index of the live video, seconds
+        into it, channel duration, seconds into the channel loop)
+        """
+        channel_id = channel_index + 1
+        channel_results = self.db.list_videos_by_channelId(channel_id)
+        channel_duration = self.db.channel_total_seconds(channel_id)
+
+        # The catalog finds the live video with an indexed range query on the stored start offsets
+        live = self.db.live_position(channel_id, time_since_golive())
+        video_index, time_to_play_in_video, time_to_play_in_channel = 0, 0.0, 0.0
+        if live is not None:
+            paths = [row["Path"] for row in channel_results]
+            # A scan may commit between the two reads; then the playlist is played from its start
+            if live["Path"] in paths:
+                video_index = paths.index(live["Path"])
+                time_to_play_in_video = live["OffsetSeconds"]
+                time_to_play_in_channel = live["StartOffsetSeconds"] + live["OffsetSeconds"]
+        return channel_results, video_index, time_to_play_in_video, channel_duration, time_to_play_in_channel
+
+    def standby_live_point(self, channel_index):
+        """StandbyPool live point of a channel: (catalog path, path to open, live time), or None (called on the pool's thread)"""
+        rows, video_index, time_in_video = self.live_point(channel_index)[:3]
+        if not rows:
+            return None
+        row = rows[video_index]
+        return row["Path"], self.source_for(row["Path"], row)[0], time_in_video
+
+    def update_standbys(self):
+        """Keep standbys for the channels one UP/DOWN press away"""
+        if self.standbys is None or not self.videos_in_channel:
+            return
+        count = len(self.channels)
+        neighbours = {(self.current_channel_index + 1) % count, (self.current_channel_index - 1) % count}
+        neighbours.discard(self.current_channel_index)
+        self.standbys.update(neighbours)
+
     def load_channel(self, channel_index):
         """Load videos from a specific channel"""
         self.current_channel_index = channel_index
-        channel_results = self.db.list_videos_by_channelId(channel_index+1)
+        (channel_results, self.current_video_index, time_to_play_in_video,
+         channel_duration, time_to_play_in_channel) = self.live_point(channel_index)
         
+        self.playlist = channel_results
         self.videos_in_channel = [row["Path"] for row in channel_results] #self.get_videos_from_channel(channel_index)
-        video_durations = [row["DurationSeconds"] for row in channel_results]
-
-        channel_duration = self.summary['by_channel'][self.channels[channel_index]]
-        time_to_play_in_channel = time_to_seek_in_channel(channel_duration)  # Example channel duration of 1 hour
         print(f"\nChannel: {self.channels[channel_index]}  |  Channel duration: {channel_duration:.3f} seconds  |  Time to play: {time_to_play_in_channel:.3f} seconds")
 
-        self.current_video_index = 0
-        timeIndex = 0
-        time_to_play_in_video = time_to_play_in_channel # initialize to total time to play in channel in case first video is longer than time to play
-        for video_duration in video_durations:
-            timeIndex += video_duration
-            if time_to_play_in_channel < timeIndex:
-                break
-            self.current_video_index += 1
-            time_to_play_in_video -= video_duration
+        # A warm standby is used when it holds the video that is live now
+        standby = self.standbys.promote(channel_index) if self.standbys else None
+        prepared = None
+        if standby:
+            key, player, first_frame, _ = standby
+            if self.videos_in_channel and key == self.videos_in_channel[self.current_video_index]:
+                prepared = (player, first_frame)
+            else:
+                player.close_player()
                             
         if self.videos_in_channel:
-            self.play_video(self.current_video_index, time_to_play_in_video)
+            if not self.play_video(self.current_video_index, time_to_play_in_video, standby=prepared):
+                self.play_next_video()
         else:
             print(f"No videos found in {self.channels[channel_index]}")
             self.show_no_video_message()
     
-    def play_video(self, video_index, start_time=0):
+    def source_for(self, video_path, row, start_time=0):
+        """
+        (path to open, start time) for a playlist entry: its mezzanine copy when there is one
+        (same duration, cheap to decode, keyframe every 2 s), else the file itself started at
+        the preceding keyframe where that is close enough
+        """
+        source_path = self.mezzanine.lookup(row) if self.mezzanine and row else None
+        if source_path is not None:
+            return source_path, start_time
+        return video_path, self.seek_start_time(video_path, start_time)
+
+    def open_media_player(self, source_path, start_time=0, paused=False):
+        """MediaPlayer for 'source_path' with audio enabled, starting at 'start_time'"""
+        return MediaPlayer(
+            source_path,
+            ff_opts={
+                'paused': paused,
+                'autoexit': False,
+                'ss': start_time}  # Start at specified time
+        )
+
+    def open_prepared_player(self, source_path, start_time=0):
+        """
+        Paused player for a PreparedPlayer, opened at the keyframe before 'start_time' where
+        the catalog knows one (the PreparedPlayer then decodes on to 'start_time' itself)
+        """
+        return self.open_media_player(source_path, self.seek_start_time(source_path, start_time), paused=True)
+
+    def prefetch_next_video(self):
+        """Start opening the next playable video in the background, unless already prefetching"""
+        if self._prefetch is not None or not self.videos_in_channel:
+            return
+        quarantined = self.db.quarantined_paths(self.current_channel_index + 1)
+        count = len(self.videos_in_channel)
+        for step in range(1, count + 1):
+            next_index = (self.current_video_index + step) % count
+            if self.videos_in_channel[next_index] not in quarantined:
+                break
+        else:
+            return
+        row = self.playlist[next_index] if next_index < len(self.playlist) else None
+        source_path, start_time = self.source_for(self.videos_in_channel[next_index], row)
+        self._prefetch = PreparedPlayer(self.open_prepared_player, source_path, start_time, self.PREROLL_TIMEOUT_SECONDS,
+                                        key=self.videos_in_channel[next_index])
+
+    def discard_prefetch(self):
+        if self._prefetch is not None:
+            self._prefetch.close()
+            self._prefetch = None
+
+    def play_video(self, video_index, start_time=0, standby=None):
         """
         Play a specific video by index
         
         Args:
             video_index: Index of the video in current channel
+            start_time: Live point in the video, in seconds
+            standby: (paused player, its first frame) promoted from the standby pool, played
+                     instead of opening the video (skipped ahead if it fell behind start_time)
+
+        Returns:
+            True if the video is playing
         """
         if not self.videos_in_channel:
-            return
+            return False
         
         # Clean up previous video
-        if self.media_player:
-            self.media_player.close_player()
-            self.media_player = None
+        self.close_media_player()
         
         self.current_video_index = video_index
         video_path = self.videos_in_channel[video_index]
+        row = self.playlist[video_index] if video_index < len(self.playlist) else None
+
+        # The prefetched player is used when it is for this file, from its start, and ready;
+        # keyed by path, as a rescan swapped in meanwhile can move the file to another index
+        prepared = None
+        if self._prefetch is not None and self._prefetch.key == video_path and start_time == 0:
+            prepared = self._prefetch.take()
+        self.discard_prefetch()
+        live_start = start_time
+        source_path, start_time = self.source_for(video_path, row, start_time)
         
         #print(f"Playing: {os.path.basename(video_path)} starting at {start_time} seconds")
+
+        # Pacing and scaling come from the catalog, so they are ready before the decoder opens
+        # (the mezzanine copy may have a lower frame rate: that one is asked of the decoder)
+        catalog_fps = row["FrameRate"] if row and source_path == video_path else None
+        if row and row["Width"] and row["Height"]:
+            self.fit_frame(row["Width"], row["Height"])
         
         try:
-            # Create MediaPlayer with audio enabled
-            self.media_player = MediaPlayer(
-                video_path, 
-                ff_opts={
-                    'paused': False, 
-                    'autoexit': False,
-                    'ss': start_time}  # Start at specified time
-            )
-
-            # Get video metadata
-            metadata = self.media_player.get_metadata()
-            frame_rate = metadata.get('frame_rate', (self.DEFAULT_FPS, 1))
-            
-            # Calculate FPS from frame rate tuple (numerator, denominator)
-            if frame_rate and isinstance(frame_rate, tuple) and len(frame_rate) == 2 and frame_rate[1] != 0:
-                self.current_video_fps = frame_rate[0] / frame_rate[1]
+            shown_pts = None    # pts of a pre-rolled frame shown here, not to be presented again
+            # A cold player opens at the keyframe before the live point: the producer skips
+            # ahead to it, so the channel does not run up to a GOP behind until the next zap
+            skip_to = live_start if live_start > 0 else None
+            if standby:
+                # Paused at the live point a moment ago: show it now, catch up if it fell behind
+                self.media_player, first_frame = standby
+                self.media_player.set_pause(False)
+                self._transition_kind = 'zap, standby'
+                self.show_frame(first_frame[0])
+                shown_pts = first_frame[1]
+                if live_start - shown_pts <= self.STANDBY_MAX_DRIFT_SECONDS:
+                    skip_to = None
+                else:
+                    shown_pts = None    # the next frame shown is at the live point: it anchors the clock
+            elif prepared:
+                # Already open and pre-rolled: unpause and show the frame it decoded
+                self.media_player, first_frame = prepared
+                self.media_player.set_pause(False)
+                self._transition_kind = 'end of file, prefetched'
+                self.show_frame(first_frame[0])
+                shown_pts = first_frame[1]
+                skip_to = None
             else:
-                self.current_video_fps = self.DEFAULT_FPS
+                self._transition_kind = 'zap, cold' if self._transition_kind == 'zap' else 'end of file, cold'
+                self.media_player = self.open_media_player(source_path, start_time)
+
+            if catalog_fps:
+                self.current_video_fps = catalog_fps
+            else:
+                # Not probed yet (e.g. catalog from before metadata was stored): ask the decoder
+                metadata = self.media_player.get_metadata()
+                frame_rate = metadata.get('frame_rate', (self.DEFAULT_FPS, 1))
+
+                # Calculate FPS from frame rate tuple (numerator, denominator)
+                if frame_rate and isinstance(frame_rate, tuple) and len(frame_rate) == 2 and frame_rate[1] != 0:
+                    self.current_video_fps = frame_rate[0] / frame_rate[1]
+                else:
+                    self.current_video_fps = self.DEFAULT_FPS
             
-            # Limit to max FPS
-            if self.current_video_fps == 0 or self.current_video_fps > self.MAX_FPS:
+            # Faster videos are held to MAX_FPS by the presenter
+            if not self.current_video_fps or self.current_video_fps <= 0:
                 self.current_video_fps = self.DEFAULT_FPS
             
+            # Frames are decoded on their own thread from here on, and shown by their pts
+            self.producer = FrameProducer(self.media_player, self.FRAME_QUEUE_DEPTH, skip_to)
+            self.presenter.start(self.current_video_fps, shown_pts)
             self.is_playing = True
+            return True
         except Exception as e:
             print(f"Error playing video: {e}")
-            # Try next video
-            self.play_next_video()
+            return False
+
+    def close_media_player(self):
+        """Stop the decode thread, then close the player it reads from"""
+        if self.producer:
+            self.producer.stop()
+            stats = self.producer.stats()
+            totals = self.pipeline_totals
+            totals['produced'] += stats['produced']
+            totals['skipped'] += stats['skipped']
+            totals['max_depth'] = max(totals['max_depth'], stats['max_depth'])
+            totals['producer_latency_max_ms'] = max(totals['producer_latency_max_ms'],
+                                                    stats['producer_latency_max_ms'])
+            self.producer = None
+        if self.media_player:
+            self.media_player.close_player()
+            self.media_player = None
+
+    def report_pipeline_stats(self):
+        totals = self.pipeline_totals
+        if totals['produced']:
+            presenter = self.presenter.stats()
+            print(f"Frame queue: {totals['produced']} frames decoded, max depth {totals['max_depth']}"
+                  f"/{self.FRAME_QUEUE_DEPTH}, {totals['skipped']} skipped up to the live point, "
+                  f"{presenter['underruns']} underruns, "
+                  f"slowest get_frame {totals['producer_latency_max_ms']:.1f} ms")
+            print(f"Presenter: {presenter['presented']} frames shown, {presenter['dropped']} late frames dropped, "
+                  f"{presenter['late']} shown late")
     
     def play_next_video(self):
-        """Play the next video in sequence (loop back to first)"""
+        """
+        Play the next video in sequence (loop back to first), skipping videos quarantined
+        since the channel was loaded and videos that fail to open
+        """
         if not self.videos_in_channel:
             return
         
-        next_index = (self.current_video_index + 1) % len(self.videos_in_channel)
-        self.play_video(next_index)
+        quarantined = self.db.quarantined_paths(self.current_channel_index + 1)
+        count = len(self.videos_in_channel)
+        for step in range(1, count + 1):
+            next_index = (self.current_video_index + step) % count
+            if self.videos_in_channel[next_index] in quarantined:
+                continue
+            if self.play_video(next_index):
+                return
+        self.is_playing = False
+        print(f"No playable videos in {self.channels[self.current_channel_index]}")
+        self.show_no_video_message()
     
     def switch_channel(self, direction):
         """
@@ -203,13 +560,30 @@ class VideoPlayer:
         """
         new_index = (self.current_channel_index + direction) % len(self.channels)
         print(f"Switching to {self.channels[new_index]}")
+        self._transition_started = time.perf_counter()
+        self._transition_kind = 'zap'
         self.load_channel(new_index)
     
+    def show_scanning_message(self):
+        """Display a message while the first library scan is running"""
+        try:
+            font = pygame.font.Font(None, 36)
+            self.screen.fill((0, 0, 0))
+            self._video_rect = None
+            text = font.render("Scanning video library...", True, (255, 255, 255))
+            text_rect = text.get_rect(center=(self.screen.get_width() // 2,
+                                              self.screen.get_height() // 2))
+            self.screen.blit(text, text_rect)
+            pygame.display.flip()
+        except Exception as e:
+            print(f"Error displaying message: {e}")
+    
     def show_no_video_message(self):
         """Display a message when no videos are available"""
         try:
             font = pygame.font.Font(None, 36)
             self.screen.fill((0, 0, 0))
+            self._video_rect = None
             
             channel_name = self.channels[self.current_channel_index]
             text = font.render(f"No videos in {channel_name}", True, (255, 255, 255))
@@ -228,61 +602,144 @@ class VideoPlayer:
         except Exception as e:
             print(f"Error displaying message: {e}")
     
+    def fit_frame(self, frame_width, frame_height):
+        """
+        Size and position of a frame scaled to fit the window with its aspect ratio kept.
+        Cached per frame size until the window is resized (see layout_changed).
+        """
+        fit = self._fit.get((frame_width, frame_height))
+        if fit is None:
+            screen_width, screen_height = self.screen.get_size()
+            scale = min(screen_width / frame_width, screen_height / frame_height)
+            new_width = int(frame_width * scale)
+            new_height = int(frame_height * scale)
+            # Center the video on screen
+            x = (screen_width - new_width) // 2
+            y = (screen_height - new_height) // 2
+            fit = ((new_width, new_height), (x, y))
+            self._fit[(frame_width, frame_height)] = fit
+        return fit
+
+    def layout_changed(self):
+        """Forget the frame geometry and scaling surfaces after the window was resized"""
+        self._fit.clear()
+        self._scaled.clear()
+        self._video_rect = None
+
+    def record_transition_gap(self):
+        """
+        Logs the time from the previous video's end of file, or from a channel switch key
+        press, to the first frame shown after it
+        """
+        if self._transition_started is None:
+            return
+        gap_ms = (time.perf_counter() - self._transition_started) * 1000
+        self._transition_started = None
+        kind = self._transition_kind or 'unknown'
+        self.transition_gaps_ms.setdefault(kind, []).append(gap_ms)
+        print(f"Transition gap: {gap_ms:.1f} ms ({kind})")
+
+    def report_transition_gaps(self):
+        for kind, gaps in self.transition_gaps_ms.items():
+            if gaps:
+                print(f"Transition gaps ({kind}): {len(gaps)} transitions, mean {sum(gaps) / len(gaps):.1f} ms, "
+                      f"max {max(gaps):.1f} ms")
+
     def update_video_frame(self):
-        """Read and display the current video frame"""
-        if not self.is_playing or not self.media_player:
-            return True
+        """
+        Display the next decoded frame if it is due (skipping frames that are too late).
+        Returns the monotonic time the next frame is due, or None when unknown.
+        """
+        if not self.is_playing or not self.producer:
+            return None
         
-        # Get frame from media player
-        frame, val = self.media_player.get_frame()
+        # Frames are decoded by the FrameProducer thread and timed by the presenter; never wait here
+        frame, wait = self.presenter.next(self.producer.queue)
         
-        if val == 'eof':
+        if frame is END_OF_STREAM:
             # Video finished, play next
+            self._transition_started = time.perf_counter()
+            self._transition_kind = 'end of file'
             self.play_next_video()
-            return True
+            return time.monotonic()
         
         if frame is None:
-            # No frame available yet, continue
-            return True
+            # Nothing due yet (or nothing decoded yet)
+            return time.monotonic() + wait if wait is not None else None
         
         # Extract image and timestamp
-        img, pts = frame
-        
+        img, pts = frame.image, frame.pts
+
+        # Near the end, get the next video ready so the switch at end of file is seamless
+        if self.PREFETCH_SECONDS > 0 and self._prefetch is None:
+            row = self.playlist[self.current_video_index] if self.current_video_index < len(self.playlist) else None
+            if row and pts >= row["DurationSeconds"] - self.PREFETCH_SECONDS:
+                self.prefetch_next_video()
+
+        self.show_frame(img)
+        return time.monotonic()
+
+    def show_frame(self, img):
+        """
+        Scale a decoded frame to the window and display it. The frame is read in place from
+        the decoder's memory (copied only when its row padding is not whole pixels) and
+        scaled into a surface reused for every frame of that size; only the video area is
+        updated unless the layout changed.
+        """
+        started = time.thread_time()
         # Get frame dimensions
         frame_width, frame_height = img.get_size()
-        frame_data = img.to_bytearray()[0]
         
-        # Convert frame data to pygame surface
-        # ffpyplayer returns RGB24 format by default
-        surface = pygame.image.frombuffer(frame_data, (frame_width, frame_height), 'RGB')
+        # Wrap the decoder's RGB24 plane (ffpyplayer's default output) without copying it.
+        # pygame ignores the pitch of 'RGB' buffers, so rows padded for alignment (e.g. 854 or
+        # 720 wide) are wrapped as a wider frame and cropped
+        pitch = img.get_linesizes(keep_align=True)[0]
+        if pitch == frame_width * 3:
+            surface = pygame.image.frombuffer(img.to_memoryview(keep_align=True)[0],
+                                              (frame_width, frame_height), 'RGB')
+        elif pitch % 3 == 0:
+            padded = pygame.image.frombuffer(img.to_memoryview(keep_align=True)[0],
+                                             (pitch // 3, frame_height), 'RGB')
+            surface = padded.subsurface((0, 0, frame_width, frame_height))
+        else:
+            # Padding that is not a whole number of pixels: an unpadded copy of the plane
+            surface = pygame.image.frombuffer(img.to_memoryview(keep_align=False)[0],
+                                              (frame_width, frame_height), 'RGB')
+            self.render_stats['frame_copies'] += 1
         
         # Resize frame to fit screen while maintaining aspect ratio
-        screen_width, screen_height = self.screen.get_size()
-        
-        # Calculate scaling
-        scale = min(screen_width / frame_width, screen_height / frame_height)
-        new_width = int(frame_width * scale)
-        new_height = int(frame_height * scale)
-        
-        if scale != 1.0:
-            surface = pygame.transform.scale(surface, (new_width, new_height))
-        
-        # Center the video on screen
-        x = (screen_width - new_width) // 2
-        y = (screen_height - new_height) // 2
-        
-        self.screen.fill((0, 0, 0))
-        self.screen.blit(surface, (x, y))
-        pygame.display.flip()
-        
-        # Sleep only if recommended by ffpyplayer for sync
-        # This is necessary to maintain proper audio/video synchronization
-        # val represents the delay needed before fetching the next frame
-        if val > 0:
-            # Cap sleep time to avoid UI freezing
-            time.sleep(min(val, 0.1))
+        size, position = self.fit_frame(frame_width, frame_height)
+        
+        if size != (frame_width, frame_height):
+            target = self._scaled.get(size)
+            if target is None:
+                target = pygame.Surface(size, 0, surface)
+                self._scaled[size] = target
+                self.render_stats['buffer_allocations'] += 1
+            pygame.transform.scale(surface, size, target)
+            surface = target
+        
+        rect = pygame.Rect(position, size)
+        if rect != self._video_rect:
+            # New layout (resize, other frame size, a message was shown): repaint the borders too
+            self.screen.fill((0, 0, 0))
+            self.screen.blit(surface, rect)
+            pygame.display.flip()
+            self._video_rect = rect
+        else:
+            self.screen.blit(surface, rect)
+            pygame.display.update(rect)
         
-        return True
+        self.render_stats['frames'] += 1
+        self.render_stats['cpu_seconds'] += time.thread_time() - started
+        self.record_transition_gap()
+
+    def report_render_stats(self):
+        stats = self.render_stats
+        if stats['frames']:
+            print(f"Rendering: {stats['frames']} frames, {stats['cpu_seconds'] / stats['frames'] * 1000:.3f} ms CPU "
+                  f"per frame, {stats['buffer_allocations']} frame buffers allocated, "
+                  f"{stats['frame_copies']} frames copied")
     
     def handle_events(self):
         """Handle keyboard and window events"""
@@ -290,6 +747,9 @@ class VideoPlayer:
             if event.type == pygame.QUIT:
                 return False
             
+            elif event.type in (pygame.VIDEORESIZE, pygame.WINDOWSIZECHANGED):
+                self.layout_changed()
+            
             elif event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_ESCAPE or event.key == pygame.K_q:
                     return False
@@ -318,14 +778,27 @@ class VideoPlayer:
         while running:
             running = self.handle_events()
             if running:
-                self.update_video_frame()
-                # Use minimal tick to keep the UI responsive
-                # The actual frame timing is handled by time.sleep in update_video_frame
-                self.clock.tick(60)
+                self.apply_scan_result()
+                next_due = self.update_video_frame()
+                self.update_standbys()
+                # Sleep precisely until the next frame is due, checking input at least every EVENT_POLL_SECONDS
+                poll = time.monotonic() + self.EVENT_POLL_SECONDS
+                sleep_until(poll if next_due is None else min(next_due, poll))
         
         # Cleanup
-        if self.media_player:
-            self.media_player.close_player()
+        self.discard_prefetch()
+        if self.standbys:
+            self.standbys.close()
+        self.close_media_player()
+        if self.watcher:
+            self.watcher.stop()
+        self._stop_background.set()
+        if self._background_thread:
+            self._background_thread.join(timeout=self.PROBE_TIMEOUT_SECONDS)
+        self.db.close()
+        self.report_transition_gaps()
+        self.report_render_stats()
+        self.report_pipeline_stats()
         pygame.quit()
         print("Video Player Closed")
 